@@ -0,0 +1,190 @@
+"""ΑΑΗΤ registry: columnar cache of AAHTList.xlsx and an organization lookup index
+
+Parsing the xlsx through openpyxl takes seconds, so the sheet is converted
+once to Parquet next to a small metadata file holding the source mtime,
+size and sha256. Later loads memory-map the Parquet file; the xlsx is
+re-read only when its content changes (an mtime change with the same hash
+just refreshes the metadata).
+
+AahtRegistry indexes every row by ΑΑΗΤ code, ΑΦΜ, clearing-service code
+and by the exact and normalized forms of the ΑΑΗΤ, organization and
+clearing-service names, so records from ΚΗΜΔΗΣ or Διαύγεια can be joined
+to the registry with one dict lookup per distinct name:
+
+    python aaht_registry.py build
+    python aaht_registry.py lookup "Ελληνική Στατιστική Αρχή"
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from greek_text import normalize_name
+
+AAHT_XLSX_PATH = os.environ.get("AAHT_XLSX_PATH", "AAHTList.xlsx")
+AAHT_CACHE_DIR = os.environ.get("AAHT_CACHE_DIR", "data/aaht_cache")
+
+CODE_COLUMNS = ["Κωδικός ΑΑΗΤ", "ΑΦΜ ΑΑΗΤ", "Κωδικός Υπηρεσίας Εκκαθάρισης"]
+NAME_COLUMNS = ["Ονομασία ΑΑΗΤ", "Φορέας", "Υπηρεσία Εκκαθάρισης"]
+CATEGORICAL_COLUMNS = ["Φορέας", "Τύπος Φορέα", "Εποπτεύων", "Υπουργείο"]
+
+_PARENTHESIZED = re.compile(r"\(([^)]*)\)")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_aaht_xlsx(path):
+    """The sheet with string codes and categorical organization columns"""
+    df = pd.read_excel(path, dtype={"ΑΦΜ ΑΑΗΤ": str})
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def load_aaht_frame(xlsx_path=AAHT_XLSX_PATH, cache_dir=AAHT_CACHE_DIR):
+    """AAHT frame from the Parquet cache, rebuilding it when the xlsx changed"""
+    stem = os.path.splitext(os.path.basename(xlsx_path))[0]
+    parquet_path = os.path.join(cache_dir, f"{stem}.parquet")
+    meta_path = os.path.join(cache_dir, f"{stem}.meta.json")
+
+    stat = os.stat(xlsx_path)
+    meta = {}
+    if os.path.exists(parquet_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    if meta.get("mtime") == stat.st_mtime and meta.get("size") == stat.st_size:
+        df = pd.read_parquet(parquet_path, memory_map=True)
+        df.attrs["sha256"] = meta["sha256"]
+        return df
+
+    sha256 = file_sha256(xlsx_path)
+    if meta.get("sha256") == sha256:
+        df = pd.read_parquet(parquet_path, memory_map=True)
+    else:
+        df = read_aaht_xlsx(xlsx_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{parquet_path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+
+    meta = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": sha256, "rows": len(df)}
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    df.attrs["sha256"] = sha256
+    return df
+
+
+def name_keys(name):
+    """Lookup keys of one name: exact, normalized, and without/only its parenthesized abbreviation"""
+    if not isinstance(name, str) or not name.strip():
+        return set()
+    keys = {name.strip(), normalize_name(name)}
+    without = _PARENTHESIZED.sub(" ", name)
+    if without != name:
+        keys.add(normalize_name(without))
+        keys.update(normalize_name(abbr) for abbr in _PARENTHESIZED.findall(name))
+    keys.discard("")
+    return keys
+
+
+class AahtRegistry:
+    """Organization names and ids -> row positions of the AAHT frame"""
+
+    def __init__(self, df):
+        # sha256 of the source workbook, identifies this registry in derived caches
+        self.fingerprint = df.attrs.get("sha256")
+        self.df = df.reset_index(drop=True)
+        self.size = len(self.df)
+        index = {}
+
+        for column in CODE_COLUMNS:
+            if column not in self.df:
+                continue
+            for position, code in enumerate(self.df[column].astype(str)):
+                index.setdefault(code.strip(), []).append(position)
+
+        for column in NAME_COLUMNS:
+            if column not in self.df:
+                continue
+            # Keys are derived once per distinct name, not once per row
+            for name, positions in self.df.groupby(column, observed=True, sort=False).indices.items():
+                for key in name_keys(name):
+                    index.setdefault(key, []).extend(positions)
+
+        self.index = {
+            key: np.array(sorted(set(positions)), dtype=np.intp) for key, positions in index.items()
+        }
+
+    @classmethod
+    def load(cls, xlsx_path=AAHT_XLSX_PATH, cache_dir=AAHT_CACHE_DIR):
+        return cls(load_aaht_frame(xlsx_path, cache_dir))
+
+    def __len__(self):
+        return self.size
+
+    def positions(self, key):
+        """Row positions for a name or id; the exact key is tried before the normalized one"""
+        key = str(key).strip()
+        found = self.index.get(key)
+        if found is None and key.isdigit():
+            # ΑΦΜ are 9 digits; numeric sources drop the leading zero
+            found = self.index.get(key.zfill(9))
+        if found is None:
+            found = self.index.get(normalize_name(key))
+        return found if found is not None else np.empty(0, dtype=np.intp)
+
+    def lookup(self, key):
+        """AAHT entries for a name or id"""
+        return self.df.iloc[self.positions(key)]
+
+    def match(self, values, column="Κωδικός ΑΑΗΤ"):
+        """Value of `column` for the first AAHT entry of each name or id (NaN if unknown)
+
+        Works per distinct value, so a categorical column of N rows and K
+        organizations costs K lookups.
+        """
+        values = pd.Series(values).astype("category")
+        targets = self.df[column].to_numpy()
+        mapped = [
+            targets[found[0]] if len(found := self.positions(value)) else None
+            for value in values.cat.categories
+        ]
+        lookup = pd.Series(mapped, index=values.cat.categories, dtype=object)
+        return values.map(lookup).astype(object)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Μητρώο ΑΑΗΤ")
+    parser.add_argument("--xlsx", default=AAHT_XLSX_PATH, help="AAHT list workbook")
+    parser.add_argument("--cache-dir", default=AAHT_CACHE_DIR, help="Parquet cache directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="(re)build the Parquet cache if the workbook changed")
+    lookup_cmd = sub.add_parser("lookup", help="AAHT entries for a name or id")
+    lookup_cmd.add_argument("key")
+    args = parser.parse_args(argv)
+
+    registry = AahtRegistry.load(args.xlsx, args.cache_dir)
+    if args.command == "build":
+        print(f"entries={len(registry)} keys={len(registry.index)}")
+    elif args.command == "lookup":
+        entries = registry.lookup(args.key)
+        print(entries[CODE_COLUMNS + NAME_COLUMNS].to_string() if len(entries) else "not found")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+"""Incremental group-by aggregates for the Analytics tabs
+
+RunningAggregates keeps count and sum per group for a set of dimensions
+and folds in new rows as they are ingested, skipping ids it has already
+seen. AggregateMemo keeps finished aggregates per filter-state key so a
+rerun with unchanged filters costs O(groups) instead of O(rows).
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# name -> (group column, summed column or None for count only); dimensions
+# whose group column is missing from the rows (e.g. no ΑΑΗΤ match) stay empty
+KHMDHS_DIMENSIONS = {
+    "contract_type": ("contract_type", "budget"),
+    "aaht": ("aaht_name", "budget"),
+}
+
+DIAVGEIA_DIMENSIONS = {
+    "type": ("type", None),
+    "specialty": ("specialty", "positions"),
+    "organization": ("organization", None),
+    "aaht": ("aaht_name", "positions"),
+}
+
+
+class RunningAggregates:
+    """Running count/sum/mean per group, updated incrementally"""
+
+    def __init__(self, dimensions, id_column=None):
+        self.dimensions = dimensions
+        self.id_column = id_column
+        self.rows = 0
+        self._seen = set()
+        self._groups = {name: {} for name in dimensions}
+
+    def update(self, df):
+        """Fold new rows into the aggregates, returns the number added"""
+        if self.id_column:
+            df = df[~df[self.id_column].isin(self._seen)]
+            self._seen.update(df[self.id_column])
+        if df.empty:
+            return 0
+
+        for name, (key, value) in self.dimensions.items():
+            if key not in df:
+                continue
+            grouped = df.groupby(key, observed=True, dropna=False)
+            counts = grouped.size()
+            sums = grouped[value].sum() if value else None
+            groups = self._groups[name]
+            for group, count in counts.items():
+                acc = groups.setdefault(group, [0, 0.0])
+                acc[0] += int(count)
+                if sums is not None:
+                    acc[1] += float(sums[group])
+        self.rows += len(df)
+        return len(df)
+
+    def table(self, name):
+        """count, sum and mean per group of one dimension, largest count first"""
+        groups = self._groups[name]
+        table = pd.DataFrame(
+            [(group, count, total) for group, (count, total) in groups.items()],
+            columns=["group", "count", "sum"]
+        ).set_index("group")
+        table["mean"] = table["sum"] / table["count"].where(table["count"] > 0)
+        return table.sort_values("count", ascending=False)
+
+    def snapshot(self):
+        """All dimension tables at once (what gets memoized)"""
+        return {"rows": self.rows, **{name: self.table(name) for name in self.dimensions}}
+
+
+class AggregateMemo:
+    """Thread-safe LRU memo of aggregate snapshots per filter-state key"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key, snapshot):
+        with self._lock:
+            self._items[key] = snapshot
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return snapshot
+
+    def get_or_compute(self, key, compute):
+        snapshot = self.get(key)
+        if snapshot is None:
+            snapshot = self.put(key, compute())
+        return snapshot
+
+
+def aggregate_khmdhs(table):
+    aggregates = RunningAggregates(KHMDHS_DIMENSIONS, id_column="reference_number")
+    aggregates.update(table)
+    return aggregates.snapshot()
+
+
+def aggregate_diavgeia(df):
+    aggregates = RunningAggregates(DIAVGEIA_DIMENSIONS, id_column="ada")
+    aggregates.update(df)
+    return aggregates.snapshot()
@@ -0,0 +1,385 @@
+"""Deadline alerting engine
+
+AlertScheduler keeps every tracked deadline in a min-heap of
+(fire_at, notice, threshold) entries, one per configured threshold, so a
+poll only pops what is due instead of rescanning all notices. Each
+(notice, threshold, deadline) fires exactly once; fired keys are kept in
+SQLite so restarts do not repeat alerts. Alerts go to pluggable sinks;
+an alert a sink failed to take is retried for that sink after
+ALERT_RETRY_SECONDS, and only counts as fired once every sink has it.
+When several processes or replicas run the scheduler against one
+shared-state backend (see shared_state.py), each alert is claimed there
+before delivery, so exactly one of them sends it.
+
+Runs headless against the local notice store, and with --diavgeia-days
+also watches the Διαύγεια announcements that publish a deadline:
+
+    python alerts.py run --thresholds 7,3,1 --sink file:data/alerts.jsonl
+    python alerts.py run --once --sink smtp:localhost:1025:alerts@example.com
+    python alerts.py run --sink webhook:http://localhost:9000/hook --diavgeia-days 30
+    python alerts.py --shared-state redis://localhost:6379/0 run --sink file:data/alerts.jsonl
+"""
+import argparse
+import heapq
+import json
+import os
+import smtplib
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+import pandas as pd
+import requests
+
+from diavgeia_api import ingest_announcements
+from khmdhs_api import get_khmdhs_pdf_link
+from notice_store import NOTICE_STORE_PATH, NoticeStore, to_utc
+from shared_state import SHARED_STATE_URL, open_shared_state
+
+ALERT_STATE_PATH = os.environ.get("ALERT_STATE_PATH", "data/alerts.db")
+DEFAULT_THRESHOLDS = (7, 3, 1)
+# Seconds before an alert a sink failed to take is retried
+ALERT_RETRY_SECONDS = 60
+
+
+def urgent_notices(table, within_days=7, now=None):
+    """Notices of a parsed ΚΗΜΔΗΣ table whose deadline is 0..within_days days away"""
+    now = now or pd.Timestamp.now(tz="UTC")
+    days_left = (table["final_submission_date"] - now).dt.days
+    urgent = days_left.between(0, within_days)
+    return pd.DataFrame({
+        "ΑΔΑΜ": table.loc[urgent, "reference_number"],
+        "Τίτλος": table.loc[urgent, "title"].str[:50],
+        "Καταληκτική": table.loc[urgent, "final_submission_date"].dt.strftime("%Y-%m-%d"),
+        "Μέρες": days_left[urgent].astype(int),
+    }).sort_values("Μέρες")
+
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+def format_alert(alert):
+    return (
+        f"[{alert['source']}] {alert['title']} - λήγει σε {alert['days_left']} ημέρες "
+        f"({alert['deadline'][:10]}) {alert.get('link') or ''}"
+    ).strip()
+
+
+class FileSink:
+    """Append alerts as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alerts):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POST the batch of alerts as JSON"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        response = requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class EmailSink:
+    """One digest e-mail per batch through an SMTP server (e.g. a local stand-in on :1025)"""
+
+    def __init__(self, recipients, host="localhost", port=1025, sender="diavgeia-monitor@localhost"):
+        self.recipients = recipients
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send(self, alerts):
+        message = EmailMessage()
+        message["Subject"] = f"🔔 {len(alerts)} προθεσμίες λήγουν σύντομα"
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content("\n".join(format_alert(alert) for alert in alerts))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(message)
+
+
+def parse_sink(spec):
+    """Sink from a CLI spec: file:PATH, webhook:URL or smtp:HOST:PORT:TO[,TO...]"""
+    kind, _, target = spec.partition(":")
+    if kind == "file":
+        return FileSink(target)
+    if kind == "webhook":
+        return WebhookSink(target)
+    if kind == "smtp":
+        host, port, recipients = target.split(":", 2)
+        return EmailSink(recipients.split(","), host=host, port=int(port))
+    raise ValueError(f"Unknown sink: {spec}")
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class AlertScheduler:
+    """Fires each configured threshold once per tracked deadline"""
+
+    def __init__(self, thresholds=DEFAULT_THRESHOLDS, sinks=(), state_path=ALERT_STATE_PATH, shared=None):
+        self.thresholds = sorted(set(thresholds), reverse=True)
+        self.sinks = list(sinks)
+        self.state_path = state_path
+        self.shared = shared
+        self._heap = []
+        self._tracked = {}  # notice key -> (deadline, info)
+        self._undelivered = {}  # alert key -> indexes of the sinks that still need it
+        self.last_error = None
+        directory = os.path.dirname(state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(sqlite3.connect(state_path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fired_alerts ("
+                "alert_key TEXT PRIMARY KEY, fired_at TEXT NOT NULL)"
+            )
+
+    def __len__(self):
+        return len(self._tracked)
+
+    @staticmethod
+    def alert_key(key, threshold, deadline):
+        return f"{key}|{threshold}|{int(deadline.timestamp())}"
+
+    def track(self, key, deadline, **info):
+        """Start (or keep) watching a deadline; a moved deadline re-arms all thresholds"""
+        deadline = to_utc(deadline)
+        current = self._tracked.get(key)
+        if current and current[0] == deadline:
+            return
+        self._tracked[key] = (deadline, info)
+        for threshold in self.thresholds:
+            heapq.heappush(self._heap, (deadline - timedelta(days=threshold), key, threshold, deadline))
+
+    def untrack(self, key):
+        # Heap entries are dropped lazily when popped
+        self._tracked.pop(key, None)
+
+    def _already_fired(self, keys, chunk=500):
+        already = set()
+        with closing(sqlite3.connect(self.state_path)) as conn:
+            for start in range(0, len(keys), chunk):
+                batch = keys[start:start + chunk]
+                already.update(
+                    row[0] for row in conn.execute(
+                        f"SELECT alert_key FROM fired_alerts WHERE alert_key IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                )
+        return already
+
+    def _claim(self, alert_key, deadline, now):
+        """Reserve an alert in the shared state; False when another process already has it"""
+        if self.shared is None:
+            return True
+        # Kept a day past the deadline, after which the alert can never be due again
+        ttl = (deadline - now).total_seconds() + 86400
+        return self.shared.add(f"alert:{alert_key}", now.isoformat().encode("ascii"), ttl=ttl)
+
+    def next_fire_time(self):
+        return self._heap[0][0] if self._heap else None
+
+    def poll(self, now=None):
+        """Pop every due entry, deliver the alerts and return those delivered
+
+        When several thresholds of one notice are due at once (e.g. it was
+        first seen 2 days before its deadline) only the tightest fires; the
+        looser ones are recorded as fired so they never repeat.
+
+        A failing sink does not stop the others. The alerts it did not take
+        go back on the heap for ALERT_RETRY_SECONDS later, are retried only
+        on the sinks that failed, and are recorded as fired once all sinks
+        have them; last_error describes the failures of the poll.
+        """
+        now = now or datetime.now(timezone.utc)
+        self.last_error = None
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, key, threshold, deadline = heapq.heappop(self._heap)
+            tracked = self._tracked.get(key)
+            if not tracked or tracked[0] != deadline:
+                continue  # stale entry: untracked or deadline moved
+            if deadline <= now:
+                self._tracked.pop(key, None)
+                continue
+            due.setdefault(key, []).append(threshold)
+
+        if not due:
+            return []
+
+        fired_at = now.isoformat(timespec="seconds")
+        fired_keys = [
+            self.alert_key(key, t, self._tracked[key][0])
+            for key, thresholds in due.items() for t in thresholds
+        ]
+        already = self._already_fired(fired_keys)
+
+        alerts = {}  # alert key -> alert
+        for key, thresholds in due.items():
+            deadline, info = self._tracked[key]
+            tightest = min(thresholds)
+            alert_key = self.alert_key(key, tightest, deadline)
+            if alert_key in already or not self._claim(alert_key, deadline, now):
+                continue
+            alerts[alert_key] = {
+                "key": key,
+                "threshold_days": tightest,
+                "days_left": (deadline - now).days,
+                "deadline": deadline.isoformat(),
+                "fired_at": fired_at,
+                **info,
+            }
+
+        errors = []
+        for index, sink in enumerate(self.sinks):
+            batch = [k for k in alerts if index in self._undelivered.get(k, (index,))]
+            if not batch:
+                continue
+            try:
+                sink.send([alerts[k] for k in batch])
+            except Exception as e:
+                errors.append(f"{type(sink).__name__}: {type(e).__name__}: {e}")
+                for k in batch:
+                    self._undelivered.setdefault(k, set(range(len(self.sinks))))
+                continue
+            for k in batch:
+                self._undelivered.setdefault(k, set(range(len(self.sinks)))).discard(index)
+        if errors:
+            self.last_error = "; ".join(errors)
+
+        failed = {k for k in alerts if self._undelivered.get(k)}
+        for k in alerts.keys() - failed:
+            self._undelivered.pop(k, None)
+        retry_keys = {alerts[k]["key"] for k in failed}
+        if failed:
+            # Released so the retry (of this or any process) can claim them again
+            if self.shared is not None:
+                self.shared.delete(*(f"alert:{k}" for k in failed))
+            retry_at = now + timedelta(seconds=ALERT_RETRY_SECONDS)
+            for key in retry_keys:
+                deadline = self._tracked[key][0]
+                for threshold in due[key]:
+                    heapq.heappush(self._heap, (retry_at, key, threshold, deadline))
+
+        # Recorded only after delivery, so a failing sink does not lose alerts on restart
+        with closing(sqlite3.connect(self.state_path)) as conn, conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO fired_alerts (alert_key, fired_at) VALUES (?, ?)",
+                [
+                    (self.alert_key(key, t, self._tracked[key][0]), fired_at)
+                    for key, thresholds in due.items() if key not in retry_keys for t in thresholds
+                ]
+            )
+        return [alert for k, alert in alerts.items() if k not in failed]
+
+
+def track_store(scheduler, store, synced_since=None):
+    """Track the open ΚΗΜΔΗΣ deadlines of the local store
+
+    With synced_since, only notices written by a sync after that time are
+    read. Returns the timestamp to pass on the next call.
+    """
+    reloaded_at = datetime.now().isoformat(timespec="seconds")
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for reference, title, deadline in store.open_deadlines(now, synced_since):
+        scheduler.track(
+            f"khmdhs:{reference}",
+            deadline,
+            source="ΚΗΜΔΗΣ",
+            title=title,
+            link=get_khmdhs_pdf_link(reference),
+        )
+    return reloaded_at
+
+
+def track_announcements(scheduler, announcements):
+    """Track the open Διαύγεια deadlines of an ingested announcements frame
+
+    Only deadlines the decisions publish are tracked; the estimated ones
+    (issue date + DEFAULT_DEADLINE_DAYS) are guesses and would raise false
+    alarms. Returns the number of announcements tracked.
+    """
+    # Published deadlines are normalized to naive UTC
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    published = announcements[~announcements["deadline_estimated"].astype(bool) & (announcements["deadline"] > now)]
+    for ada, title, deadline, link in published[["ada", "title", "deadline", "link"]].itertuples(index=False):
+        scheduler.track(f"diavgeia:{ada}", deadline.tz_localize("UTC"), source="Διαύγεια", title=title, link=link)
+    return len(published)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ειδοποιήσεις προθεσμιών")
+    parser.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    parser.add_argument("--state", default=ALERT_STATE_PATH, help="fired-alert state file")
+    parser.add_argument("--shared-state", default=SHARED_STATE_URL,
+                        help="sqlite:///PATH or redis://HOST:PORT/DB shared by several alert runners")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="watch deadlines and deliver alerts")
+    run_cmd.add_argument("--thresholds", default="7,3,1", help="days before the deadline")
+    run_cmd.add_argument("--sink", action="append", default=[], help="file:PATH | webhook:URL | smtp:HOST:PORT:TO")
+    run_cmd.add_argument("--interval", type=int, default=300, help="seconds between store reloads")
+    run_cmd.add_argument("--once", action="store_true", help="poll once and exit")
+    run_cmd.add_argument("--diavgeia-days", type=int, default=0,
+                         help="also watch the Διαύγεια announcements of the last N days (0: off)")
+    run_cmd.add_argument("--diavgeia-interval", type=int, default=3600, help="seconds between Διαύγεια ingests")
+    args = parser.parse_args(argv)
+
+    sinks = [parse_sink(spec) for spec in args.sink] or [FileSink("data/alerts.jsonl")]
+    scheduler = AlertScheduler(
+        thresholds=[int(t) for t in args.thresholds.split(",")],
+        sinks=sinks,
+        state_path=args.state,
+        shared=open_shared_state(args.shared_state)
+    )
+    store = NoticeStore(args.db)
+
+    synced_since = None
+    next_ingest = 0.0
+    while True:
+        synced_since = track_store(scheduler, store, synced_since)
+        if args.diavgeia_days and time.monotonic() >= next_ingest:
+            next_ingest = time.monotonic() + args.diavgeia_interval
+            try:
+                # Pages that fail are picked up by the next ingest
+                track_announcements(scheduler, ingest_announcements(days=args.diavgeia_days, failed=[]))
+            except Exception as e:
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} Διαύγεια: {type(e).__name__}: {e}")
+        try:
+            fired = scheduler.poll()
+        except Exception as e:
+            # A broken state file or backend is retried on the next round, not fatal
+            fired = []
+            scheduler.last_error = f"{type(e).__name__}: {e}"
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} tracked={len(scheduler)} fired={len(fired)}")
+        if scheduler.last_error:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} error: {scheduler.last_error}")
+        if args.once:
+            return 1 if scheduler.last_error else 0
+        # Sleep until the next reload or the next due alert, whichever is first
+        next_fire = scheduler.next_fire_time()
+        wait = args.interval
+        if next_fire is not None:
+            wait = min(wait, max(1, (next_fire - datetime.now(timezone.utc)).total_seconds()))
+        time.sleep(wait)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,463 @@
+"""Append-only historical archive of ΚΗΜΔΗΣ notices and Διαύγεια announcements
+
+The dashboard's searches and the 30-day refresh window forget everything
+older, so trends over months or years need their own store. Every ingested
+row is appended once (by its id) to a date-partitioned Parquet dataset,
+
+    data/archive/<source>/year=2025/month=03/part-20250314T101500-1a2b3c4d.parquet
+
+and folded into daily, weekly and monthly rollups (count and summed value
+per period and group) kept in SQLite next to it. Trend charts read the
+rollups only: five years of monthly totals per contract type are a few
+hundred rows, whatever the number of archived notices. The raw partitions
+stay available for re-deriving rollups (`rebuild`) and for ad-hoc reads.
+
+The background refresh archives every sync and every announcement reload;
+older history is backfilled from the command line:
+
+    python archive.py import-store
+    python archive.py import-diavgeia --date-from 2021-01-01 --date-to 2025-12-31
+    python archive.py trend khmdhs --grain month --dimension contract_type
+    python archive.py rebuild khmdhs
+    python archive.py stats
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from diavgeia_api import (
+    ANNOUNCEMENT_SCHEMA,
+    DIAVGEIA_DECISION_TYPES,
+    create_diavgeia_client,
+    fetch_organization_labels,
+    iter_decision_pages,
+    normalize_decisions,
+)
+from notice_store import NOTICE_STORE_PATH, NoticeStore
+from notice_table import NOTICE_COLUMNS, parse_notices
+
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "data/archive")
+
+GRAINS = ("day", "week", "month")
+# Group label of the "all" dimension, the plain total per period
+ALL_GROUP = ""
+OTHER_GROUP = "Άλλα"
+
+# source -> id column, date column, archived columns and rollup dimensions;
+# a dimension is name -> (group column or None for the total, summed column)
+ARCHIVE_SOURCES = {
+    "khmdhs": {
+        "id": "reference_number",
+        "date": "registration_date",
+        "columns": list(NOTICE_COLUMNS.values()),
+        "dimensions": {
+            "all": (None, "budget"),
+            "contract_type": ("contract_type", "budget"),
+            "organization": ("organization", "budget"),
+        },
+    },
+    "diavgeia": {
+        "id": "ada",
+        "date": "published_date",
+        # days_remaining and status depend on when the row was loaded
+        "columns": [c for c in ANNOUNCEMENT_SCHEMA if c not in ("days_remaining", "status")],
+        "dimensions": {
+            "all": (None, "positions"),
+            "type": ("type", "positions"),
+            "specialty": ("specialty", "positions"),
+            "organization": ("organization", "positions"),
+        },
+    },
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (source, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    source TEXT NOT NULL,
+    grain TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    period TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (source, grain, dimension, period, grp)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS archive_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT_ROLLUP = (
+    "INSERT INTO rollups (source, grain, dimension, period, grp, count, total) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (source, grain, dimension, period, grp) "
+    "DO UPDATE SET count = count + excluded.count, total = total + excluded.total"
+)
+
+
+def period_start(days, grain):
+    """First day of the day/week (Monday)/month period of each day in a datetime series"""
+    if grain == "day":
+        return days
+    if grain == "week":
+        return days - pd.to_timedelta(days.dt.weekday, unit="D")
+    if grain == "month":
+        return days - pd.to_timedelta(days.dt.day - 1, unit="D")
+    raise ValueError(f"Unknown grain: {grain}")
+
+
+def archive_days(frame, date_column):
+    """Calendar day of every row as a naive datetime (time zones are dropped as UTC)"""
+    dates = pd.to_datetime(frame[date_column], errors="coerce", utc=True)
+    return dates.dt.tz_convert(None).dt.normalize()
+
+
+def rollup_rows(source, frame, days):
+    """(source, grain, dimension, period, group, count, total) of new rows, ready to upsert"""
+    dimensions = ARCHIVE_SOURCES[source]["dimensions"]
+    rows = []
+    for grain in GRAINS:
+        periods = period_start(days, grain).dt.strftime("%Y-%m-%d")
+        for dimension, (key, value) in dimensions.items():
+            groups = frame[key].astype(object).fillna("").astype(str) if key else ALL_GROUP
+            values = pd.to_numeric(frame[value], errors="coerce").fillna(0.0)
+            grouped = (
+                pd.DataFrame({"period": periods, "grp": groups, "value": values})
+                .groupby(["period", "grp"], sort=False)["value"]
+                .agg(["size", "sum"])
+            )
+            rows.extend(
+                (source, grain, dimension, period, group, int(count), float(total))
+                for (period, group), count, total in zip(grouped.index, grouped["size"], grouped["sum"])
+            )
+    return rows
+
+
+class Archive:
+    """Date-partitioned Parquet rows plus SQLite rollups, one directory per source"""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.path = os.path.join(root, "rollups.db")
+        os.makedirs(root, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_state(self, key, default=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM archive_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, **values):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO archive_state (key, value) VALUES (?, ?)",
+                list(values.items())
+            )
+
+    def updated_at(self):
+        """When rows were last appended; changes whenever the rollups do"""
+        return self.get_state("updated_at")
+
+    # ------------------------------------------------------------------
+    # Appending
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _known_ids(conn, source, ids, chunk=500):
+        known = set()
+        for start in range(0, len(ids), chunk):
+            batch = ids[start:start + chunk]
+            known.update(
+                row[0] for row in conn.execute(
+                    f"SELECT id FROM archived WHERE source = ? AND id IN ({','.join('?' * len(batch))})",
+                    [source, *batch]
+                )
+            )
+        return known
+
+    def append(self, source, frame):
+        """Archive the rows of a parsed ΚΗΜΔΗΣ table or normalized announcements
+        whose id is not archived yet, returns how many were added
+
+        Rows are appended once: a later amendment of an archived notice does
+        not change its history. Rows without a date cannot be placed in a
+        partition and are skipped.
+        """
+        spec = ARCHIVE_SOURCES[source]
+        id_column = spec["id"]
+        frame = frame[[c for c in spec["columns"] if c in frame]].reset_index(drop=True)
+        days = archive_days(frame, spec["date"])
+        frame = frame[days.notna() & frame[id_column].notna()]
+        frame = frame.drop_duplicates(id_column)
+        if frame.empty:
+            return 0
+
+        with closing(self._connect()) as conn, conn:
+            # One writer at a time, across processes too; the id check and the
+            # rollup update happen under the same lock
+            conn.execute("BEGIN IMMEDIATE")
+            known = self._known_ids(conn, source, frame[id_column].astype(str).tolist())
+            new = frame[~frame[id_column].astype(str).isin(known)]
+            if new.empty:
+                return 0
+            new_days = days[new.index]
+            conn.executemany(
+                "INSERT INTO archived (source, id, day) VALUES (?, ?, ?)",
+                zip([source] * len(new), new[id_column].astype(str), new_days.dt.strftime("%Y-%m-%d"))
+            )
+            # Written before the commit: a failed write rolls the ids and rollups back
+            self._write_partitions(source, new, new_days)
+            conn.executemany(UPSERT_ROLLUP, rollup_rows(source, new, new_days))
+            conn.execute(
+                "INSERT OR REPLACE INTO archive_state (key, value) VALUES ('updated_at', ?)",
+                (datetime.now().isoformat(timespec="microseconds"),)
+            )
+        return len(new)
+
+    def _write_partitions(self, source, frame, days):
+        """One new Parquet file per month present in the rows"""
+        frame = frame.copy()
+        for column in frame.columns:
+            # Categories differ between batches; plain strings keep every part's schema alike
+            if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype(object)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        for (year, month), part in frame.groupby([days.dt.year, days.dt.month], sort=True):
+            directory = os.path.join(self.root, source, f"year={year:04d}", f"month={month:02d}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+            tmp = f"{path}.tmp"
+            part.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def trend(self, source, grain="month", dimension="all", date_from=None, date_to=None, top=None):
+        """period, group, count, total of one dimension from the rollups
+
+        With top, groups outside the `top` largest by count over the whole
+        range are summed into one "Άλλα" group.
+        """
+        if grain not in GRAINS:
+            raise ValueError(f"Unknown grain: {grain}")
+        sql = "SELECT period, grp, count, total FROM rollups WHERE source = ? AND grain = ? AND dimension = ?"
+        params = [source, grain, dimension]
+        if date_from:
+            start = period_start(pd.Series(pd.to_datetime([date_from])), grain)[0]
+            sql += " AND period >= ?"
+            params.append(start.strftime("%Y-%m-%d"))
+        if date_to:
+            sql += " AND period <= ?"
+            params.append(pd.Timestamp(date_to).strftime("%Y-%m-%d"))
+        with closing(self._connect()) as conn:
+            trend = pd.read_sql_query(sql + " ORDER BY period", conn, params=params)
+        trend = trend.rename(columns={"grp": "group"})
+        trend["period"] = pd.to_datetime(trend["period"])
+
+        if top and trend["group"].nunique() > top:
+            largest = trend.groupby("group")["count"].sum().nlargest(top).index
+            trend["group"] = trend["group"].where(trend["group"].isin(largest), OTHER_GROUP)
+            trend = trend.groupby(["period", "group"], as_index=False, sort=True)[["count", "total"]].sum()
+        return trend
+
+    def partitions(self, source, date_from=None, date_to=None):
+        """Parquet files of the months overlapping [date_from, date_to]"""
+        first = pd.Timestamp(date_from).strftime("%Y%m") if date_from else "000000"
+        last = pd.Timestamp(date_to).strftime("%Y%m") if date_to else "999999"
+        files = []
+        for path in sorted(glob.glob(os.path.join(self.root, source, "year=*", "month=*", "*.parquet"))):
+            month_dir = os.path.dirname(path)
+            key = os.path.basename(os.path.dirname(month_dir))[5:] + os.path.basename(month_dir)[6:]
+            if first <= key <= last:
+                files.append(path)
+        return files
+
+    def read(self, source, date_from=None, date_to=None, columns=None):
+        """Archived rows of a date range, from the raw partitions"""
+        spec = ARCHIVE_SOURCES[source]
+        files = self.partitions(source, date_from, date_to)
+        if not files:
+            return pd.DataFrame(columns=columns or spec["columns"])
+        frame = pd.concat([pd.read_parquet(path, columns=columns) for path in files], ignore_index=True)
+        days = archive_days(frame, spec["date"]) if spec["date"] in frame else None
+        if days is not None:
+            keep = pd.Series(True, index=frame.index)
+            if date_from:
+                keep &= days >= pd.Timestamp(date_from)
+            if date_to:
+                keep &= days <= pd.Timestamp(date_to)
+            frame = frame[keep]
+        if spec["id"] in frame:
+            # A part written by an append that failed before its commit may repeat rows
+            frame = frame.drop_duplicates(spec["id"])
+        return frame.reset_index(drop=True)
+
+    def rebuild(self, source):
+        """Recompute the rollups of a source from its raw partitions (e.g. after adding a dimension)
+
+        Only rows whose id is recorded as archived count, each once: a part
+        left by an append that failed before its commit holds ids that were
+        rolled back, or archived again by a later append.
+        """
+        spec = ARCHIVE_SOURCES[source]
+        id_column = spec["id"]
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rollups WHERE source = ?", (source,))
+            rows = 0
+            seen = set()
+            for path in self.partitions(source):
+                frame = pd.read_parquet(path)
+                ids = frame[id_column].astype(str)
+                archived = self._known_ids(conn, source, ids.drop_duplicates().tolist())
+                frame = frame[ids.isin(archived - seen) & ~ids.duplicated()]
+                seen.update(frame[id_column].astype(str))
+                days = archive_days(frame, spec["date"])
+                conn.executemany(UPSERT_ROLLUP, rollup_rows(source, frame, days))
+                rows += len(frame)
+            conn.execute(
+                "INSERT OR REPLACE INTO archive_state (key, value) VALUES ('updated_at', ?)",
+                (datetime.now().isoformat(timespec="microseconds"),)
+            )
+        return rows
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            archived = conn.execute(
+                "SELECT source, COUNT(*), MIN(day), MAX(day) FROM archived GROUP BY source"
+            ).fetchall()
+            rollups = dict(conn.execute("SELECT source, COUNT(*) FROM rollups GROUP BY source").fetchall())
+        stats = {}
+        for source, rows, first, last in archived:
+            files = self.partitions(source)
+            stats[source] = {
+                "rows": rows,
+                "first_day": first,
+                "last_day": last,
+                "rollup_rows": rollups.get(source, 0),
+                "files": len(files),
+                "bytes": sum(os.path.getsize(path) for path in files),
+            }
+        return stats
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def import_store(archive, store, chunk_size=5000):
+    """Archive every notice of the local notice store, returns how many were new"""
+    added = 0
+    for content in store.iter_query({}, chunk_size=chunk_size):
+        added += archive.append("khmdhs", parse_notices(content))
+    return added
+
+
+def import_synced(archive, store, chunk_size=5000):
+    """Archive the notices written to the store since the previous call, returns how many were new
+
+    Only the notices a sync (or an API search) wrote are read, not the whole
+    synced window; the store's synced_at of the last one read is kept in
+    the archive state.
+    """
+    since = archive.get_state("khmdhs_synced_at", "")
+    latest = since
+    added = 0
+    for rows in store.iter_synced(since, columns=("raw", "synced_at"), chunk_size=chunk_size):
+        added += archive.append("khmdhs", parse_notices([json.loads(raw) for raw, _ in rows]))
+        latest = max(latest, rows[-1][1])
+    archive.set_state(khmdhs_synced_at=latest)
+    return added
+
+
+def month_ranges(date_from, date_to):
+    """Consecutive (first, last) day ranges of at most a calendar month"""
+    start = date_from
+    while start <= date_to:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(date_to, next_month - timedelta(days=1))
+        yield start, end
+        start = end + timedelta(days=1)
+
+
+def import_diavgeia(archive, date_from, date_to, client=None, on_month=None):
+    """Archive the Διαύγεια announcements of [date_from, date_to] a month at a time"""
+    client = client or create_diavgeia_client()
+    org_labels = fetch_organization_labels(client)
+    added = 0
+    for start, end in month_ranges(date_from, date_to):
+        chunks = [
+            normalize_decisions(decisions, org_labels)
+            for decisions in iter_decision_pages(client, list(DIAVGEIA_DECISION_TYPES), start, end)
+            if decisions
+        ]
+        month_added = archive.append("diavgeia", pd.concat(chunks, ignore_index=True)) if chunks else 0
+        added += month_added
+        if on_month:
+            on_month(start, end, month_added)
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ιστορικό αρχείο διαγωνισμών και προκηρύξεων")
+    parser.add_argument("--root", default=ARCHIVE_DIR, help="archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="archived rows, files and rollups per source")
+    store_cmd = sub.add_parser("import-store", help="archive every notice of the local notice store")
+    store_cmd.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    diavgeia_cmd = sub.add_parser("import-diavgeia", help="backfill Διαύγεια announcements")
+    diavgeia_cmd.add_argument("--date-from", required=True)
+    diavgeia_cmd.add_argument("--date-to", default=date.today().isoformat())
+    trend_cmd = sub.add_parser("trend", help="print a trend from the rollups as CSV")
+    trend_cmd.add_argument("source", choices=ARCHIVE_SOURCES)
+    trend_cmd.add_argument("--grain", choices=GRAINS, default="month")
+    trend_cmd.add_argument("--dimension", default="all")
+    trend_cmd.add_argument("--date-from")
+    trend_cmd.add_argument("--date-to")
+    trend_cmd.add_argument("--top", type=int)
+    rebuild_cmd = sub.add_parser("rebuild", help="recompute rollups from the raw partitions")
+    rebuild_cmd.add_argument("source", choices=ARCHIVE_SOURCES)
+    args = parser.parse_args(argv)
+
+    archive = Archive(args.root)
+    if args.command == "import-store":
+        print(json.dumps({"added": import_store(archive, NoticeStore(args.db))}))
+    elif args.command == "import-diavgeia":
+        def progress(start, end, added):
+            print(f"{start} - {end}: {added} announcements")
+
+        added = import_diavgeia(
+            archive, date.fromisoformat(args.date_from), date.fromisoformat(args.date_to), on_month=progress
+        )
+        print(json.dumps({"added": added}))
+    elif args.command == "trend":
+        trend = archive.trend(args.source, args.grain, args.dimension, args.date_from, args.date_to, args.top)
+        print(trend.to_csv(index=False), end="")
+    elif args.command == "rebuild":
+        print(json.dumps({"rows": archive.rebuild(args.source)}))
+    else:
+        print(json.dumps(archive.stats(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,388 @@
+"""Local cache of ΚΗΜΔΗΣ notice attachments (PDF)
+
+Attachments are downloaded over a bounded thread pool through the shared,
+rate-limited ΚΗΜΔΗΣ client and stored content-addressed: the file name is
+the sha256 of the bytes, so a document linked from several notices is kept
+once. An SQLite index maps every URL to its file together with the ETag /
+Last-Modified validators. A cached file is served without any request until
+it is older than REVALIDATE_AFTER, and then revalidated with a conditional
+request (304 keeps the file). Interrupted transfers are resumed with Range
+requests guarded by If-Range, so a changed document is never spliced onto
+an old prefix. When the files exceed the size budget the least recently
+used ones are removed.
+
+    python attachments.py fetch 26PROC000000001 26PROC000000002
+    python attachments.py stats
+    python attachments.py prune --max-mb 500
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+
+import requests
+
+from khmdhs_api import KHMDHS_MAX_WORKERS, create_khmdhs_client, get_khmdhs_pdf_link
+
+ATTACHMENT_CACHE_DIR = os.environ.get("ATTACHMENT_CACHE_DIR", "data/attachments")
+ATTACHMENT_CACHE_MAX_BYTES = int(os.environ.get("ATTACHMENT_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# Accept header of attachment downloads, in place of the API client's JSON one
+ATTACHMENT_ACCEPT = "application/pdf, */*"
+# Seconds a cached attachment is served before it is revalidated
+REVALIDATE_AFTER = 24 * 3600
+# Interrupted transfers resumed within one fetch
+RESUME_ATTEMPTS = 3
+CHUNK_SIZE = 64 * 1024
+# Eviction frees space down to this share of the budget, not just below it
+LOW_WATER_MARK = 0.9
+# Locks shared by URL hash, so two threads never download the same URL
+_LOCK_STRIPES = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_sha256 ON entries (sha256);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+"""
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentCache:
+    """Content-addressed attachment files under a size budget"""
+
+    def __init__(self, root=ATTACHMENT_CACHE_DIR, max_bytes=ATTACHMENT_CACHE_MAX_BYTES,
+                 revalidate_after=REVALIDATE_AFTER):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._url_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "partial"), exist_ok=True)
+        self.db_path = os.path.join(root, "index.db")
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, "blobs", sha256[:2], sha256)
+
+    def _partial_path(self, url):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, "partial", f"{name}.part")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # ------------------------------------------------------------------
+    # Lookups (no network)
+    # ------------------------------------------------------------------
+
+    def entry(self, url):
+        """(path, content_type) of a cached URL, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT sha256, content_type FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self.blob_path(row[0])) or not self._touch(row[0]):
+            return None
+        return self.blob_path(row[0]), row[1]
+
+    def cached(self, urls):
+        """The subset of urls that have a cached file"""
+        urls = list(urls)
+        found = set()
+        with closing(self._connect()) as conn:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    url for (url,) in conn.execute(
+                        f"SELECT e.url FROM entries e JOIN blobs b ON b.sha256 = e.sha256 "
+                        f"WHERE e.url IN ({placeholders})",
+                        chunk
+                    )
+                )
+        return found
+
+    def _touch(self, sha256, now=None):
+        """Mark a file used, returns False when an eviction pass has just removed it"""
+        with closing(self._connect()) as conn, conn:
+            return bool(conn.execute(
+                "UPDATE blobs SET last_access = ? WHERE sha256 = ?", (now or time.time(), sha256)
+            ).rowcount)
+
+    # ------------------------------------------------------------------
+    # Downloads
+    # ------------------------------------------------------------------
+
+    def fetch(self, client, url, force=False):
+        """Local path of the content of url, downloading or revalidating it when needed"""
+        with self._url_locks[hash(url) % _LOCK_STRIPES]:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT sha256, etag, last_modified, checked_at FROM entries WHERE url = ?", (url,)
+                ).fetchone()
+            now = time.time()
+            cached = row is not None and os.path.exists(self.blob_path(row[0]))
+            if cached and not force and now - row[3] < self.revalidate_after:
+                # The touch also keeps an eviction pass that starts now from removing the file
+                if self._touch(row[0], now):
+                    self._count("hits")
+                    return self.blob_path(row[0])
+                cached = False
+
+            validators = {}
+            if cached:
+                if row[1]:
+                    validators["If-None-Match"] = row[1]
+                if row[2]:
+                    validators["If-Modified-Since"] = row[2]
+            result = self._download(client, url, validators)
+            if result is None:
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("UPDATE entries SET checked_at = ? WHERE url = ?", (now, url))
+                    kept = conn.execute(
+                        "UPDATE blobs SET last_access = ? WHERE sha256 = ?", (now, row[0])
+                    ).rowcount
+                if kept:
+                    self._count("revalidated")
+                    return self.blob_path(row[0])
+                # Evicted while it was revalidated: download it again
+                result = self._download(client, url, {})
+
+            part, headers = result
+            sha256 = file_sha256(part)
+            size = os.path.getsize(part)
+            path = self.blob_path(sha256)
+            with closing(self._connect()) as conn, conn:
+                # Under the write lock, so an eviction pass cannot remove the file
+                # between the move and the rows that make it used
+                conn.execute("BEGIN IMMEDIATE")
+                if os.path.exists(path):
+                    os.remove(part)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(part, path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (url, sha256, etag, last_modified, content_type, checked_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, sha256, headers.get("ETag"), headers.get("Last-Modified"),
+                     headers.get("Content-Type"), now)
+                )
+                conn.execute(
+                    "INSERT INTO blobs (sha256, size, last_access) VALUES (?, ?, ?) "
+                    "ON CONFLICT (sha256) DO UPDATE SET last_access = excluded.last_access",
+                    (sha256, size, time.time())
+                )
+            self._count("misses")
+        self.evict(keep=sha256)
+        return path
+
+    def _download(self, client, url, validators):
+        """Download url into its partial file, resuming what a previous attempt left
+
+        Returns None when the server answers 304 Not Modified, otherwise
+        (partial path, response headers) of the complete body.
+        """
+        part = self._partial_path(url)
+        meta_path = f"{part}.json"
+        for attempt in range(RESUME_ATTEMPTS + 1):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {"Accept": ATTACHMENT_ACCEPT, **validators}
+            if offset:
+                partial_meta = {}
+                if os.path.exists(meta_path):
+                    with open(meta_path, encoding="utf-8") as f:
+                        partial_meta = json.load(f)
+                if_range = partial_meta.get("etag") or partial_meta.get("last_modified")
+                if if_range:
+                    headers["Range"] = f"bytes={offset}-"
+                    headers["If-Range"] = if_range
+                else:
+                    offset = 0  # nothing to check the prefix against: start over
+            try:
+                with client.get(url, headers=headers, stream=True) as response:
+                    if response.status_code == 304:
+                        return None
+                    content_range = response.headers.get("Content-Range", "")
+                    if not (offset and response.status_code == 206 and content_range.startswith(f"bytes {offset}-")):
+                        # Full body: the server ignored the Range or the document changed
+                        offset = 0
+                        with open(meta_path, "w", encoding="utf-8") as f:
+                            json.dump({
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                            }, f)
+                    with open(part, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                    result_headers = dict(response.headers)
+            except requests.HTTPError as e:
+                if offset and e.response is not None and e.response.status_code == 416:
+                    os.remove(part)
+                    continue
+                raise
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == RESUME_ATTEMPTS:
+                    raise
+                continue
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            return part, result_headers
+        raise RuntimeError(f"download of {url} did not complete")
+
+    # ------------------------------------------------------------------
+    # Size budget
+    # ------------------------------------------------------------------
+
+    def evict(self, max_bytes=None, keep=None):
+        """Remove least recently used files while the cache exceeds max_bytes
+
+        Frees space down to LOW_WATER_MARK of the budget so that every new
+        file does not trigger another pass. Files used since the pass started
+        are skipped, as a concurrent fetch may just have returned them; the
+        pass holds the index's write lock, so a use either lands before it
+        (and is seen) or finds the file gone and downloads it again.
+        Returns the number of files removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        started = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            target = max_bytes * LOW_WATER_MARK
+            removed = []
+            for sha256, size in conn.execute(
+                "SELECT sha256, size FROM blobs WHERE last_access < ? ORDER BY last_access", (started,)
+            ).fetchall():
+                if total <= target:
+                    break
+                if sha256 == keep:
+                    continue
+                removed.append((sha256,))
+                total -= size
+            conn.executemany("DELETE FROM blobs WHERE sha256 = ?", removed)
+            conn.executemany("DELETE FROM entries WHERE sha256 = ?", removed)
+            # Still under the write lock: a fetch cannot re-publish one of these files meanwhile
+            for (sha256,) in removed:
+                try:
+                    os.remove(self.blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self.evictions += len(removed)
+        return len(removed)
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            files, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            urls = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "urls": urls,
+                "files": files,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            }
+
+
+def fetch_attachments(cache, client, urls, max_workers=4, on_done=None):
+    """Fetch many attachments concurrently over at most max_workers threads
+
+    on_done(url, path, error, done, total) is called from the calling thread
+    as each download finishes. Returns (paths, failed): url -> local path
+    and url -> error message.
+    """
+    urls = list(dict.fromkeys(urls))
+    paths, failed = {}, {}
+    if not urls:
+        return paths, failed
+    workers = max(1, min(max_workers, KHMDHS_MAX_WORKERS, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(cache.fetch, client, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            path, error = None, None
+            try:
+                path = paths[url] = future.result()
+            except Exception as e:
+                error = failed[url] = f"{type(e).__name__}: {e}"
+            if on_done:
+                on_done(url, path, error, len(paths) + len(failed), len(urls))
+    return paths, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Έγγραφα διαγωνισμών ΚΗΜΔΗΣ")
+    parser.add_argument("--cache-dir", default=ATTACHMENT_CACHE_DIR, help="attachment cache directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch_cmd = sub.add_parser("fetch", help="download the attachments of notices (ΑΔΑΜ)")
+    fetch_cmd.add_argument("adam", nargs="+")
+    fetch_cmd.add_argument("--workers", type=int, default=4, help=f"parallel downloads (max {KHMDHS_MAX_WORKERS})")
+    sub.add_parser("stats", help="cache size and counters")
+    prune_cmd = sub.add_parser("prune", help="evict least recently used files down to a size")
+    prune_cmd.add_argument("--max-mb", type=int, required=True)
+    args = parser.parse_args(argv)
+
+    cache = AttachmentCache(args.cache_dir)
+    if args.command == "fetch":
+        urls = {get_khmdhs_pdf_link(adam): adam for adam in args.adam}
+        paths, failed = fetch_attachments(
+            cache,
+            create_khmdhs_client(),
+            urls,
+            max_workers=args.workers,
+            on_done=lambda url, path, error, done, total: print(
+                f"[{done}/{total}] {urls[url]} {path or error}", file=sys.stderr
+            )
+        )
+        print(json.dumps({"fetched": len(paths), "failed": len(failed), **cache.stats()}))
+        return 1 if failed else 0
+    elif args.command == "stats":
+        print(json.dumps(cache.stats()))
+    elif args.command == "prune":
+        print(json.dumps({"evicted": cache.evict(max_bytes=args.max_mb * 1024 * 1024)}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
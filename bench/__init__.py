@@ -0,0 +1,9 @@
+"""Offline benchmarks of the fetch, parse, filter, aggregate and export paths
+
+Everything runs against bench.fake_server, a local stand-in for the ΚΗΜΔΗΣ
+and Διαύγεια APIs that serves seeded synthetic data, so two runs with the
+same seed measure the same work:
+
+    python -m bench.run --scales 1k,100k,1m
+    python -m bench.fake_server --port 8765 --notices 100000 --error-rate 0.02
+"""
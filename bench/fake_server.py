@@ -0,0 +1,246 @@
+"""Local stand-in for the ΚΗΜΔΗΣ and Διαύγεια open-data APIs
+
+Serves the seeded pages of bench.synthetic on the paths the dashboard
+calls, with a configurable per-request latency and a share of requests
+answered 429 (with Retry-After) or 5xx, so the retrying client is exercised
+as it is against the live services:
+
+    POST /khmdhs-opendata/notice?page=N                   ΚΗΜΔΗΣ search pages
+    GET  /khmdhs-opendata/notice/attachment/<ref>         a small fake PDF
+    GET  /opendata/organizations                          Διαύγεια organizations
+    GET  /opendata/search?from_issue_date=...&page=N      Διαύγεια decisions
+
+The filters of the search body are ignored: every search returns the same
+dataset. bench.run starts one per scale in a child process, so serving does
+not compete with the measured client for the GIL; it can also run on its
+own, e.g. for DIAVGEIA_BASE_URL=http://127.0.0.1:8765/opendata:
+
+    python -m bench.fake_server --port 8765 --notices 100000 --latency-ms 50 --error-rate 0.02
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench.synthetic import decision_page, notice_page, organization_labels
+
+ERROR_STATUSES = (429, 500, 502, 503)
+
+
+class FakeServer:
+    """Threaded HTTP server of synthetic data, started in a daemon thread
+
+        with FakeServer(notices=1000, latency_ms=20) as server:
+            client = ApiClient(server.url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, seed=42, notices=1000, page_size=1000,
+                 decisions_per_day=100, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, retry_after=0):
+        self.seed = seed
+        self.notices = notices
+        self.page_size = page_size
+        self.decisions_per_day = decisions_per_day
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # Retry-After of the 429 answers, in seconds
+        self.retry_after = retry_after
+        self.org_labels = organization_labels()
+        self.counts = {"requests": 0, "errors": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        # Latency and errors draw from their own generator so they do not shift the data
+        self._random = random.Random(seed)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    # ------------------------------------------------------------------
+    # Responses
+    # ------------------------------------------------------------------
+
+    def _draw(self):
+        """(delay in seconds, error status or None) of one request"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            status = self._random.choice(ERROR_STATUSES) if failed else None
+            self.counts["requests"] += 1
+            self.counts["errors"] += failed
+        return delay, status
+
+    def notices_body(self, page):
+        content = notice_page(self.seed, page, self.page_size, self.notices)
+        return {
+            "content": content,
+            "totalElements": self.notices,
+            "totalPages": max(1, -(-self.notices // self.page_size)),
+            "size": self.page_size,
+            "number": page,
+            "numberOfElements": len(content),
+        }
+
+    def decisions_body(self, query):
+        """Decisions of a [from, to] issue-date window, paged like Διαύγεια: days in order"""
+        day_from = date.fromisoformat(query.get("from_issue_date", [date.today().isoformat()])[0])
+        day_to = date.fromisoformat(query.get("to_issue_date", [day_from.isoformat()])[0])
+        page = int(query.get("page", ["0"])[0])
+        size = int(query.get("size", ["500"])[0])
+        days = (day_to - day_from).days + 1
+        total = days * self.decisions_per_day
+
+        decisions = []
+        position = page * size
+        while len(decisions) < size and position < total:
+            day, offset = divmod(position, self.decisions_per_day)
+            # Pages of the day's list are aligned to `size`; take the slice we need from it
+            day_page = decision_page(self.seed, day_from + timedelta(days=day), offset // size, size,
+                                     self.decisions_per_day)
+            chunk = day_page[offset % size:][:size - len(decisions)]
+            decisions.extend(chunk)
+            position += len(chunk)
+        return {"info": {"total": total, "page": page, "size": size}, "decisions": decisions}
+
+    def organizations_body(self):
+        return {"organizations": [{"uid": uid, "label": label} for uid, label in self.org_labels.items()]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                url = urlparse(self.path)
+                if url.path != "/khmdhs-opendata/notice":
+                    self._send(404, b"")
+                    return
+                page = int(parse_qs(url.query).get("page", ["0"])[0])
+                self._respond(lambda: server.notices_body(page))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.startswith("/khmdhs-opendata/notice/attachment/"):
+                    self._respond(lambda: b"%PDF-1.4\n% synthetic " + url.path.encode("utf-8") + b"\n%%EOF\n",
+                                  content_type="application/pdf")
+                elif url.path.endswith("/organizations"):
+                    self._respond(server.organizations_body)
+                elif url.path.endswith("/search"):
+                    query = parse_qs(url.query)
+                    self._respond(lambda: server.decisions_body(query))
+                else:
+                    self._send(404, b"")
+
+            def _respond(self, build, content_type="application/json"):
+                delay, status = server._draw()
+                if delay:
+                    time.sleep(delay)
+                if status is not None:
+                    headers = {"Retry-After": str(server.retry_after)} if status == 429 else {}
+                    self._send(status, b"", headers=headers)
+                    return
+                body = build()
+                if not isinstance(body, bytes):
+                    body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self._send(200, body, content_type)
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.counts["bytes"] += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _serve(options, ready):
+    server = FakeServer(**options)
+    ready.put(server.url)
+    server.httpd.serve_forever()
+
+
+@contextlib.contextmanager
+def serve_in_process(**options):
+    """Run a FakeServer in a child process, yields its URL"""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    process = context.Process(target=_serve, args=(options, ready), name="fake-server", daemon=True)
+    process.start()
+    try:
+        yield ready.get(timeout=60)
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Τοπικός ψευδο-διακομιστής ΚΗΜΔΗΣ/Διαύγεια")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--notices", type=int, default=1000, help="ΚΗΜΔΗΣ notices in the dataset")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--decisions-per-day", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/5xx")
+    args = parser.parse_args(argv)
+
+    server = FakeServer(
+        args.host, args.port, seed=args.seed, notices=args.notices, page_size=args.page_size,
+        decisions_per_day=args.decisions_per_day, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+    )
+    print(f"Serving on {server.url} (ΚΗΜΔΗΣ: {server.url}, Διαύγεια: {server.url}/opendata)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,392 @@
+"""Benchmark harness: fetch, ingest, parse, filter, aggregate and export
+
+Runs every benchmark at every scale against seeded synthetic data and a
+local fake server (bench.fake_server), and prints one row per step:
+
+    step              what is measured                               ops
+    fetch             ΚΗΜΔΗΣ pages over HTTP (iter_khmdhs_pages)     notices
+    ingest            Διαύγεια pages and normalization               decisions
+    parse             parse_notices per page + concat_tables         notices
+    filter.build      FilterIndex over the announcements             rows
+    filter.select     random sidebar filter combinations             queries
+    aggregate.*       aggregate_khmdhs, cpv_pairs + cpv_rollup       notices
+    export.*          export_table to csv, parquet (xlsx <= 100k)    notices
+    archive.append    Archive.append of the notices over 5 years     notices
+    archive.trend     trends of every grain and dimension            queries
+
+with throughput, latency percentiles per request/page/query where the step
+has them, and the peak traced memory. The peak comes from a second run of
+the step under tracemalloc, which slows allocation-heavy code several times
+and does not see memory allocated by pyarrow; --no-memory skips it.
+
+    python -m bench.run --scales 1k,100k,1m
+    python -m bench.run --scales 100k --only parse,aggregate --json after.json --baseline before.json
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from aggregates import aggregate_khmdhs
+from archive import ARCHIVE_SOURCES, GRAINS, Archive
+from bench.fake_server import serve_in_process
+from bench.synthetic import announcements_frame, iter_notice_pages
+from cpv_index import cpv_pairs, cpv_rollup
+from diavgeia_api import create_diavgeia_client, ingest_announcements
+from exports import export_table
+from filter_index import FilterIndex
+from http_client import ApiClient
+from instrumentation import metrics
+from khmdhs_api import KHMDHS_MAX_WORKERS, build_khmdhs_payload, iter_khmdhs_pages
+from notice_table import concat_tables, parse_notices
+
+BENCHMARKS = ("fetch", "ingest", "parse", "filter", "aggregate", "export", "archive")
+SCALE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# Days of Διαύγεια decisions the ingest benchmark spreads the rows over
+INGEST_DAYS = 30
+FILTER_QUERIES = 200
+XLSX_MAX_BENCH_ROWS = 100_000
+# Years the archive benchmark spreads the notices' registration dates over
+ARCHIVE_YEARS = 5
+
+COLUMNS = ["step", "scale", "ops", "seconds", "ops_per_s", "p50_ms", "p95_ms", "p99_ms", "peak_mb", "detail"]
+
+
+def parse_scale(value):
+    """"1k" -> 1000, "1m" -> 1000000, "2500" -> 2500"""
+    value = value.strip().lower()
+    if value[-1:] in SCALE_SUFFIXES:
+        return int(float(value[:-1]) * SCALE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def format_scale(rows):
+    for suffix, factor in sorted(SCALE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+
+def percentiles(latencies):
+    """p50/p95/p99 in milliseconds of a list of seconds"""
+    if not len(latencies):
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def stage_percentiles(name):
+    """p50/p95/p99 of an instrumented stage (instrumentation keeps the last 1000 values)"""
+    summary = metrics.summaries("stage").get(name, {})
+    return {key: summary[key[:3]] * 1000 for key in ("p50_ms", "p95_ms", "p99_ms") if key[:3] in summary}
+
+
+def measure(run, memory, repeat=1):
+    """Time run() `repeat` times and, with memory, once more under tracemalloc for the peak
+
+    run() returns a dict with the number of ops and optionally latencies
+    (seconds), percentiles, seconds (when only part of the call is the
+    measured work) and detail. Returns that dict of the fastest untraced
+    run, with seconds and peak_mb filled in.
+    """
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        attempt = run()
+        attempt.setdefault("seconds", time.perf_counter() - started)
+        if result is None or attempt["seconds"] < result["seconds"]:
+            result = attempt
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+class Suite:
+    """The benchmarks of one scale, sharing the parsed table and announcements"""
+
+    def __init__(self, rows, args):
+        self.rows = rows
+        self.args = args
+        self.results = []
+        self._table = None
+        self._announcements = None
+
+    def record(self, step, result):
+        ops = result["ops"]
+        row = {
+            "step": step,
+            "scale": format_scale(self.rows),
+            "ops": ops,
+            "seconds": result["seconds"],
+            "ops_per_s": ops / result["seconds"] if result["seconds"] else math.nan,
+            **percentiles(result.get("latencies", [])),
+            **result.get("percentiles", {}),
+            "peak_mb": result.get("peak_mb", math.nan),
+            "detail": result.get("detail", ""),
+        }
+        self.results.append(row)
+        print(f"{step:<18} {row['scale']:>5} {row['seconds']:9.3f} s  {row['detail']}", flush=True)
+
+    def server_options(self, **options):
+        return dict(
+            seed=self.args.seed, page_size=self.args.page_size, latency_ms=self.args.latency_ms,
+            jitter_ms=self.args.jitter_ms, error_rate=self.args.error_rate, **options
+        )
+
+    # ------------------------------------------------------------------
+    # Shared inputs, built outside the measured runs
+    # ------------------------------------------------------------------
+
+    def parse_pages(self, latencies=None):
+        """(table, seconds spent in parse_notices and concat_tables); generating
+        the raw pages is not counted"""
+        tables, seconds = [], 0.0
+        for content in iter_notice_pages(self.args.seed, self.rows, self.args.page_size):
+            started = time.perf_counter()
+            tables.append(parse_notices(content))
+            elapsed = time.perf_counter() - started
+            seconds += elapsed
+            if latencies is not None:
+                latencies.append(elapsed)
+            del content
+        started = time.perf_counter()
+        table = concat_tables(tables)
+        return table, seconds + time.perf_counter() - started
+
+    def table(self):
+        if self._table is None:
+            self._table, _ = self.parse_pages()
+        return self._table
+
+    def announcements(self):
+        if self._announcements is None:
+            self._announcements = announcements_frame(self.args.seed, self.rows)
+        return self._announcements
+
+    # ------------------------------------------------------------------
+    # Benchmarks
+    # ------------------------------------------------------------------
+
+    def fetch(self):
+        with serve_in_process(**self.server_options(notices=self.rows)) as url:
+            def run():
+                metrics.reset()
+                client = ApiClient(url, pool_size=KHMDHS_MAX_WORKERS, backoff=0.01, max_backoff=0.05,
+                                   headers={"Accept": "application/json"})
+                notices = pages = 0
+                for _, content in iter_khmdhs_pages(client, build_khmdhs_payload({}),
+                                                    max_workers=self.args.workers):
+                    notices += len(content)
+                    pages += 1
+                summary = client.metrics.summary()
+                payload = metrics.summaries("payload").get("khmdhs.page", {})
+                return {
+                    "ops": notices,
+                    "percentiles": stage_percentiles("khmdhs.request"),
+                    "detail": f"{pages} pages, {payload.get('sum', 0) / 2**20:.1f} MB, "
+                              f"{summary['retries']} retries",
+                }
+
+            self.record("fetch", measure(run, self.args.memory, self.args.repeat))
+
+    def ingest(self):
+        per_day = max(1, -(-self.rows // (INGEST_DAYS + 1)))
+        with serve_in_process(**self.server_options(decisions_per_day=per_day)) as url:
+            def run():
+                metrics.reset()
+                client = create_diavgeia_client(base_url=f"{url}/opendata")
+                client.limiter = None
+                client.backoff, client.max_backoff = 0.01, 0.05
+                df = ingest_announcements(days=INGEST_DAYS, client=client, max_workers=self.args.workers)
+                summary = client.metrics.summary()
+                return {
+                    "ops": len(df),
+                    "percentiles": stage_percentiles("diavgeia.request"),
+                    "detail": f"{summary['requests']} requests, {summary['retries']} retries",
+                }
+
+            self.record("ingest", measure(run, self.args.memory, self.args.repeat))
+
+    def parse(self):
+        def run():
+            latencies = []
+            table, seconds = self.parse_pages(latencies)
+            self._table = table
+            return {"ops": len(table), "seconds": seconds, "latencies": latencies,
+                    "detail": f"{table.memory_usage(deep=True).sum() / 2**20:.1f} MB table"}
+
+        self.record("parse", measure(run, self.args.memory, self.args.repeat))
+
+    def filter(self):
+        df = self.announcements()
+        self.record("filter.build", measure(
+            lambda: {"ops": FilterIndex(df).size, "detail": f"{len(df)} announcements"}, self.args.memory, self.args.repeat
+        ))
+
+        index = FilterIndex(df)
+        rng = np.random.default_rng(self.args.seed)
+        low, high = index.bounds("published_date")
+        span = (high - low) / np.timedelta64(1, "D")
+        queries = []
+        for _ in range(FILTER_QUERIES):
+            equals = {col: None for col in ("type", "specialty", "organization", "status")}
+            for col in rng.choice(list(equals), size=int(rng.integers(0, 3)), replace=False):
+                equals[col] = index.options[col][rng.integers(len(index.options[col]))]
+            start = low + pd.Timedelta(days=float(rng.uniform(0, span)))
+            ranges = {"published_date": (start, start + pd.Timedelta(days=int(rng.integers(7, 90))))}
+            if rng.random() < 0.5:
+                ranges["positions"] = (1, int(rng.integers(1, 40)))
+            queries.append((equals, ranges))
+
+        def run():
+            latencies, matched = [], 0
+            for equals, ranges in queries:
+                started = time.perf_counter()
+                matched += len(index.select(equals, ranges))
+                latencies.append(time.perf_counter() - started)
+            return {"ops": len(queries), "latencies": latencies,
+                    "detail": f"{matched / len(queries):.0f} rows matched on average"}
+
+        self.record("filter.select", measure(run, self.args.memory, self.args.repeat))
+
+    def aggregate(self):
+        table = self.table()
+        self.record("aggregate.khmdhs", measure(
+            lambda: {"ops": len(table), "detail": f"{len(aggregate_khmdhs(table))} dimensions"}, self.args.memory, self.args.repeat
+        ))
+
+        def run():
+            pairs = cpv_pairs(table)
+            nodes = sum(len(cpv_rollup(pairs, level)) for level in (2, 3, 4, 5))
+            return {"ops": len(table), "detail": f"{len(pairs)} pairs, {nodes} nodes at levels 2-5"}
+
+        self.record("aggregate.cpv", measure(run, self.args.memory, self.args.repeat))
+
+    def export(self):
+        table = self.table()
+        formats = ["csv", "parquet"] + (["xlsx"] if self.rows <= XLSX_MAX_BENCH_ROWS else [])
+        with tempfile.TemporaryDirectory(prefix="bench-export-") as directory:
+            for fmt in formats:
+                path = os.path.join(directory, f"notices.{fmt}")
+
+                def run():
+                    rows = export_table(table, path)
+                    return {"ops": rows, "detail": f"{os.path.getsize(path) / 2**20:.1f} MB"}
+
+                self.record(f"export.{fmt}", measure(run, self.args.memory, self.args.repeat))
+
+    def archive(self):
+        table = self.table().copy()
+        rng = np.random.default_rng(self.args.seed)
+        seconds = rng.integers(ARCHIVE_YEARS * 365 * 86400, size=len(table))
+        table["registration_date"] = (
+            pd.Timestamp("2021-01-01", tz="UTC") + pd.to_timedelta(seconds, unit="s")
+        )
+        with tempfile.TemporaryDirectory(prefix="bench-archive-") as directory:
+            def run():
+                archive = Archive(tempfile.mkdtemp(dir=directory))
+                added = archive.append("khmdhs", table)
+                stats = archive.stats()["khmdhs"]
+                return {"ops": added, "detail": f"{stats['files']} files, {stats['rollup_rows']} rollup rows"}
+
+            self.record("archive.append", measure(run, self.args.memory, self.args.repeat))
+
+            archive = Archive(os.path.join(directory, "trend"))
+            archive.append("khmdhs", table)
+            queries = [(grain, dimension) for grain in GRAINS for dimension in ARCHIVE_SOURCES["khmdhs"]["dimensions"]]
+
+            def run():
+                latencies, points = [], 0
+                for grain, dimension in queries:
+                    started = time.perf_counter()
+                    points += len(archive.trend("khmdhs", grain, dimension, top=10))
+                    latencies.append(time.perf_counter() - started)
+                return {"ops": len(queries), "latencies": latencies,
+                        "detail": f"{points} points over {ARCHIVE_YEARS} years"}
+
+            self.record("archive.trend", measure(run, self.args.memory, self.args.repeat))
+
+
+def format_table(frame):
+    return frame.to_string(index=False, na_rep="-", float_format=lambda value: f"{value:,.2f}")
+
+
+def compare(results, baseline_path):
+    """Results with the seconds of a baseline run and the speedup against it"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = pd.DataFrame(json.load(f)["results"])
+    frame = pd.DataFrame(results)
+    merged = frame.merge(baseline[["step", "scale", "seconds"]], on=["step", "scale"], how="left",
+                         suffixes=("", "_baseline"))
+    merged["speedup"] = merged["seconds_baseline"] / merged["seconds"]
+    return merged[["step", "scale", "seconds_baseline", "seconds", "speedup"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks εκτός σύνδεσης με συνθετικά δεδομένα")
+    parser.add_argument("--scales", default="1k,100k,1m", help="comma-separated row counts (1k, 100k, 1m, ...)")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"comma-separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-size", type=int, default=1000, help="notices per fake ΚΗΜΔΗΣ page")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake server latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of requests answered 429/5xx")
+    parser.add_argument("--workers", type=int, default=KHMDHS_MAX_WORKERS, help="parallel requests")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per step, the fastest is kept")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc runs")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    # The fetch and ingest steps read their latencies from the stage timers
+    metrics.enabled = True
+    results = []
+    started = time.perf_counter()
+    for rows in map(parse_scale, args.scales.split(",")):
+        suite = Suite(rows, args)
+        for name in BENCHMARKS:
+            if name in selected:
+                getattr(suite, name)()
+        results.extend(suite.results)
+        del suite
+        gc.collect()
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print()
+    print(format_table(pd.DataFrame(results, columns=COLUMNS)))
+    print(f"\n{time.perf_counter() - started:.1f} s in total, peak RSS {peak_rss_mb:.0f} MB")
+    if args.baseline:
+        print()
+        print(format_table(compare(results, args.baseline)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "options": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+                "peak_rss_mb": peak_rss_mb,
+                "results": results,
+            }, f, ensure_ascii=False, indent=2, default=float)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""Seeded synthetic ΚΗΜΔΗΣ notices and Διαύγεια decisions
+
+Every page is generated from its own generator seeded with (seed, page), so
+a page is the same whichever order, process or thread asks for it, and a
+1M-row dataset never has to exist in memory at once. The records have the
+shape of the real API responses (nested organization/contractType, cpvs,
+issueDate in epoch milliseconds, extraFieldValues) so they go through the
+same parsing code as live data.
+"""
+import functools
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from diavgeia_api import normalize_decisions
+from khmdhs_api import KHMDHS_CONTRACT_TYPES
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# Registration dates are spread over this many days after EPOCH
+DATE_SPAN_DAYS = 365
+
+ORGANIZATION_KINDS = ("ΔΗΜΟΣ", "ΠΕΡΙΦΕΡΕΙΑ", "ΓΕΝΙΚΟ ΝΟΣΟΚΟΜΕΙΟ", "ΠΑΝΕΠΙΣΤΗΜΙΟ", "ΔΕΥΑ")
+PLACES = (
+    "ΑΘΗΝΑΙΩΝ", "ΘΕΣΣΑΛΟΝΙΚΗΣ", "ΠΑΤΡΩΝ", "ΗΡΑΚΛΕΙΟΥ", "ΛΑΡΙΣΑΣ", "ΒΟΛΟΥ", "ΙΩΑΝΝΙΝΩΝ",
+    "ΧΑΝΙΩΝ", "ΚΑΛΑΜΑΤΑΣ", "ΣΕΡΡΩΝ", "ΚΟΖΑΝΗΣ", "ΡΟΔΟΥ", "ΚΑΒΑΛΑΣ", "ΤΡΙΚΑΛΩΝ",
+)
+ORGANIZATIONS = [f"{kind} {place}" for kind in ORGANIZATION_KINDS for place in PLACES]
+
+TITLE_SUBJECTS = (
+    "Προμήθεια υγρών καυσίμων", "Προμήθεια ηλεκτρονικών υπολογιστών", "Προμήθεια φαρμάκων",
+    "Παροχή υπηρεσιών καθαρισμού", "Παροχή υπηρεσιών φύλαξης", "Συντήρηση οδικού δικτύου",
+    "Κατασκευή αποχετευτικού δικτύου", "Εκπόνηση μελέτης", "Προμήθεια ειδών γραφείου",
+    "Προμήθεια τροφίμων", "Ανάπτυξη λογισμικού", "Ασφάλιση οχημάτων",
+)
+
+# CPV divisions the generated codes are drawn from, with their labels
+CPV_DIVISIONS = {
+    "03": "Γεωργικά προϊόντα", "09": "Προϊόντα πετρελαίου και καύσιμα",
+    "15": "Τρόφιμα και ποτά", "30": "Μηχανές γραφείου και υπολογιστές",
+    "33": "Ιατρικός εξοπλισμός και φαρμακευτικά προϊόντα", "34": "Εξοπλισμός μεταφορών",
+    "39": "Έπιπλα", "44": "Κατασκευαστικές δομές και υλικά", "45": "Κατασκευαστικές εργασίες",
+    "48": "Πακέτα λογισμικού", "50": "Υπηρεσίες επισκευής και συντήρησης",
+    "66": "Χρηματοοικονομικές και ασφαλιστικές υπηρεσίες", "71": "Αρχιτεκτονικές υπηρεσίες",
+    "72": "Υπηρεσίες πληροφορικής", "79": "Επιχειρηματικές υπηρεσίες",
+    "90": "Υπηρεσίες αποχέτευσης και καθαρισμού",
+}
+CPV_POOL_SIZE = 400
+
+# Subjects whose keywords the Διαύγεια classifiers recognize
+DECISION_TEMPLATES = (
+    "ΠΡΟΚΗΡΥΞΗ ΓΙΑ ΤΗΝ ΠΛΗΡΩΣΗ ({n}) ΘΕΣΕΩΝ {specialty} ΜΕ ΣΥΜΒΑΣΗ ΟΡΙΣΜΕΝΟΥ ΧΡΟΝΟΥ",
+    "Ανακοίνωση πρόσληψης {n} ατόμων {specialty} με σύμβαση ΙΔΑΧ",
+    "Πρόσκληση εκδήλωσης ενδιαφέροντος για μετάταξη {specialty}",
+    "Προκήρυξη {n} θέσεων μόνιμου προσωπικού κλάδου {specialty}",
+    "Πλήρωση θέσης προϊσταμένου διεύθυνσης",
+    "Πρόσληψη ειδικών επιστημόνων {specialty}",
+)
+SPECIALTIES = (
+    "ΙΑΤΡΩΝ", "ΝΟΣΗΛΕΥΤΩΝ", "ΠΛΗΡΟΦΟΡΙΚΗΣ", "ΜΗΧΑΝΙΚΩΝ", "ΟΙΚΟΝΟΜΟΛΟΓΩΝ",
+    "ΝΟΜΙΚΩΝ", "ΕΚΠΑΙΔΕΥΤΙΚΩΝ", "ΤΕΧΝΙΚΩΝ", "ΟΔΗΓΩΝ", "ΔΙΟΙΚΗΤΙΚΩΝ",
+)
+DECISION_ORGANIZATIONS = 300
+# Share of decisions that carry an explicit deadline in extraFieldValues
+DEADLINE_SHARE = 0.3
+ADA_ALPHABET = np.array(list("ΑΒΓΔΕΖΗΘΙΚΛΜΝΞΟΠΡΣΤΥΦΧΨΩ0123456789"))
+
+
+def _rng(*key):
+    return np.random.default_rng(list(key))
+
+
+def _iso(timestamps):
+    return [ts.strftime("%Y-%m-%dT%H:%M:%SZ") for ts in timestamps]
+
+
+@functools.lru_cache(maxsize=8)
+def cpv_pool(seed):
+    """(code, label) of the CPV codes notices draw from, the same for every page"""
+    rng = _rng(seed, 0xC0DE)
+    divisions = list(CPV_DIVISIONS)
+    codes = {}
+    while len(codes) < CPV_POOL_SIZE:
+        division = divisions[rng.integers(len(divisions))]
+        # Trailing zeros keep the codes spread over every level of the hierarchy
+        depth = int(rng.integers(1, 7))
+        digits = (division + "".join(map(str, rng.integers(0, 10, depth)))).ljust(8, "0")[:8]
+        codes[digits] = f"{digits}-{rng.integers(10)}"
+    return [(code, f"{CPV_DIVISIONS[digits[:2]]} ({digits})") for digits, code in sorted(codes.items())]
+
+
+def notice_page(seed, page, size, total):
+    """Page `page` (0-based) of `total` notices, `size` per page, as raw API items"""
+    start = page * size
+    count = max(0, min(size, total - start))
+    if not count:
+        return []
+    rng = _rng(seed, page)
+    pool = cpv_pool(seed)
+    contract_types = [(key, label) for label, key in KHMDHS_CONTRACT_TYPES.items() if key]
+
+    organizations = rng.integers(len(ORGANIZATIONS), size=count)
+    subjects = rng.integers(len(TITLE_SUBJECTS), size=count)
+    types = rng.integers(len(contract_types), size=count)
+    budgets = np.round(rng.lognormal(mean=10.5, sigma=1.4, size=count), 2)
+    offsets = rng.integers(DATE_SPAN_DAYS * 86400, size=count)
+    durations = rng.integers(10, 60, size=count)
+    cpv_counts = rng.integers(1, 4, size=count)
+    cpv_picks = rng.integers(len(pool), size=(count, 3))
+
+    registered = [EPOCH + timedelta(seconds=int(offset)) for offset in offsets]
+    deadlines = [ts + timedelta(days=int(days)) for ts, days in zip(registered, durations)]
+    registered, deadlines = _iso(registered), _iso(deadlines)
+
+    items = []
+    for i in range(count):
+        index = start + i
+        key, label = contract_types[types[i]]
+        items.append({
+            "referenceNumber": f"25PROC{index:09d}",
+            "title": f"{TITLE_SUBJECTS[subjects[i]]} για τις ανάγκες του {ORGANIZATIONS[organizations[i]]}",
+            "organization": {"key": str(100000 + organizations[i]), "value": ORGANIZATIONS[organizations[i]]},
+            "contractType": {"key": key, "value": label},
+            "totalCostWithoutVAT": float(budgets[i]),
+            "submissionDate": registered[i],
+            "finalSubmissionDate": deadlines[i],
+            "cpvs": [
+                {"key": pool[pick][0], "value": pool[pick][1]}
+                for pick in dict.fromkeys(cpv_picks[i, :cpv_counts[i]].tolist())
+            ],
+        })
+    return items
+
+
+def iter_notice_pages(seed, total, size):
+    """Yield every page of notice_page for a dataset of `total` notices"""
+    for page in range(-(-total // size)):
+        yield notice_page(seed, page, size, total)
+
+
+def organization_labels():
+    """Διαύγεια organization uid -> label"""
+    return {f"{50000 + i}": f"{ORGANIZATIONS[i % len(ORGANIZATIONS)]} ({i})" for i in range(DECISION_ORGANIZATIONS)}
+
+
+def decision_page(seed, day, page, size, per_day):
+    """Page `page` of the `per_day` decisions issued on `day` (a date)"""
+    start = page * size
+    count = max(0, min(size, per_day - start))
+    if not count:
+        return []
+    rng = _rng(seed, day.toordinal(), page)
+    templates = rng.integers(len(DECISION_TEMPLATES), size=count)
+    specialties = rng.integers(len(SPECIALTIES), size=count)
+    positions = rng.integers(1, 40, size=count)
+    organizations = rng.integers(DECISION_ORGANIZATIONS, size=count)
+    seconds = rng.integers(8 * 3600, 20 * 3600, size=count)
+    deadlines = rng.integers(10, 45, size=count)
+    with_deadline = rng.random(count) < DEADLINE_SHARE
+    suffixes = rng.integers(len(ADA_ALPHABET), size=(count, 4))
+
+    midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    decisions = []
+    for i in range(count):
+        issued = midnight + timedelta(seconds=int(seconds[i]))
+        decisions.append({
+            "ada": f"{day:%y%m%d}{''.join(ADA_ALPHABET[suffixes[i]])}-{start + i:05d}",
+            "subject": DECISION_TEMPLATES[templates[i]].format(n=positions[i], specialty=SPECIALTIES[specialties[i]]),
+            "organizationId": str(50000 + organizations[i]),
+            "issueDate": int(issued.timestamp() * 1000),
+            "extraFieldValues": (
+                {"deadline": (issued + timedelta(days=int(deadlines[i]))).strftime("%Y-%m-%d")}
+                if with_deadline[i] else {}
+            ),
+        })
+    return decisions
+
+
+def announcements_frame(seed, rows, per_day=1000, now=None):
+    """Normalized announcements (the FilterIndex input) of `rows` decisions,
+    `per_day` of them on every day from EPOCH on"""
+    labels = organization_labels()
+    chunks = []
+    for i in range(-(-rows // per_day)):
+        decisions = decision_page(seed, EPOCH.date() + timedelta(days=i), 0, per_day, min(per_day, rows - i * per_day))
+        chunks.append(normalize_decisions(decisions, labels, now=now))
+    return pd.concat(chunks, ignore_index=True)
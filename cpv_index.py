@@ -0,0 +1,242 @@
+"""CPV code hierarchy: prefix index, descendant expansion and rollups
+
+CPV codes ("30192000-1") are 8 digits and a check digit, and the hierarchy
+is positional: 2 digits are the division, 3 the group, 4 the class, 5 the
+category and every further non-zero digit a finer level. A code's node is
+its digits without the trailing zeros ("30192"), so the descendants of a
+node are exactly the nodes starting with it. CpvTree keeps the nodes in one
+sorted array and answers "everything under 3019" with two binary searches.
+
+The tree is built from the official CPV list when CPV_CODES_PATH points to
+it (xlsx or csv: code and label columns) and from the codes of the stored
+notices. Rollups work on (notice, code) pairs: the prefix of an 8-digit
+code at level L is code // 10 ** (8 - L), so counts and budgets at any
+level are one integer group-by:
+
+    python cpv_index.py rollup --level 3
+    python cpv_index.py expand 3019
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+CPV_CODES_PATH = os.environ.get("CPV_CODES_PATH", "data/cpv_2008.xlsx")
+
+# Node length -> level name
+CPV_LEVELS = {2: "Διαίρεση", 3: "Ομάδα", 4: "Τάξη", 5: "Κατηγορία"}
+
+_DIGITS = re.compile(r"\D")
+
+
+def cpv_digits(code):
+    """The 8 digits of a CPV code ("30192000-1" -> "30192000"), or None"""
+    if not isinstance(code, str):
+        return None
+    digits = _DIGITS.sub("", code.split("-")[0])
+    return digits if len(digits) == 8 else None
+
+
+def cpv_node(value):
+    """Hierarchy node of a code or of a node prefix ("30190000-7" and "3019" -> "3019")
+
+    Only a full 8-digit code loses its trailing zeros; a shorter value is a
+    node already and is kept as given ("300" is a group, not division "30").
+    """
+    digits = _DIGITS.sub("", str(value).split("-")[0])[:8]
+    if len(digits) < 8:
+        return digits
+    node = digits.rstrip("0")
+    return node if len(node) >= 2 else digits[:2]
+
+
+def prefix_range(node):
+    """[low, high) of the 8-digit codes under a node, for range scans on sorted codes"""
+    return node, f"{node}:"  # ":" sorts right after "9"
+
+
+def collapse_prefixes(nodes):
+    """Sorted nodes without the ones already covered by an ancestor in the list"""
+    collapsed = []
+    for node in sorted(set(nodes)):
+        if not collapsed or not node.startswith(collapsed[-1]):
+            collapsed.append(node)
+    return collapsed
+
+
+def notice_cpvs(item):
+    """(8-digit code, full code, label) of every CPV of a raw ΚΗΜΔΗΣ notice"""
+    cpvs = []
+    for cpv in item.get("cpvs") or []:
+        code = cpv.get("key") if isinstance(cpv, dict) else cpv
+        digits = cpv_digits(code)
+        if digits:
+            cpvs.append((digits, code.strip(), cpv.get("value") if isinstance(cpv, dict) else None))
+    return cpvs
+
+
+class CpvTree:
+    """CPV nodes in sorted order, with labels and the full codes under each node"""
+
+    def __init__(self, codes):
+        """codes: iterable of (code, label), codes as the API spells them ("30192000-1")"""
+        labels, full_codes = {}, {}
+        for code, label in codes:
+            if cpv_digits(code) is None:
+                continue
+            node = cpv_node(code)
+            if label and not labels.get(node):
+                labels[node] = label
+            full_codes.setdefault(node, set()).add(code.strip())
+
+        # Every level above a code is a node too, so drill-downs never skip one
+        nodes = set(labels) | set(full_codes)
+        for node in list(nodes):
+            nodes.update(node[:length] for length in range(2, len(node)))
+
+        self.nodes = np.array(sorted(nodes), dtype=str)
+        self.labels = labels
+        self.full_codes = {node: sorted(codes) for node, codes in full_codes.items()}
+        self.children = {}
+        for node in self.nodes.tolist():
+            if len(node) > 2:
+                self.children.setdefault(node[:-1], []).append(node)
+
+    @classmethod
+    def from_file(cls, path):
+        """Official CPV list: the code column and the Greek label column (or the second one)"""
+        df = pd.read_csv(path, dtype=str) if path.endswith(".csv") else pd.read_excel(path, dtype=str)
+        code_column = next((c for c in df.columns if str(c).upper() in ("CODE", "ΚΩΔΙΚΟΣ")), df.columns[0])
+        label_column = next((c for c in df.columns if str(c).upper() in ("EL", "ΠΕΡΙΓΡΑΦΗ")), df.columns[1])
+        return list(zip(df[code_column].fillna(""), df[label_column]))
+
+    @classmethod
+    def load(cls, path=CPV_CODES_PATH, extra=()):
+        """Tree of the official list (when present) and the extra (code, label) pairs"""
+        codes = cls.from_file(path) if path and os.path.exists(path) else []
+        return cls([*codes, *extra])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def label(self, node):
+        return self.labels.get(node, "")
+
+    def describe(self, node):
+        """Node and label ("3019 • Διάφορος εξοπλισμός") for select boxes and charts"""
+        label = self.label(node)
+        return f"{node} • {label}" if label else node
+
+    def descendants(self, node):
+        """The node and every node under it, sorted"""
+        low, high = prefix_range(cpv_node(node))
+        start, stop = np.searchsorted(self.nodes, [low, high])
+        return self.nodes[start:stop].tolist()
+
+    def expand(self, selected):
+        """Full codes (with check digit) of the selected nodes and all their descendants,
+        the form the cpvItems search filter takes"""
+        codes = set()
+        for node in collapse_prefixes(cpv_node(value) for value in selected):
+            for descendant in self.descendants(node):
+                codes.update(self.full_codes.get(descendant, ()))
+        return sorted(codes)
+
+    def options(self, max_level=3):
+        """Nodes up to a level (default divisions and groups), sorted"""
+        return [node for node in self.nodes.tolist() if len(node) <= max_level]
+
+    def to_json(self):
+        """The (code, label) pairs the tree is built from, as JSON bytes"""
+        codes = [[code, self.labels.get(node, "")] for node, full in self.full_codes.items() for code in full]
+        return json.dumps(codes, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data):
+        """Tree rebuilt from the bytes of to_json"""
+        return cls(json.loads(data))
+
+
+def cpv_pairs(table):
+    """(notice, budget, code) per CPV of a parsed notice table: notice is the row
+    position and code the 8-digit code, both integers"""
+    if "cpvs" not in table or table.empty:
+        return pd.DataFrame({
+            "notice": pd.Series(dtype="int64"),
+            "budget": pd.Series(dtype="float64"),
+            "code": pd.Series(dtype="int64"),
+        })
+    exploded = pd.DataFrame({
+        "notice": np.arange(len(table)),
+        "budget": table["budget"].to_numpy(),
+        "cpv": table["cpvs"].to_numpy(),
+    }).explode("cpv", ignore_index=True)
+    keys = exploded["cpv"].map(lambda cpv: cpv.get("key") if isinstance(cpv, dict) else cpv)
+    digits = keys.astype("string").str.split("-").str[0]
+    exploded["code"] = pd.to_numeric(digits.where(digits.str.len() == 8), errors="coerce")
+    exploded = exploded.dropna(subset=["code"])
+    return exploded.drop(columns="cpv").astype({"notice": "int64", "code": "int64"})
+
+
+def cpv_rollup(pairs, level, parent=None):
+    """Notices, total and mean budget per node of a level (2-8), largest budget first
+
+    A notice with several codes under the same node counts once for it.
+    With parent (a node of a higher level, e.g. "301" or a rollup index
+    value like "300"), only the nodes under that node are returned; a
+    parent at or below the level raises ValueError.
+    """
+    frame = pd.DataFrame({
+        "node": pairs["code"].to_numpy() // 10 ** (8 - level),
+        "notice": pairs["notice"].to_numpy(),
+        "budget": pairs["budget"].to_numpy(),
+    })
+    if parent:
+        parent = cpv_node(parent)
+        if not 2 <= len(parent) < level:
+            raise ValueError(f"CPV parent {parent!r} is not above level {level}")
+        frame = frame[frame["node"] // 10 ** (level - len(parent)) == int(parent)]
+    frame = frame.drop_duplicates(["node", "notice"])
+    grouped = frame.groupby("node", sort=False).agg(
+        notices=("notice", "size"),
+        budget=("budget", "sum"),
+    )
+    grouped["mean"] = grouped["budget"] / grouped["notices"]
+    # Integer prefixes lose leading zeros ("03" is division 3)
+    grouped.index = grouped.index.map(lambda value: str(value).zfill(level)).rename("node")
+    return grouped.sort_values("budget", ascending=False)
+
+
+def main(argv=None):
+    from notice_store import NOTICE_STORE_PATH, NoticeStore
+
+    parser = argparse.ArgumentParser(description="Ιεραρχία κωδικών CPV")
+    parser.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    parser.add_argument("--cpv-list", default=CPV_CODES_PATH, help="official CPV list (xlsx/csv)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rollup_cmd = sub.add_parser("rollup", help="notices and budget per CPV node of the stored notices")
+    rollup_cmd.add_argument("--level", type=int, default=2, choices=range(2, 9))
+    rollup_cmd.add_argument("--parent", help="only the nodes under this node")
+    expand_cmd = sub.add_parser("expand", help="full codes under CPV nodes")
+    expand_cmd.add_argument("nodes", nargs="+")
+    args = parser.parse_args(argv)
+
+    store = NoticeStore(args.db)
+    tree = CpvTree.load(args.cpv_list, extra=store.cpv_codes())
+    if args.command == "rollup":
+        try:
+            rollup = cpv_rollup(store.cpv_pairs({}), args.level, parent=args.parent)
+        except ValueError as e:
+            parser.error(str(e))
+        rollup.insert(0, "label", [tree.label(node) for node in rollup.index])
+        print(rollup.to_string())
+    elif args.command == "expand":
+        print("\n".join(tree.expand(args.nodes)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
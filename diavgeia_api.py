@@ -0,0 +1,251 @@
+"""Διαύγεια open-data ingestion for προκηρύξεις πλήρωσης θέσεων
+
+Pages through the Diavgeia search API by decision type and date window,
+fetching all slices concurrently, and normalizes each page into the
+dashboard's announcement schema as it arrives:
+
+    ada, title, type, organization, specialty, positions, published_date,
+    deadline, deadline_estimated, days_remaining, status, link
+
+The base URL can be pointed at a local stub server through the
+DIAVGEIA_BASE_URL environment variable.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from greek_text import fold_accents
+from instrumentation import observe_size, stage
+from http_client import ApiClient, TokenBucket
+
+DIAVGEIA_BASE_URL = os.environ.get("DIAVGEIA_BASE_URL", "https://diavgeia.gov.gr/opendata")
+DIAVGEIA_PAGE_SIZE = 500
+DIAVGEIA_MAX_WORKERS = 8
+DIAVGEIA_RATE_LIMIT = 5.0
+
+# Decision types that carry job announcements (uid -> label)
+DIAVGEIA_DECISION_TYPES = {
+    "2.4.7.1": "ΠΡΟΚΗΡΥΞΗ ΠΛΗΡΩΣΗΣ ΘΕΣΕΩΝ",
+}
+
+# Days in each date window; smaller windows mean more, shorter page chains
+DIAVGEIA_WINDOW_DAYS = 1
+
+# Diavgeia does not publish a submission deadline for announcements, so when
+# none is found in extraFieldValues it is estimated from the issue date.
+DEFAULT_DEADLINE_DAYS = 30
+DEADLINE_FIELDS = ("deadline", "submissionDeadline", "closingDate", "endDate")
+
+ANNOUNCEMENT_SCHEMA = [
+    "ada", "title", "type", "organization", "specialty", "positions",
+    "published_date", "deadline", "deadline_estimated", "days_remaining",
+    "status", "link",
+]
+
+# Keyword rules on the accent-free, uppercase subject; first match wins
+TYPE_RULES = [
+    ("ΜΕΤΑΤΑΞ|ΑΠΟΣΠΑΣ|ΚΙΝΗΤΙΚΟΤΗΤ", "Μετάταξη/Απόσπαση"),
+    ("ΟΡΙΣΜΕΝΟΥ ΧΡΟΝΟΥ|ΣΟΧ|ΣΜΕ", "Πλήρωση θέσεων με σύμβαση ορισμένου χρόνου"),
+    ("ΙΔΑΧ|ΑΟΡΙΣΤΟΥ ΧΡΟΝΟΥ", "Πλήρωση θέσεων ΙΔΑΧ"),
+    ("ΕΙΔΙΚ\\w* ΕΠΙΣΤΗΜΟΝ|ΕΠΙΣΤΗΜΟΝΙΚΟΥ ΣΥΝΕΡΓΑΤΗ", "Προκήρυξη θέσεων ειδικών επιστημόνων"),
+    ("ΠΡΟΪΣΤΑΜΕΝ|ΠΡΟΙΣΤΑΜΕΝ|ΔΙΕΥΘΥΝΤ|ΔΙΟΙΚΗΤ\\w* ΘΕΣ", "Πλήρωση διοικητικών θέσεων"),
+    ("ΜΟΝΙΜ", "Πλήρωση θέσεων μόνιμου προσωπικού"),
+]
+DEFAULT_TYPE = "Πλήρωση θέσεων"
+
+SPECIALTY_RULES = [
+    ("ΙΑΤΡ", "Ιατρών"),
+    ("ΝΟΣΗΛΕΥΤ|ΜΑΙ(?:Ω|ΕΣ)", "Νοσηλευτικού Προσωπικού"),
+    ("ΠΛΗΡΟΦΟΡΙΚ|ΠΡΟΓΡΑΜΜΑΤΙΣΤ|\\bIT\\b", "IT/Πληροφορικής"),
+    ("ΜΗΧΑΝΙΚ", "Μηχανικών"),
+    ("ΟΙΚΟΝΟΜ|ΛΟΓΙΣΤ", "Οικονομολόγων"),
+    ("ΝΟΜΙΚ|ΔΙΚΗΓΟΡ", "Νομικών"),
+    ("ΕΚΠΑΙΔΕΥΤ|ΔΙΔΑΚΤΙΚ|ΕΚΠΑΙΔΕΥΣΗ", "Διδακτικού Προσωπικού"),
+    ("ΤΕΧΝΙΚ", "Τεχνικών"),
+    ("ΚΑΘΑΡΙ|ΒΟΗΘΗΤΙΚ|ΦΥΛΑΞ|ΟΔΗΓ", "Βοηθητικού Προσωπικού"),
+    ("ΔΙΟΙΚΗΤΙΚ", "Διοικητικών"),
+]
+DEFAULT_SPECIALTY = "Λοιπές"
+
+POSITIONS_PATTERN = r"\(?(\d{1,4})\)?\s+(?:[Α-ΩA-Z]+\s+){0,3}?(?:ΘΕΣΕ|ΑΤΟΜ)"
+
+
+def fold_greek(series):
+    """Accent-free uppercase version of a string Series"""
+    return series.fillna("").map(fold_accents)
+
+
+def parse_issue_dates(values):
+    """issueDate arrives as epoch milliseconds; tolerate ISO strings too"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.notna().all():
+        return pd.to_datetime(numeric, unit="ms")
+    return pd.to_datetime(values, errors="coerce", utc=True).dt.tz_localize(None)
+
+
+def classify(folded, rules, default):
+    """Vectorized first-match keyword classification"""
+    conditions = [folded.str.contains(pattern, regex=True) for pattern, _ in rules]
+    return pd.Series(
+        np.select(conditions, [label for _, label in rules], default=default),
+        index=folded.index
+    )
+
+
+def create_diavgeia_client(base_url=None, limiter=None):
+    return ApiClient(
+        base_url or DIAVGEIA_BASE_URL,
+        pool_size=DIAVGEIA_MAX_WORKERS,
+        limiter=limiter or TokenBucket(rate=DIAVGEIA_RATE_LIMIT, capacity=DIAVGEIA_MAX_WORKERS),
+        headers={"Accept": "application/json"}
+    )
+
+
+def fetch_organization_labels(client):
+    """Map of Diavgeia organization uid -> label"""
+    response = client.get("/organizations")
+    return {
+        org["uid"]: org.get("label", org["uid"])
+        for org in response.json().get("organizations", [])
+    }
+
+
+def fetch_decisions_page(client, decision_type, window, page):
+    """One search page for a decision type and [start, end] issue-date window"""
+    with stage("diavgeia.request"):
+        response = client.get("/search", params={
+            "type": decision_type,
+            "from_issue_date": window[0].isoformat(),
+            "to_issue_date": window[1].isoformat(),
+            "page": page,
+            "size": DIAVGEIA_PAGE_SIZE,
+        })
+    observe_size("diavgeia.page", len(response.content))
+    with stage("diavgeia.json"):
+        return response.json()
+
+
+def date_windows(date_from, date_to, window_days=DIAVGEIA_WINDOW_DAYS):
+    """Split [date_from, date_to] into consecutive inclusive windows"""
+    windows = []
+    start = date_from
+    while start <= date_to:
+        end = min(date_to, start + timedelta(days=window_days - 1))
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+
+def iter_decision_pages(client, decision_types, date_from, date_to, max_workers=DIAVGEIA_MAX_WORKERS,
+                        failed=None):
+    """Yield the `decisions` list of every page, in completion order
+
+    Page 0 of every (type, window) slice is requested first; each slice's
+    remaining pages are queued as soon as its total is known, so all
+    slices progress in parallel over a single bounded pool.
+
+    A page that still fails after the client's retries raises, unless a
+    `failed` list is given: its (decision_type, window, page) is then
+    appended and the other pages carry on, as in fetch_khmdhs_pages. A
+    failed page 0 stands for its whole slice, whose size is unknown.
+    """
+    slices = [(t, w) for t in decision_types for w in date_windows(date_from, date_to)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(fetch_decisions_page, client, t, w, 0): (t, w, 0)
+            for t, w in slices
+        }
+        while pending:
+            done = next(as_completed(pending))
+            decision_type, window, page = pending.pop(done)
+            try:
+                body = done.result()
+            except Exception:
+                if failed is None:
+                    raise
+                failed.append((decision_type, window, page))
+                continue
+            if page == 0:
+                total = body.get("info", {}).get("total", 0)
+                pages = -(-total // DIAVGEIA_PAGE_SIZE)
+                for next_page in range(1, pages):
+                    future = pool.submit(fetch_decisions_page, client, decision_type, window, next_page)
+                    pending[future] = (decision_type, window, next_page)
+            yield body.get("decisions", [])
+
+
+def extract_deadline(extra_fields):
+    """First deadline-like value of a decision's extraFieldValues, or None"""
+    for field in DEADLINE_FIELDS:
+        value = (extra_fields or {}).get(field)
+        if value:
+            return value
+    return None
+
+
+def normalize_decisions(decisions, org_labels, now=None):
+    """Convert one page of raw decisions into the announcement schema"""
+    now = now or datetime.now()
+    # A decision without an ΑΔΑ cannot be linked or deduplicated
+    decisions = [d for d in decisions if d.get("ada")]
+    if not decisions:
+        return pd.DataFrame(columns=ANNOUNCEMENT_SCHEMA)
+
+    raw = pd.DataFrame({
+        "ada": [d.get("ada") for d in decisions],
+        "title": [d.get("subject", "") for d in decisions],
+        "organization_id": [d.get("organizationId") for d in decisions],
+        "issue_date": [d.get("issueDate") for d in decisions],
+        "deadline": [extract_deadline(d.get("extraFieldValues")) for d in decisions],
+    })
+    folded = fold_greek(raw["title"])
+
+    df = pd.DataFrame({"ada": raw["ada"], "title": raw["title"]})
+    df["type"] = classify(folded, TYPE_RULES, DEFAULT_TYPE)
+    df["organization"] = raw["organization_id"].map(org_labels).fillna(raw["organization_id"])
+    df["specialty"] = classify(folded, SPECIALTY_RULES, DEFAULT_SPECIALTY)
+    df["positions"] = (
+        folded.str.extract(POSITIONS_PATTERN, expand=False)
+        .astype(float).fillna(1).astype(int)
+    )
+    df["published_date"] = parse_issue_dates(raw["issue_date"])
+    explicit = pd.to_datetime(raw["deadline"], errors="coerce", utc=True).dt.tz_localize(None)
+    df["deadline_estimated"] = explicit.isna()
+    df["deadline"] = explicit.fillna(df["published_date"] + pd.Timedelta(days=DEFAULT_DEADLINE_DAYS))
+    df["days_remaining"] = (df["deadline"] - now).dt.days
+    df["status"] = np.where(df["deadline"] > now, "Ενεργή", "Έληξε")
+    df["link"] = "https://diavgeia.gov.gr/doc/" + df["ada"]
+    return df[ANNOUNCEMENT_SCHEMA]
+
+
+def ingest_announcements(days=30, decision_types=None, client=None, max_workers=DIAVGEIA_MAX_WORKERS,
+                         on_chunk=None, failed=None):
+    """Fetch and normalize the job announcements of the last `days` days
+
+    on_chunk(df) is called with each normalized page as it arrives. With a
+    `failed` list, pages that could not be fetched are collected there (see
+    iter_decision_pages) and the rest is returned; without it they raise.
+    """
+    client = client or create_diavgeia_client()
+    org_labels = fetch_organization_labels(client)
+    date_to = date.today()
+    date_from = date_to - timedelta(days=days)
+
+    chunks = []
+    for decisions in iter_decision_pages(client, list(decision_types or DIAVGEIA_DECISION_TYPES),
+                                         date_from, date_to, max_workers, failed=failed):
+        with stage("diavgeia.normalize"):
+            chunk = normalize_decisions(decisions, org_labels)
+        if chunk.empty:
+            continue
+        chunks.append(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=ANNOUNCEMENT_SCHEMA)
+    df = pd.concat(chunks, ignore_index=True)
+    return df.drop_duplicates("ada").reset_index(drop=True)
@@ -0,0 +1,328 @@
+"""Headless exports of ΚΗΜΔΗΣ search results and Διαύγεια announcements
+
+Runs the dashboard's sidebar search without a browser or the Streamlit
+runtime and streams every matching notice (or every announcement of a
+date range) to CSV, Parquet, JSONL or xlsx one chunk at a time, so memory stays bounded by the chunk size rather than
+the size of the dump. The output is written to a temporary file and moved
+into place only when the export completes. The dashboard uses the same
+writers (export_table) to build downloads on demand.
+
+    python exports.py notices --date-from 2025-01-01 --date-to 2025-01-31 -o jan.parquet
+    python exports.py notices --contract-type Υπηρεσίες --budget-from 50000 -o out.csv
+    python exports.py notices --cpv 3019 --cpv 45 -o cpv.jsonl
+    python exports.py announcements --date-from 2025-01-01 --date-to 2025-06-30 -o announcements.parquet
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+from cpv_index import CPV_CODES_PATH, CpvTree
+from diavgeia_api import (
+    ANNOUNCEMENT_SCHEMA,
+    DIAVGEIA_DECISION_TYPES,
+    DIAVGEIA_MAX_WORKERS,
+    create_diavgeia_client,
+    fetch_organization_labels,
+    iter_decision_pages,
+    normalize_decisions,
+)
+from khmdhs_api import (
+    KHMDHS_CONTRACT_TYPES,
+    KHMDHS_MAX_WORKERS,
+    build_khmdhs_payload,
+    create_khmdhs_client,
+    iter_khmdhs_pages,
+)
+from notice_store import NOTICE_STORE_PATH, NoticeStore
+from notice_table import NOTICE_COLUMNS, parse_notices
+
+EXPORT_FORMATS = ("csv", "parquet", "jsonl", "xlsx")
+EXPORT_COLUMNS = list(NOTICE_COLUMNS.values())
+# Sheet row limit including the header row
+XLSX_MAX_ROWS = 1048576
+
+
+def iter_notice_chunks(filters, source="auto", store=None, client=None, max_workers=4, chunk_size=1000):
+    """Yield lists of raw notices matching the filters
+
+    source="auto" reads the local store when its synced window covers the
+    date range and the API otherwise; "store" and "api" force one of them.
+    """
+    store = store or NoticeStore(NOTICE_STORE_PATH)
+    if source == "store" or (source == "auto" and store.covers(filters)):
+        yield from store.iter_query(filters, chunk_size=chunk_size)
+        return
+    payload = build_khmdhs_payload(filters)
+    for _, content in iter_khmdhs_pages(client or create_khmdhs_client(), payload, max_workers=max_workers):
+        yield content
+
+
+def typed_frame(table):
+    """Copy of a parsed table that every writer accepts: text columns as strings,
+    numeric and datetime columns untouched"""
+    text = [
+        column for column in table.columns
+        if not (pd.api.types.is_numeric_dtype(table[column]) or pd.api.types.is_datetime64_any_dtype(table[column]))
+    ]
+    return table.astype({column: "string" for column in text})
+
+
+def export_frame(content):
+    """Fixed-column frame of one chunk of raw notices"""
+    return typed_frame(parse_notices(content)[EXPORT_COLUMNS])
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.f = open(path, "w", encoding="utf-8-sig", newline="")
+        self.columns = columns
+        self.header = True
+
+    def write(self, frame):
+        frame = frame.copy()
+        for column in frame.columns:
+            if pd.api.types.is_datetime64_any_dtype(frame[column]):
+                frame[column] = frame[column].dt.strftime("%Y-%m-%dT%H:%M:%S%z")
+        frame.to_csv(self.f, index=False, header=self.header, quoting=csv.QUOTE_MINIMAL)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            # No rows: still write the header so consumers see the columns
+            pd.DataFrame(columns=self.columns).to_csv(self.f, index=False)
+        self.f.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, columns):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, frame):
+        frame.to_json(self.f, orient="records", lines=True, date_format="iso", force_ascii=False)
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetWriter:
+    """One row group per chunk; the schema is taken from the first chunk"""
+
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.columns = columns
+        self.writer = None
+
+    def write(self, frame):
+        if self.writer is None:
+            schema = self._pa.Schema.from_pandas(frame, preserve_index=False)
+            self.writer = self._pq.ParquetWriter(self.path, schema)
+        table = self._pa.Table.from_pandas(frame, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            empty = pd.DataFrame({column: pd.Series(dtype="string") for column in self.columns})
+            self._pq.write_table(self._pa.Table.from_pandas(empty, preserve_index=False), self.path)
+        else:
+            self.writer.close()
+
+
+class XlsxWriter:
+    """openpyxl write-only workbook: rows are streamed to the file, not kept as cells"""
+
+    def __init__(self, path, columns):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Διαγωνισμοί")
+        self.header = True
+        self.columns = columns
+        self.rows = 0
+
+    def write(self, frame):
+        if self.header:
+            self.sheet.append(list(frame.columns))
+            self.header = False
+        self.rows += len(frame)
+        if self.rows >= XLSX_MAX_ROWS:
+            raise ValueError(f"Excel supports at most {XLSX_MAX_ROWS - 1:,} rows, use csv or parquet")
+        frame = frame.copy()
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.DatetimeTZDtype):
+                # Excel has no time zones; cells hold UTC
+                frame[column] = frame[column].dt.tz_convert(None)
+        frame = frame.astype(object).where(frame.notna(), None)
+        for row in frame.itertuples(index=False, name=None):
+            self.sheet.append(row)
+
+    def close(self):
+        if self.header:
+            self.sheet.append(self.columns)
+        self.workbook.save(self.path)
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "jsonl": JsonlWriter, "xlsx": XlsxWriter}
+
+
+def write_chunks(frames, path, fmt=None, columns=EXPORT_COLUMNS, on_chunk=None):
+    """Write an iterable of frames to path one at a time, returns the row count
+
+    fmt defaults to the file extension. on_chunk(rows_so_far) is called after
+    every chunk. The file only appears at path once every chunk is written.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.part"
+    rows = 0
+    try:
+        writer = WRITERS[fmt](tmp_path, columns)
+        try:
+            for frame in frames:
+                if frame.empty:
+                    continue
+                writer.write(frame)
+                rows += len(frame)
+                if on_chunk:
+                    on_chunk(rows)
+        finally:
+            writer.close()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return rows
+
+
+def export_notices(filters, path, fmt=None, on_chunk=None, **source_options):
+    """Stream every notice matching the filters to path, returns the row count
+
+    source_options are passed to iter_notice_chunks.
+    """
+    frames = (export_frame(content) for content in iter_notice_chunks(filters, **source_options) if content)
+    return write_chunks(frames, path, fmt, on_chunk=on_chunk)
+
+
+def export_announcements(date_from, date_to, path, fmt=None, on_chunk=None, client=None,
+                         max_workers=DIAVGEIA_MAX_WORKERS, decision_types=None):
+    """Stream every Διαύγεια announcement issued in [date_from, date_to] to path
+
+    One normalized frame per API page; a page that fails after the client's
+    retries aborts the export, so a dump is never silently incomplete.
+    Returns the row count.
+    """
+    client = client or create_diavgeia_client()
+    org_labels = fetch_organization_labels(client)
+    seen = set()
+
+    def frames():
+        pages = iter_decision_pages(client, list(decision_types or DIAVGEIA_DECISION_TYPES),
+                                    date_from, date_to, max_workers)
+        for decisions in pages:
+            frame = normalize_decisions(decisions, org_labels)
+            # A decision can move between pages while the range is paged
+            frame = frame[~frame["ada"].isin(seen)]
+            seen.update(frame["ada"])
+            yield typed_frame(frame)
+
+    return write_chunks(frames(), path, fmt, columns=ANNOUNCEMENT_SCHEMA, on_chunk=on_chunk)
+
+
+def export_table(table, path, fmt=None, chunk_size=5000):
+    """Write an already parsed table (every column) to path in chunks of chunk_size rows"""
+    frames = (typed_frame(table.iloc[start:start + chunk_size]) for start in range(0, len(table), chunk_size))
+    return write_chunks(frames, path, fmt, columns=list(table.columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Εξαγωγή διαγωνισμών ΚΗΜΔΗΣ και προκηρύξεων Διαύγειας")
+    sub = parser.add_subparsers(dest="command", required=True)
+    notices_cmd = sub.add_parser("notices", help="stream all matching notices to a file")
+    notices_cmd.add_argument("-o", "--output", required=True, help="output file (.csv, .parquet, .jsonl, .xlsx)")
+    notices_cmd.add_argument("--format", choices=EXPORT_FORMATS, help="defaults to the output extension")
+    notices_cmd.add_argument("--title", default="")
+    notices_cmd.add_argument("--contract-type", default="Όλα", choices=list(KHMDHS_CONTRACT_TYPES))
+    notices_cmd.add_argument("--date-from", default=(date.today() - timedelta(days=30)).isoformat())
+    notices_cmd.add_argument("--date-to", default=date.today().isoformat())
+    notices_cmd.add_argument("--budget-from", type=float, default=0)
+    notices_cmd.add_argument("--budget-to", type=float, default=1000000)
+    notices_cmd.add_argument("--cpv", action="append", default=[], help="CPV code or prefix with its subcodes, repeatable")
+    notices_cmd.add_argument("--source", choices=("auto", "api", "store"), default="auto")
+    notices_cmd.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    notices_cmd.add_argument("--workers", type=int, default=4, help=f"parallel page requests (max {KHMDHS_MAX_WORKERS})")
+    notices_cmd.add_argument("--chunk-size", type=int, default=1000, help="rows per chunk from the store")
+    announcements_cmd = sub.add_parser("announcements", help="stream the Διαύγεια announcements of a date range")
+    announcements_cmd.add_argument("-o", "--output", required=True, help="output file (.csv, .parquet, .jsonl, .xlsx)")
+    announcements_cmd.add_argument("--format", choices=EXPORT_FORMATS, help="defaults to the output extension")
+    announcements_cmd.add_argument("--date-from", type=date.fromisoformat,
+                                   default=date.today() - timedelta(days=30))
+    announcements_cmd.add_argument("--date-to", type=date.fromisoformat, default=date.today())
+    announcements_cmd.add_argument("--workers", type=int, default=DIAVGEIA_MAX_WORKERS, help="parallel page requests")
+    args = parser.parse_args(argv)
+
+    if args.command == "announcements":
+        try:
+            rows = export_announcements(
+                args.date_from,
+                args.date_to,
+                args.output,
+                fmt=args.format,
+                on_chunk=lambda rows: print(f"{rows:,} announcements", file=sys.stderr),
+                max_workers=args.workers
+            )
+        except Exception as e:
+            print(f"export failed: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps({"output": args.output, "rows": rows}, ensure_ascii=False))
+        return 0
+
+    filters = {
+        "title": args.title,
+        "contractType": KHMDHS_CONTRACT_TYPES[args.contract_type],
+        "dateFrom": args.date_from,
+        "dateTo": args.date_to,
+        "totalCostFrom": args.budget_from,
+        "totalCostTo": args.budget_to
+    }
+    store = NoticeStore(args.db)
+    if args.cpv:
+        filters["cpvItems"] = CpvTree.load(CPV_CODES_PATH, extra=store.cpv_codes()).expand(args.cpv)
+        if not filters["cpvItems"]:
+            print(f"no known CPV codes under {', '.join(args.cpv)}", file=sys.stderr)
+            return 1
+    try:
+        rows = export_notices(
+            filters,
+            args.output,
+            fmt=args.format,
+            on_chunk=lambda rows: print(f"{rows:,} notices", file=sys.stderr),
+            source=args.source,
+            store=store,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size
+        )
+    except Exception as e:
+        print(f"export failed: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps({"output": args.output, "rows": rows}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+"""Precomputed filter index for the Διαύγεια sidebar filters
+
+Built once per dataset, a FilterIndex holds the frame with categorical
+filter columns, the sorted option list of every column, a sorted array of
+row positions per column value, and an argsort of every range column.
+A filter combination is answered by intersecting those arrays, without
+copying or rescanning the frame.
+"""
+import io
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """Row-position index for equality and range filters over a DataFrame"""
+
+    def __init__(self, df, columns=("type", "specialty", "organization", "status"),
+                 range_columns=("positions", "published_date")):
+        self.df = df.reset_index(drop=True).astype({col: "category" for col in columns})
+        self.size = len(self.df)
+        # Identifies this build of the index in memo keys
+        self.token = uuid.uuid4().hex
+        self.options = {}
+        self.postings = {}
+        self.ranges = {}
+
+        for col in columns:
+            categorical = self.df[col].cat.remove_unused_categories()
+            codes = categorical.cat.codes.to_numpy()
+            # Stable sort by code groups the row positions of each value, in order
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(categorical.cat.categories) + 1))
+            self.postings[col] = {
+                value: order[bounds[i]:bounds[i + 1]]
+                for i, value in enumerate(categorical.cat.categories)
+            }
+            self.options[col] = sorted(self.postings[col])
+
+        for col in range_columns:
+            values = self.df[col].to_numpy()
+            order = np.argsort(values, kind="stable")
+            self.ranges[col] = (values[order], order)
+
+    def bounds(self, col):
+        """(min, max) of a range column"""
+        values, _ = self.ranges[col]
+        return values[0], values[-1]
+
+    def range_positions(self, col, low, high):
+        """Sorted row positions with low <= value <= high"""
+        values, order = self.ranges[col]
+        start = np.searchsorted(values, low, side="left")
+        stop = np.searchsorted(values, high, side="right")
+        return np.sort(order[start:stop])
+
+    def select(self, equals=None, ranges=None):
+        """Row positions matching every equality and range filter
+
+        equals maps column -> value (None means no filter), ranges maps
+        column -> (low, high), inclusive.
+        """
+        candidates = []
+        for col, value in (equals or {}).items():
+            if value is None:
+                continue
+            candidates.append(self.postings[col].get(value, np.empty(0, dtype=np.intp)))
+        for col, (low, high) in (ranges or {}).items():
+            candidates.append(self.range_positions(col, low, high))
+
+        if not candidates:
+            return np.arange(self.size)
+        # Intersect smallest first so the work shrinks with every step
+        candidates.sort(key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            if not len(positions):
+                break
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def take(self, positions):
+        """Frame restricted to the given row positions"""
+        return self.df.iloc[positions]
+
+    def to_parquet(self):
+        """The indexed frame as Parquet bytes, e.g. to publish it to other processes"""
+        buffer = io.BytesIO()
+        self.df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_parquet(cls, data):
+        """Index rebuilt from the bytes of to_parquet"""
+        return cls(pd.read_parquet(io.BytesIO(data)))
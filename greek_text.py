@@ -0,0 +1,51 @@
+"""Greek text normalization shared by the store, registry and matchers"""
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def fold_accents(text):
+    """Uppercase, accent-free form used for case-insensitive Greek matching"""
+    decomposed = unicodedata.normalize("NFD", text or "")
+    stripped = "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+    # Final sigma uppercases to Σ already; lowercase input may still carry ς
+    return stripped.upper().replace("ς", "Σ")
+
+
+def normalize_name(text):
+    """Accent-free uppercase name with punctuation collapsed to single spaces
+
+    "Ε.Λ.ΣΤΑΤ." and "ΕΛΣΤΑΤ", or "Δήμος  Αθηναίων," and "ΔΗΜΟΣ ΑΘΗΝΑΙΩΝ",
+    map to the same key. Dots are dropped rather than spaced so that
+    abbreviations collapse into one token.
+    """
+    folded = fold_accents(str(text or "")).replace(".", "")
+    return _NON_WORD.sub(" ", folded).strip()
+
+
+_TOKEN = re.compile(r"\w+")
+
+# Inflectional endings of folded Greek words, longest first
+GREEK_SUFFIXES = (
+    "ΙΑΣ", "ΙΕΣ", "ΙΩΝ", "ΕΙΑ", "ΟΥΣ", "ΕΩΝ", "ΕΙΣ", "ΙΟΥ", "ΙΟΣ", "ΕΩΣ",
+    "ΙΟ", "ΙΑ", "ΩΝ", "ΟΥ", "ΟΣ", "ΗΣ", "ΕΣ", "ΑΣ", "ΟΙ", "ΑΙ", "ΕΙ", "ΟΝ", "ΩΣ",
+    "Α", "Η", "Ο", "Ε", "Ι", "Υ", "Ω",
+)
+
+
+def tokenize(text):
+    """Folded word tokens of a text"""
+    return _TOKEN.findall(fold_accents(str(text or "")))
+
+
+def light_stem(token, min_stem=3):
+    """Strip one inflectional ending, keeping at least min_stem letters
+
+    Deliberately light: "ΠΡΟΜΗΘΕΙΑ", "ΠΡΟΜΗΘΕΙΑΣ" and "ΠΡΟΜΗΘΕΙΩΝ" reduce to
+    stems that are prefixes of each other, which is what prefix search needs.
+    """
+    for suffix in GREEK_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= min_stem:
+            return token[:-len(suffix)]
+    return token
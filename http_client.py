@@ -0,0 +1,171 @@
+"""Resilient HTTP client for the public open-data APIs
+
+ApiClient wraps a pooled requests.Session with:
+
+- exponential-backoff retries on 429/5xx and connection errors, honoring
+  the server's Retry-After header in full (a longer delay than
+  max_retry_after fails the request at once instead of retrying early),
+- a token-bucket rate limiter that can be shared by several clients,
+- per-request latency metrics.
+"""
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`"""
+
+    def __init__(self, rate=5.0, capacity=10):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LatencyMetrics:
+    """Counters and a rolling window of request latencies"""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self._latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_throttle(self, seconds):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            summary = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
+        if latencies:
+            summary.update({
+                "mean_ms": round(1000 * sum(latencies) / len(latencies), 1),
+                "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+                "p95_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+            })
+        return summary
+
+
+def retry_after_seconds(response):
+    """Delay requested by a Retry-After header (seconds or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiClient:
+    """Pooled, rate-limited, retrying client for one base URL"""
+
+    def __init__(self, base_url, pool_size=8, max_retries=4, backoff=0.5,
+                 max_backoff=30.0, timeout=30, limiter=None, headers=None, max_retry_after=300.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self.limiter = limiter
+        self.metrics = LatencyMetrics()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(headers or {})
+
+    def request(self, method, path, **kwargs):
+        """Send a request, retrying transient failures; raises on final error"""
+        kwargs.setdefault("timeout", self.timeout)
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            if self.limiter:
+                waited = self.limiter.acquire()
+                if waited:
+                    self.metrics.record_throttle(waited)
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.metrics.record(time.perf_counter() - start, ok=False)
+                if attempt == self.max_retries:
+                    raise
+                self._sleep(attempt, None)
+                continue
+
+            ok = response.status_code < 400
+            self.metrics.record(time.perf_counter() - start, ok=ok)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = retry_after_seconds(response)
+                if retry_after is None or retry_after <= self.max_retry_after:
+                    # A discarded (possibly streamed) response would keep its pool connection
+                    response.close()
+                    self._sleep(attempt, retry_after)
+                    continue
+            response.raise_for_status()
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def _sleep(self, attempt, retry_after):
+        self.metrics.record_retry()
+        if retry_after is None:
+            # Full jitter keeps parallel workers from retrying in lockstep
+            retry_after = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        time.sleep(retry_after)
@@ -0,0 +1,251 @@
+"""Stage timings, payload sizes and cache hit rates of the dashboard
+
+Disabled unless DASHBOARD_METRICS=1. When enabled, every instrumented stage
+(API call, JSON decoding, parsing, aggregation, figure construction, ...)
+records its latency in a histogram with fixed buckets for Prometheus and a
+rolling window for percentiles, and payload sizes are kept the same way.
+Cache hit rates and client metrics are pulled from registered collectors
+only when the metrics are read, so they cost nothing per request.
+
+When disabled, stage() returns one shared no-op context manager and timed()
+returns the function unchanged, so instrumented code pays a function call.
+
+The metrics are shown in the hidden diagnostics section of the dashboard
+(open it with ?diagnostics=1) and served in the Prometheus text format on
+METRICS_PORT when it is set:
+
+    DASHBOARD_METRICS=1 METRICS_PORT=9108 streamlit run streamlit_app.py
+    curl localhost:9108/metrics
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.environ.get("DASHBOARD_METRICS", "0") == "1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_PREFIX = "dashboard"
+
+# Upper bounds of the histogram buckets (seconds / bytes); +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a rolling window of recent values"""
+
+    def __init__(self, buckets, window=1000):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self):
+        values = sorted(self.recent)
+        summary = {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else 0.0}
+        if values:
+            summary.update({
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+                "max": values[-1],
+            })
+        return summary
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("registry", "name", "started")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe("stage", self.name, time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.registry.count(f"{self.name}.errors")
+        return False
+
+
+class MetricsRegistry:
+    """Thread-safe histograms, counters and pulled gauges"""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}  # (kind, name) -> Histogram
+        self._counters = {}
+        self._collectors = {}
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def stage(self, name):
+        """Context manager timing one run of a stage"""
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def timed(self, name):
+        """Decorator timing every call of a function as a stage
+
+        Decided when the function is decorated: with metrics disabled the
+        function itself is returned.
+        """
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Stage(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, kind, name, value):
+        """Add a value to the histogram of a stage ("stage", seconds) or payload ("payload", bytes)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                buckets = LATENCY_BUCKETS if kind == "stage" else SIZE_BUCKETS
+                histogram = self._histograms[(kind, name)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_size(self, name, nbytes):
+        self.observe("payload", name, nbytes)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def register_collector(self, name, collect):
+        """collect() returns {stat: number}, read only when the metrics are exported"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def summaries(self, kind):
+        """name -> summary dict of every histogram of a kind, sorted by name"""
+        with self._lock:
+            return {
+                name: histogram.summary()
+                for (histogram_kind, name), histogram in sorted(self._histograms.items())
+                if histogram_kind == kind
+            }
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def gauges(self):
+        """(collector, stat) -> value of every numeric stat the collectors report"""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges = {}
+        for name, collect in collectors:
+            try:
+                stats = collect()
+            except Exception:
+                continue
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[(name, stat)] = value
+        return gauges
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        families = (("stage", "stage_seconds", "stage"), ("payload", "payload_bytes", "payload"))
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for kind, family, label in families:
+            metric = f"{METRICS_PREFIX}_{family}"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_kind, name), histogram in histograms:
+                if histogram_kind != kind:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip((*histogram.buckets, "+Inf"), histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {histogram.count}')
+        metric = f"{METRICS_PREFIX}_events_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.extend(f'{metric}{{event="{name}"}} {value}' for name, value in counters)
+        metric = f"{METRICS_PREFIX}_collector"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(
+            f'{metric}{{collector="{name}",stat="{stat}"}} {value}'
+            for (name, stat), value in sorted(self.gauges().items())
+        )
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(port, registry=None):
+    """Serve GET /metrics in the Prometheus text format from a daemon thread"""
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# Process-wide registry used by the dashboard and the API helpers
+metrics = MetricsRegistry()
+stage = metrics.stage
+timed = metrics.timed
+observe_size = metrics.observe_size
@@ -0,0 +1,168 @@
+"""ΚΗΜΔΗΣ open-data API helpers
+
+Plain functions without any Streamlit dependency, so that the dashboard and
+the headless jobs (sync, exports) share the same request logic.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_client import ApiClient, TokenBucket
+from instrumentation import observe_size, stage
+
+KHMDHS_BASE_URL = "https://cerpp.eprocurement.gov.gr"
+KHMDHS_MAX_WORKERS = 8
+
+# Requests per second allowed towards cerpp.eprocurement.gov.gr
+KHMDHS_RATE_LIMIT = 5.0
+
+# Sidebar label -> contractType key of the search payload
+KHMDHS_CONTRACT_TYPES = {
+    "Όλα": "",
+    "Υπηρεσίες": "9",
+    "Έργα": "10",
+    "Μελέτες": "12",
+    "Προμήθειες": "13",
+    "Τεχνικές Υπηρεσίες": "14"
+}
+
+
+def create_khmdhs_limiter():
+    return TokenBucket(rate=KHMDHS_RATE_LIMIT, capacity=KHMDHS_MAX_WORKERS)
+
+
+def create_khmdhs_client(limiter=None):
+    """Pooled client sized for KHMDHS_MAX_WORKERS parallel requests"""
+    return ApiClient(
+        KHMDHS_BASE_URL,
+        pool_size=KHMDHS_MAX_WORKERS,
+        limiter=limiter or create_khmdhs_limiter(),
+        headers={"Accept": "application/json"}
+    )
+
+
+def build_khmdhs_payload(filters):
+    """Build the ΚΗΜΔΗΣ search body from the sidebar filters"""
+    payload = {
+        "title": filters.get("title", ""),
+        "cpvItems": filters.get("cpvItems", []),
+        "organizations": filters.get("organizations", []),
+        "contractType": filters.get("contractType", ""),
+        "dateFrom": filters.get("dateFrom", ""),
+        "dateTo": filters.get("dateTo", ""),
+        "totalCostFrom": filters.get("totalCostFrom", 0),
+        "totalCostTo": filters.get("totalCostTo", 0),
+        "finalDateFrom": filters.get("finalDateFrom", ""),
+        "finalDateTo": filters.get("finalDateTo", ""),
+        # None (e.g. from the sync job) leaves the flag out so amended notices are returned too
+        "isModified": filters.get("isModified", False)
+    }
+
+    # Remove empty values
+    return {k: v for k, v in payload.items() if v not in ["", [], None]}
+
+
+def fetch_khmdhs_page(client, payload, page):
+    """Fetch a single result page from ΚΗΜΔΗΣ API"""
+    with stage("khmdhs.request"):
+        response = client.post(
+            "/khmdhs-opendata/notice",
+            json=payload,
+            params={"page": page}
+        )
+    observe_size("khmdhs.page", len(response.content))
+    with stage("khmdhs.json"):
+        return response.json()
+
+
+def count_khmdhs_pages(results):
+    """Number of result pages reported by a ΚΗΜΔΗΣ response"""
+    if results.get("totalPages") is not None:
+        return int(results["totalPages"])
+    page_size = results.get("size") or len(results.get("content", []))
+    if not page_size:
+        return 1
+    return max(1, math.ceil(results.get("totalElements", 0) / page_size))
+
+
+def fetch_khmdhs_pages(client, payload, all_pages=False, max_workers=4, on_page=None):
+    """Fetch page 0 and, with all_pages=True, every remaining page concurrently
+
+    on_page(page, content, done, total) is called from the calling thread for
+    every page as it arrives. Returns (results, failed_pages); results holds
+    the merged content of all pages in page order. Errors on page 0 propagate.
+    """
+    results = fetch_khmdhs_page(client, payload, 0)
+
+    total_pages = count_khmdhs_pages(results) if all_pages else 1
+    if on_page:
+        on_page(0, results.get("content", []), 1, total_pages)
+    if total_pages <= 1:
+        return results, []
+
+    pages = {0: results.get("content", [])}
+    failed = []
+    workers = max(1, min(max_workers, KHMDHS_MAX_WORKERS, total_pages - 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_khmdhs_page, client, payload, page): page
+            for page in range(1, total_pages)
+        }
+        for future in as_completed(futures):
+            page = futures[future]
+            try:
+                pages[page] = future.result().get("content", [])
+            except Exception:
+                failed.append(page)
+                continue
+            if on_page:
+                on_page(page, pages[page], len(pages), total_pages)
+
+    results["content"] = [item for page in sorted(pages) for item in pages[page]]
+    results["numberOfElements"] = len(results["content"])
+    return results, sorted(failed)
+
+
+def iter_khmdhs_pages(client, payload, max_workers=4, on_page=None):
+    """Yield (page, content) for every result page, in page order
+
+    Unlike fetch_khmdhs_pages nothing is merged: at most 2 * max_workers
+    pages are requested or held at a time, so memory stays bounded however
+    many pages match. on_page(page, content, done, total) is called as in
+    fetch_khmdhs_pages. A page that still fails after the client's retries
+    raises, so a dump is never silently incomplete.
+    """
+    first = fetch_khmdhs_page(client, payload, 0)
+    total_pages = count_khmdhs_pages(first)
+    if on_page:
+        on_page(0, first.get("content", []), 1, total_pages)
+    yield 0, first.get("content", [])
+    del first
+
+    workers = max(1, min(max_workers, KHMDHS_MAX_WORKERS, total_pages - 1))
+    window = 2 * workers
+    next_page, next_submit, done = 1, 1, 1
+    ready, pending = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while next_page < total_pages:
+            while next_submit < total_pages and len(pending) + len(ready) < window:
+                pending[pool.submit(fetch_khmdhs_page, client, payload, next_submit)] = next_submit
+                next_submit += 1
+            future = next(as_completed(pending))
+            page = pending.pop(future)
+            try:
+                ready[page] = future.result().get("content", [])
+            except Exception:
+                for other in pending:
+                    other.cancel()
+                raise
+            done += 1
+            if on_page:
+                on_page(page, ready[page], done, total_pages)
+            while next_page in ready:
+                yield next_page, ready.pop(next_page)
+                next_page += 1
+
+
+def get_khmdhs_pdf_link(adam):
+    """Generate PDF download link for ΚΗΜΔΗΣ tender"""
+    return f"{KHMDHS_BASE_URL}/khmdhs-opendata/notice/attachment/{adam}"
@@ -0,0 +1,517 @@
+"""Local SQLite store of ΚΗΜΔΗΣ notices with incremental sync
+
+The dashboard answers sidebar searches from this store whenever the synced
+window covers the requested dates, so repeated searches never leave the
+machine. The store is filled by the sync job:
+
+    python notice_store.py sync --days 30
+    python notice_store.py stats
+    python notice_store.py changes --since 2025-01-01
+
+Every notice carries a fingerprint (hash of its normalized fields). A sync
+looks up the fingerprints of the fetched notices only, by primary key, so
+new and amended notices are found without comparing whole tables; they and
+the notices whose deadline passed since the previous sync are appended to
+the notice_changes feed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from cpv_index import collapse_prefixes, cpv_node, notice_cpvs, prefix_range
+from greek_text import fold_accents
+from khmdhs_api import build_khmdhs_payload, create_khmdhs_client, fetch_khmdhs_pages
+
+NOTICE_STORE_PATH = os.environ.get("KHMDHS_STORE_PATH", "data/khmdhs_notices.db")
+
+# Field of the notice that the API's dateFrom/dateTo filters apply to
+REGISTRATION_DATE_FIELD = "submissionDate"
+
+# Days before the watermark that every sync fetches again to pick up amendments
+SYNC_LOOKBACK_DAYS = 3
+CHANGE_KINDS = ("new", "changed", "closed")
+# Columns iter_synced reads by default
+SYNCED_COLUMNS = ("reference_number", "title", "registration_date", "synced_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notices (
+    reference_number TEXT PRIMARY KEY,
+    title TEXT,
+    title_norm TEXT,
+    organization TEXT,
+    contract_type_key TEXT,
+    contract_type TEXT,
+    total_cost REAL,
+    registration_date TEXT,
+    final_submission_date TEXT,
+    raw TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    fingerprint TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_notices_registration ON notices (registration_date);
+CREATE INDEX IF NOT EXISTS idx_notices_contract_type ON notices (contract_type_key);
+CREATE INDEX IF NOT EXISTS idx_notices_total_cost ON notices (total_cost);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS notice_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reference_number TEXT NOT NULL,
+    change TEXT NOT NULL,
+    version INTEGER,
+    fingerprint TEXT,
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_changed_at ON notice_changes (changed_at);
+CREATE TABLE IF NOT EXISTS notice_cpvs (
+    reference_number TEXT NOT NULL,
+    code TEXT NOT NULL,
+    full_code TEXT,
+    label TEXT,
+    PRIMARY KEY (reference_number, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_notice_cpvs_code ON notice_cpvs (code);
+"""
+
+# Columns added after the first release, created on existing stores
+MIGRATIONS = {
+    "fingerprint": "ALTER TABLE notices ADD COLUMN fingerprint TEXT",
+    "version": "ALTER TABLE notices ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+}
+NOTICE_COLUMNS = (
+    "reference_number, title, title_norm, organization, contract_type_key, contract_type, "
+    "total_cost, registration_date, final_submission_date, raw, synced_at, fingerprint, version"
+)
+
+
+def to_utc(value):
+    """Aware UTC datetime from an ISO string, datetime or Timestamp (naive = local time)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+def utc_deadline(value):
+    """A deadline as UTC ISO ("...+00:00"), the form stored and compared as text; None if unparseable"""
+    try:
+        return to_utc(value).isoformat(timespec="seconds") if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def notice_fingerprint(item):
+    """Hash of the normalized notice: sorted keys, runs of whitespace collapsed,
+    so re-serialized or re-spaced but otherwise unchanged notices hash equal"""
+    canonical = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(" ".join(canonical.split()).encode("utf-8")).hexdigest()
+
+
+def notice_row(item, synced_at, fingerprint=None):
+    """Flatten a raw API notice into a notices table row (without version)"""
+    return (
+        item.get("referenceNumber"),
+        item.get("title"),
+        fold_accents(item.get("title")),
+        (item.get("organization") or {}).get("value"),
+        (item.get("contractType") or {}).get("key"),
+        (item.get("contractType") or {}).get("value"),
+        item.get("totalCostWithoutVAT"),
+        (item.get(REGISTRATION_DATE_FIELD) or "")[:10] or None,
+        utc_deadline(item.get("finalSubmissionDate")),
+        json.dumps(item, ensure_ascii=False),
+        synced_at,
+        fingerprint or notice_fingerprint(item),
+    )
+
+
+class NoticeStore:
+    """SQLite-backed notice store keyed by referenceNumber"""
+
+    def __init__(self, path=NOTICE_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(notices)")}
+            if existing:
+                for column, statement in MIGRATIONS.items():
+                    if column not in existing:
+                        conn.execute(statement)
+            has_cpvs = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notice_cpvs'"
+            ).fetchone()
+            conn.executescript(SCHEMA)
+            if existing and not has_cpvs:
+                self._backfill_cpvs(conn)
+            if not conn.execute("SELECT 1 FROM sync_state WHERE key = 'deadlines_utc'").fetchone():
+                self._normalize_deadlines(conn)
+
+    @staticmethod
+    def _backfill_cpvs(conn, chunk_size=5000):
+        """Fill notice_cpvs from the raw notices of a store created before it existed"""
+        with conn:
+            cursor = conn.execute("SELECT reference_number, raw FROM notices")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                conn.executemany(
+                    "INSERT OR REPLACE INTO notice_cpvs (reference_number, code, full_code, label) VALUES (?, ?, ?, ?)",
+                    [(reference, *cpv) for reference, raw in rows for cpv in notice_cpvs(json.loads(raw))]
+                )
+
+    @staticmethod
+    def _normalize_deadlines(conn):
+        """Rewrite the deadlines of a store created before they were kept as UTC ISO"""
+        with conn:
+            rows = conn.execute(
+                "SELECT reference_number, final_submission_date FROM notices "
+                "WHERE final_submission_date IS NOT NULL AND final_submission_date NOT LIKE '%+00:00'"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE notices SET final_submission_date = ? WHERE reference_number = ?",
+                [(utc_deadline(deadline), reference) for reference, deadline in rows]
+            )
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('deadlines_utc', '1')")
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store usable from
+        # Streamlit's script threads and the sync job at the same time.
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ------------------------------------------------------------------
+    # Sync state
+    # ------------------------------------------------------------------
+
+    def get_state(self, key, default=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, **values):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                [(k, str(v)) for k, v in values.items()]
+            )
+
+    def covers(self, filters):
+        """True when the synced window includes the requested date range"""
+        synced_from = self.get_state("synced_from")
+        watermark = self.get_state("watermark")
+        if not synced_from or not watermark:
+            return False
+        date_from = filters.get("dateFrom") or synced_from
+        date_to = filters.get("dateTo") or watermark
+        return synced_from <= date_from and date_to <= watermark
+
+    # ------------------------------------------------------------------
+    # Read / write
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _known_versions(conn, references, chunk=500):
+        """reference_number -> (fingerprint, version) of the stored notices among references"""
+        known = {}
+        for start in range(0, len(references), chunk):
+            batch = references[start:start + chunk]
+            known.update(
+                (reference, (fingerprint, version)) for reference, fingerprint, version in conn.execute(
+                    "SELECT reference_number, fingerprint, version FROM notices "
+                    f"WHERE reference_number IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+            )
+        return known
+
+    def upsert(self, content):
+        """Write new and amended notices, returns counts of new/changed/unchanged
+
+        Only the fetched notices are looked up (by primary key) and compared
+        by fingerprint; unchanged ones are not rewritten. New and changed
+        notices are appended to the change feed.
+        """
+        synced_at = datetime.now().isoformat(timespec="seconds")
+        items = {item["referenceNumber"]: item for item in content if item.get("referenceNumber")}
+
+        summary = {"new": 0, "changed": 0, "unchanged": 0}
+        with closing(self._connect()) as conn, conn:
+            known = self._known_versions(conn, list(items))
+            writes, changes = [], []
+            for reference, item in items.items():
+                fingerprint = notice_fingerprint(item)
+                if reference not in known:
+                    kind, version = "new", 1
+                else:
+                    old_fingerprint, old_version = known[reference]
+                    if old_fingerprint == fingerprint:
+                        summary["unchanged"] += 1
+                        continue
+                    # Rows stored before fingerprints existed are refreshed silently
+                    kind = "changed" if old_fingerprint else None
+                    version = old_version + 1 if kind else old_version
+                writes.append(notice_row(item, synced_at, fingerprint) + (version,))
+                if kind:
+                    summary[kind] += 1
+                    changes.append((reference, kind, version, fingerprint, synced_at))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO notices ({NOTICE_COLUMNS}) VALUES ({','.join('?' * 13)})",
+                writes
+            )
+            conn.executemany(
+                "INSERT INTO notice_changes (reference_number, change, version, fingerprint, changed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                changes
+            )
+            written = [row[0] for row in writes]
+            conn.executemany("DELETE FROM notice_cpvs WHERE reference_number = ?", [(r,) for r in written])
+            conn.executemany(
+                "INSERT OR REPLACE INTO notice_cpvs (reference_number, code, full_code, label) VALUES (?, ?, ?, ?)",
+                [(reference, *cpv) for reference in written for cpv in notice_cpvs(items[reference])]
+            )
+        return summary
+
+    def record_closed(self, now=None):
+        """Add a 'closed' change for every notice whose deadline passed since the last check
+
+        Deadlines are stored as UTC ISO, so they compare as text with the UTC
+        check times; the change itself is stamped in local time like the
+        rest of the feed.
+        """
+        now = to_utc(now or datetime.now(timezone.utc))
+        checked_at = now.isoformat(timespec="seconds")
+        previous = self.get_state("closed_checked_at")
+        if previous is None:
+            # First check: start the feed now instead of replaying history
+            self.set_state(closed_checked_at=checked_at)
+            return 0
+        changed_at = now.astimezone().replace(tzinfo=None).isoformat(timespec="seconds")
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO notice_changes (reference_number, change, version, fingerprint, changed_at) "
+                "SELECT reference_number, 'closed', version, fingerprint, ? FROM notices "
+                "WHERE final_submission_date > ? AND final_submission_date <= ?",
+                (changed_at, previous, checked_at)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('closed_checked_at', ?)",
+                (checked_at,)
+            )
+        return cursor.rowcount
+
+    def changes_since(self, since, kinds=CHANGE_KINDS, limit=1000):
+        """Change feed entries at or after `since` (ISO date or local datetime), newest first"""
+        sql = (
+            "SELECT c.changed_at, c.change, c.reference_number, c.version, n.title, n.organization, "
+            "n.total_cost, n.final_submission_date "
+            "FROM notice_changes c LEFT JOIN notices n ON n.reference_number = c.reference_number "
+            f"WHERE c.changed_at >= ? AND c.change IN ({','.join('?' * len(kinds))}) "
+            "ORDER BY c.id DESC LIMIT ?"
+        )
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql, [since, *kinds, limit])
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _where(filters):
+        """WHERE clause and parameters for the sidebar filters"""
+        clauses, params = [], []
+        if filters.get("title"):
+            clauses.append("title_norm LIKE ?")
+            params.append(f"%{fold_accents(filters['title'])}%")
+        if filters.get("contractType"):
+            clauses.append("contract_type_key = ?")
+            params.append(filters["contractType"])
+        if filters.get("dateFrom"):
+            clauses.append("registration_date >= ?")
+            params.append(filters["dateFrom"])
+        if filters.get("dateTo"):
+            clauses.append("registration_date <= ?")
+            params.append(filters["dateTo"])
+        if filters.get("totalCostFrom"):
+            clauses.append("total_cost >= ?")
+            params.append(filters["totalCostFrom"])
+        if filters.get("totalCostTo"):
+            clauses.append("total_cost <= ?")
+            params.append(filters["totalCostTo"])
+        if filters.get("cpvItems"):
+            # Expanded codes collapse back to the few prefixes they came from
+            prefixes = collapse_prefixes(cpv_node(code) for code in filters["cpvItems"])
+            clauses.append(
+                "reference_number IN (SELECT reference_number FROM notice_cpvs WHERE "
+                + " OR ".join("(code >= ? AND code < ? AND code <> ?)" for _ in prefixes) + ")"
+            )
+            for prefix in prefixes:
+                # A prefix ending in zeros, padded to a code, is a node above it ("30000000" is
+                # division 30, not under group "300"), as in CpvTree
+                padded = prefix.ljust(8, "0")
+                params.extend((*prefix_range(prefix), padded if cpv_node(padded) != prefix else ""))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_query(self, filters, chunk_size=1000):
+        """Yield the matching raw notices in lists of at most chunk_size"""
+        where, params = self._where(filters)
+        sql = f"SELECT raw FROM notices{where} ORDER BY registration_date DESC, reference_number"
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [json.loads(raw) for (raw,) in rows]
+
+    def query(self, filters):
+        """Answer the sidebar filters locally, in the API's response shape"""
+        content = [item for chunk in self.iter_query(filters) for item in chunk]
+        return {"content": content, "totalElements": len(content)}
+
+    def query_references(self, filters):
+        """(reference_number, title, final_submission_date) of the matching notices,
+        without decoding the raw JSON"""
+        where, params = self._where(filters)
+        sql = f"SELECT reference_number, title, final_submission_date FROM notices{where}"
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def iter_synced(self, since, columns=SYNCED_COLUMNS, chunk_size=5000):
+        """Yield rows of `columns` (a tuple of notices columns) of the notices written
+        at or after `since`, oldest write first, in lists of at most chunk_size"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f"SELECT {', '.join(columns)} FROM notices WHERE synced_at >= ? ORDER BY synced_at",
+                (since,)
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+    def open_deadlines(self, now, synced_since=None):
+        """(reference_number, title, final_submission_date) of notices not yet closed"""
+        sql = (
+            "SELECT reference_number, title, final_submission_date FROM notices "
+            "WHERE final_submission_date >= ?"
+        )
+        params = [now]
+        if synced_since:
+            sql += " AND synced_at >= ?"
+            params.append(synced_since)
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def cpv_codes(self):
+        """Distinct (full code, label) of the stored notices"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT full_code, MAX(label) FROM notice_cpvs WHERE full_code IS NOT NULL GROUP BY full_code"
+            ).fetchall()
+
+    def cpv_pairs(self, filters):
+        """(notice, budget, code) per CPV of the matching notices, for cpv_index.cpv_rollup"""
+        where, params = self._where(filters)
+        sql = (
+            "SELECT n.rowid AS notice, COALESCE(n.total_cost, 0) AS budget, CAST(c.code AS INTEGER) AS code "
+            f"FROM notice_cpvs c JOIN (SELECT rowid, reference_number, total_cost FROM notices{where}) n "
+            "ON n.reference_number = c.reference_number"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM notices").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+
+    def sync(self, days=30, max_workers=4, client=None, on_page=None, lookback_days=SYNC_LOOKBACK_DAYS):
+        """Fetch notices registered since the last watermark
+
+        The first run goes back `days` days. Later runs restart lookback_days
+        before the previous watermark so recent amendments are picked up;
+        fingerprints keep the overlap cheap. Amended notices are requested
+        too (isModified is left out of the payload). The watermark only
+        advances when every page was fetched.
+        """
+        today = date.today().isoformat()
+        watermark = self.get_state("watermark")
+        if watermark:
+            date_from = (date.fromisoformat(watermark) - timedelta(days=lookback_days)).isoformat()
+        else:
+            date_from = (date.today() - timedelta(days=days)).isoformat()
+
+        payload = build_khmdhs_payload({"dateFrom": date_from, "dateTo": today, "isModified": None})
+        results, failed = fetch_khmdhs_pages(
+            client or create_khmdhs_client(),
+            payload,
+            all_pages=True,
+            max_workers=max_workers,
+            on_page=on_page
+        )
+        changes = self.upsert(results.get("content", []))
+        changes["closed"] = self.record_closed()
+
+        if not failed:
+            state = {"watermark": today, "last_sync": datetime.now().isoformat(timespec="seconds")}
+            if not self.get_state("synced_from"):
+                state["synced_from"] = date_from
+            self.set_state(**state)
+        return {"dateFrom": date_from, "dateTo": today, **changes, "failed_pages": failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Τοπική βάση διαγωνισμών ΚΗΜΔΗΣ")
+    parser.add_argument("--db", default=NOTICE_STORE_PATH, help="SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync_cmd = sub.add_parser("sync", help="fetch notices newer than the watermark")
+    sync_cmd.add_argument("--days", type=int, default=30, help="window of the first sync")
+    sync_cmd.add_argument("--workers", type=int, default=4, help="parallel page requests")
+    sub.add_parser("stats", help="show store size and sync state")
+    changes_cmd = sub.add_parser("changes", help="what changed since a date")
+    changes_cmd.add_argument("--since", default=(date.today() - timedelta(days=1)).isoformat())
+    changes_cmd.add_argument("--kind", action="append", choices=CHANGE_KINDS, help="repeatable, default all")
+    changes_cmd.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    store = NoticeStore(args.db)
+    if args.command == "sync":
+        def progress(page, content, done, total):
+            print(f"page {page} ({len(content)} notices) {done}/{total}")
+
+        summary = store.sync(days=args.days, max_workers=args.workers, on_page=progress)
+        print(json.dumps(summary, ensure_ascii=False))
+        return 1 if summary["failed_pages"] else 0
+
+    if args.command == "changes":
+        for change in store.changes_since(args.since, kinds=tuple(args.kind or CHANGE_KINDS), limit=args.limit):
+            print(json.dumps(change, ensure_ascii=False))
+        return 0
+
+    print(json.dumps({
+        "notices": store.count(),
+        "synced_from": store.get_state("synced_from"),
+        "watermark": store.get_state("watermark"),
+        "last_sync": store.get_state("last_sync"),
+    }, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+"""Columnar, pre-parsed representation of ΚΗΜΔΗΣ notices
+
+parse_notices turns the raw `content` list of an API response into one
+typed DataFrame (datetime and float dtypes, categorical organization and
+contract type) that every tab of the dashboard reads, so the JSON is
+walked once per search instead of once per tab and rerun.
+"""
+import pandas as pd
+
+# Flattened API field -> table column
+NOTICE_COLUMNS = {
+    "referenceNumber": "reference_number",
+    "title": "title",
+    "organization.key": "organization_key",
+    "organization.value": "organization",
+    "contractType.key": "contract_type_key",
+    "contractType.value": "contract_type",
+    "totalCostWithoutVAT": "budget",
+    "submissionDate": "registration_date",
+    "finalSubmissionDate": "final_submission_date",
+}
+
+CATEGORICAL_COLUMNS = ["organization", "contract_type"]
+DATETIME_COLUMNS = ["registration_date", "final_submission_date"]
+UNKNOWN_CONTRACT_TYPE = "Άγνωστο"
+
+
+def parse_notices(content):
+    """Typed table of the notices; fields outside NOTICE_COLUMNS are kept flattened"""
+    table = pd.json_normalize(content) if content else pd.DataFrame()
+    table = table.rename(columns=NOTICE_COLUMNS)
+    for column in NOTICE_COLUMNS.values():
+        if column not in table:
+            table[column] = None
+
+    table["budget"] = pd.to_numeric(table["budget"], errors="coerce").fillna(0.0).astype("float64")
+    for column in DATETIME_COLUMNS:
+        table[column] = pd.to_datetime(table[column], errors="coerce", utc=True)
+    table["contract_type"] = table["contract_type"].fillna(UNKNOWN_CONTRACT_TYPE)
+    for column in CATEGORICAL_COLUMNS:
+        table[column] = table[column].astype("category")
+
+    core = list(NOTICE_COLUMNS.values())
+    return table[core + [c for c in table.columns if c not in core]]
+
+
+def concat_tables(tables):
+    """Concatenate per-page tables, keeping the categorical dtypes"""
+    tables = [t for t in tables if not t.empty]
+    if not tables:
+        return parse_notices([])
+    table = pd.concat(tables, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        table[column] = table[column].astype("category")
+    return table
+
+
+def display_rows(table):
+    """The Αποτελέσματα tab columns, built column-wise"""
+    deadline = table["final_submission_date"].dt.strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "ΑΔΑΜ": table["reference_number"].fillna("N/A"),
+        "Τίτλος": table["title"].fillna("N/A").str[:60] + "...",
+        "Φορέας": table["organization"].astype(object).fillna("N/A").astype(str).str[:40],
+        "Τύπος": table["contract_type"].astype(str),
+        "Budget (€)": table["budget"].map("{:,.0f}".format),
+        "Καταληκτική": deadline.fillna("N/A"),
+    })
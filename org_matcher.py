@@ -0,0 +1,246 @@
+"""Batch matching of free-text organization names to ΑΑΗΤ entities
+
+ΚΗΜΔΗΣ (`organization.value`) and Διαύγεια (`organization`) spell the same
+body in different ways: with or without tonos, genitive vs nominative
+("ΔΗΜΟΥ"/"ΔΗΜΟΣ"), abbreviated ("Δ. ΑΘΗΝΑΙΩΝ") or with Latin look-alike
+letters. OrgMatcher reduces every name to a canonical token string and
+compares it only with ΑΑΗΤ names sharing a rare token prefix (blocking).
+Candidates are scored by the mean of character-trigram Dice similarity and
+the idf-weighted share of the name's token prefixes they contain, so a
+shared "ΥΠΟΥΡΓΕΙΟ" weighs far less than a shared "ΠΑΙΔΕΙΑΣ". Results are kept
+in a mapping table (name -> entity, score, method) that can be persisted
+and reused as long as the registry does not change:
+
+    python org_matcher.py match "Δήμου Αθηναίων" "Γεν. Νοσοκομείο Βέροιας"
+"""
+import argparse
+import math
+import os
+import threading
+
+import pandas as pd
+
+from aaht_registry import AahtRegistry
+from greek_text import normalize_name
+
+ORG_MATCH_CACHE_PATH = os.environ.get("ORG_MATCH_CACHE_PATH", "data/org_matches.parquet")
+
+ENTITY_NAME_COLUMNS = ["Ονομασία ΑΑΗΤ", "Φορέας"]
+MIN_SCORE = 0.6
+# Tokens shared by more entities than this are not used as blocking keys
+MAX_BLOCK_SIZE = 400
+PREFIX_LENGTH = 4
+
+# Latin capitals that look like Greek ones (mixed-script names in the registry)
+_LATIN_LOOKALIKES = str.maketrans("ABEHIKMNOPTXYZ", "ΑΒΕΗΙΚΜΝΟΡΤΧΥΖ")
+
+# Abbreviations and inflected forms -> canonical token
+TOKEN_ALIASES = {
+    "Δ": "ΔΗΜΟΣ",
+    "ΔΗΜ": "ΔΗΜΟΣ",
+    "ΔΗΜΟΥ": "ΔΗΜΟΣ",
+    "ΔΗΜΟΤ": "ΔΗΜΟΤΙΚΗ",
+    "ΠΕΡ": "ΠΕΡΙΦΕΡΕΙΑ",
+    "ΠΕΡΙΦ": "ΠΕΡΙΦΕΡΕΙΑ",
+    "ΠΕΡΙΦΕΡΕΙΑΣ": "ΠΕΡΙΦΕΡΕΙΑ",
+    "ΠΕ": "ΠΕΡΙΦΕΡΕΙΑΚΗ ΕΝΟΤΗΤΑ",
+    "ΠΕΡΙΦΕΡΕΙΑΚΗΣ": "ΠΕΡΙΦΕΡΕΙΑΚΗ",
+    "ΕΝΟΤΗΤΑΣ": "ΕΝΟΤΗΤΑ",
+    "ΥΠ": "ΥΠΟΥΡΓΕΙΟ",
+    "ΥΠΟΥΡΓ": "ΥΠΟΥΡΓΕΙΟ",
+    "ΥΠΟΥΡΓΕΙΟΥ": "ΥΠΟΥΡΓΕΙΟ",
+    "ΓΕΝ": "ΓΕΝΙΚΟ",
+    "ΓΝ": "ΓΕΝΙΚΟ ΝΟΣΟΚΟΜΕΙΟ",
+    "ΝΟΣ": "ΝΟΣΟΚΟΜΕΙΟ",
+    "ΝΟΣΟΚ": "ΝΟΣΟΚΟΜΕΙΟ",
+    "ΝΟΣΟΚΟΜΕΙΟΥ": "ΝΟΣΟΚΟΜΕΙΟ",
+    "ΠΑΝ": "ΠΑΝΕΠΙΣΤΗΜΙΟ",
+    "ΠΑΝΕΠ": "ΠΑΝΕΠΙΣΤΗΜΙΟ",
+    "ΠΑΝΕΠΙΣΤΗΜΙΟΥ": "ΠΑΝΕΠΙΣΤΗΜΙΟ",
+    "ΕΠΙΧ": "ΕΠΙΧΕΙΡΗΣΗ",
+    "ΕΠΙΧΕΙΡΗΣΗΣ": "ΕΠΙΧΕΙΡΗΣΗ",
+    "ΑΠΟΚ": "ΑΠΟΚΕΝΤΡΩΜΕΝΗ",
+    "ΔΙΟΙΚΗΣΗΣ": "ΔΙΟΙΚΗΣΗ",
+    "ΝΠΔΔ": "",
+    "ΝΠΙΔ": "",
+    "ΕΛΛΑΔΟΣ": "ΕΛΛΑΔΑΣ",
+}
+STOPWORDS = {"ΤΟΥ", "ΤΗΣ", "ΤΩΝ", "ΚΑΙ", "ΤΟ", "Η", "Ο", "ΟΙ", "ΤΑ", "ΣΤΟ", "ΣΤΗ", "ΣΤΗΝ"}
+
+
+def canonical_name(name):
+    """Token string used for comparison: folded, de-abbreviated, without stopwords"""
+    tokens = normalize_name(str(name or "").upper().translate(_LATIN_LOOKALIKES)).split()
+    expanded = []
+    for token in tokens:
+        token = TOKEN_ALIASES.get(token, token)
+        expanded.extend(t for t in token.split() if t not in STOPWORDS)
+    return " ".join(expanded)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+class OrgMatcher:
+    """Maps organization names to ΑΑΗΤ entities through blocked fuzzy matching"""
+
+    COLUMNS = ["name", "aaht_code", "aaht_name", "score", "method"]
+
+    def __init__(self, registry, min_score=MIN_SCORE, cache_path=None):
+        self.registry = registry
+        self.min_score = min_score
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._cache = {}  # name -> (code, entity name, score, method)
+        self._dirty = False
+
+        df = registry.df
+        codes = df["Κωδικός ΑΑΗΤ"].astype(str).to_numpy()
+        self._entities = []  # (code, name, canonical, trigrams, token prefixes)
+        self._by_canonical = {}
+        for column in ENTITY_NAME_COLUMNS:
+            names = df[column].astype(object).to_numpy()
+            for position, name in enumerate(names):
+                if not isinstance(name, str):
+                    continue
+                canonical = canonical_name(name)
+                if not canonical or canonical in self._by_canonical:
+                    continue
+                self._by_canonical[canonical] = len(self._entities)
+                prefixes = {token[:PREFIX_LENGTH] for token in canonical.split()}
+                self._entities.append((codes[position], name, canonical, trigrams(canonical), prefixes))
+
+        self._blocks = {}
+        for entity_id, entity in enumerate(self._entities):
+            for prefix in entity[4]:
+                self._blocks.setdefault(prefix, []).append(entity_id)
+        total = len(self._entities) or 1
+        self._idf = {prefix: math.log(1 + total / len(ids)) for prefix, ids in self._blocks.items()}
+
+        if cache_path and os.path.exists(cache_path):
+            self._load(cache_path)
+
+    @classmethod
+    def load(cls, cache_path=ORG_MATCH_CACHE_PATH, **kwargs):
+        return cls(AahtRegistry.load(), cache_path=cache_path, **kwargs)
+
+    def _candidates(self, prefixes):
+        blocks = [self._blocks.get(prefix, ()) for prefix in prefixes]
+        selective = [b for b in blocks if 0 < len(b) <= MAX_BLOCK_SIZE]
+        if not selective:
+            # Only very common tokens ("ΔΗΜΟΣ"): fall back to the smallest block
+            selective = sorted((b for b in blocks if b), key=len)[:1]
+        candidates = set()
+        for block in selective:
+            candidates.update(block)
+        return candidates
+
+    def _match_one(self, name):
+        positions = self.registry.positions(name)
+        if len(positions):
+            row = self.registry.df.iloc[positions[0]]
+            return str(row["Κωδικός ΑΑΗΤ"]), row["Ονομασία ΑΑΗΤ"], 1.0, "exact"
+
+        canonical = canonical_name(name)
+        if not canonical:
+            return None, None, 0.0, "empty"
+        entity_id = self._by_canonical.get(canonical)
+        if entity_id is not None:
+            code, entity_name = self._entities[entity_id][:2]
+            return code, entity_name, 0.99, "canonical"
+
+        grams = trigrams(canonical)
+        prefixes = {token[:PREFIX_LENGTH] for token in canonical.split()}
+        # Prefixes unknown to the registry get the highest idf
+        weights = {p: self._idf.get(p, math.log(1 + len(self._entities))) for p in prefixes}
+        total_weight = sum(weights.values())
+        best_id, best_score = None, 0.0
+        for entity_id in self._candidates(prefixes):
+            _, _, _, entity_grams, entity_prefixes = self._entities[entity_id]
+            coverage = sum(w for p, w in weights.items() if p in entity_prefixes) / total_weight
+            score = (dice(grams, entity_grams) + coverage) / 2
+            if score > best_score:
+                best_id, best_score = entity_id, score
+        if best_id is None or best_score < self.min_score:
+            return None, None, round(best_score, 3), "unmatched"
+        code, entity_name = self._entities[best_id][:2]
+        return code, entity_name, round(best_score, 3), "fuzzy"
+
+    def match_names(self, names):
+        """Mapping table rows for the distinct names, matching only the ones not cached yet"""
+        distinct = pd.unique(pd.Series(names, dtype=object).dropna())
+        with self._lock:
+            missing = [name for name in distinct if name not in self._cache]
+        results = {name: self._match_one(name) for name in missing}
+        with self._lock:
+            self._cache.update(results)
+            self._dirty = self._dirty or bool(results)
+            rows = [(name, *self._cache[name]) for name in distinct]
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    def annotate(self, df, column, prefix="aaht"):
+        """Copy of df with <prefix>_code, <prefix>_name and <prefix>_score columns for df[column]"""
+        mapping = self.match_names(df[column].astype(object)).set_index("name")
+        keys = df[column].astype(object)
+        return df.assign(**{
+            f"{prefix}_code": keys.map(mapping["aaht_code"]),
+            f"{prefix}_name": keys.map(mapping["aaht_name"]),
+            f"{prefix}_score": keys.map(mapping["score"]).astype(float),
+        })
+
+    def mapping_table(self):
+        with self._lock:
+            rows = [(name, *match) for name, match in self._cache.items()]
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    def _load(self, path):
+        table = pd.read_parquet(path)
+        if table.attrs.get("registry") not in (None, self.registry.fingerprint):
+            return  # registry changed since the table was written
+        self._cache.update(
+            (row.name, (row.aaht_code, row.aaht_name, row.score, row.method))
+            for row in table.itertuples(index=False)
+        )
+
+    def save(self, path=None):
+        """Persist the mapping table if new names were matched since the last save"""
+        path = path or self.cache_path
+        if not path or not self._dirty:
+            return
+        # The dashboard saves from script threads and the background refresh
+        with self._save_lock:
+            self._dirty = False
+            table = self.mapping_table()
+            table.attrs["registry"] = self.registry.fingerprint
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            table.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Αντιστοίχιση φορέων με ΑΑΗΤ")
+    parser.add_argument("--cache", default=ORG_MATCH_CACHE_PATH, help="mapping table Parquet file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    match_cmd = sub.add_parser("match", help="match organization names")
+    match_cmd.add_argument("names", nargs="+")
+    args = parser.parse_args(argv)
+
+    matcher = OrgMatcher.load(args.cache)
+    if args.command == "match":
+        print(matcher.match_names(args.names).to_string(index=False))
+        matcher.save()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
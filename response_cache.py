@@ -0,0 +1,189 @@
+"""TTL + LRU cache for ΚΗΜΔΗΣ search responses
+
+Entries are keyed by a canonical hash of the cleaned request payload, so
+the same filter combination maps to the same entry no matter which session
+or rerun asked for it. The in-memory part is bounded by a byte budget and
+evicts least recently used entries first. Entries are held as their JSON
+encoding and decoded on every hit, so each caller gets its own copy and
+mutating a result cannot change what other sessions read. With persist_dir set, entries are
+also written to disk and survive restarts. With a shared-state backend
+(see shared_state.py) entries are published to it as well, so a response
+fetched by one process or replica is a hit for all of them.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_DIR = os.environ.get("KHMDHS_CACHE_DIR", "data/response_cache")
+
+
+def payload_key(payload, variant=""):
+    """Canonical hash of a cleaned payload (key order and spacing ignored)"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{variant}|{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe response cache with per-entry TTL and a memory budget"""
+
+    def __init__(self, ttl=900, max_bytes=64 * 1024 * 1024, persist_dir=None, shared=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.persist_dir = persist_dir
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, JSON encoding)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(self, key):
+        """A fresh copy of the cached value for key, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                encoded = entry[2]
+            else:
+                encoded = None
+                if entry:
+                    self._drop(key)
+        if encoded is not None:
+            return json.loads(encoded)
+
+        value, expires_at = self._read_disk(key, now)
+        from_shared = False
+        if value is None:
+            value, expires_at = self._read_shared(key)
+            from_shared = value is not None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += from_shared
+            encoded = json.dumps(value, ensure_ascii=False)
+            self._insert(key, encoded, expires_at, len(encoded.encode("utf-8")))
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store a JSON-serializable value for ttl seconds (default self.ttl)"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._insert(key, encoded, expires_at, len(encoded.encode("utf-8")))
+        self._write_disk(key, encoded, expires_at)
+        self._write_shared(key, encoded, expires_at)
+
+    def clear(self):
+        """Empty this process's memory and disk parts (the shared tier expires on its own)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.persist_dir:
+            for name in os.listdir(self.persist_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.persist_dir, name))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (memory part, caller holds the lock)
+    # ------------------------------------------------------------------
+
+    def _insert(self, key, encoded, expires_at, size):
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, size, encoded)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    # ------------------------------------------------------------------
+    # Internals (disk part)
+    # ------------------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.persist_dir:
+            return None, None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                record = json.load(f)
+            expires_at, value = record["expires_at"], record["value"]
+        except (OSError, ValueError, KeyError, TypeError):
+            # Unreadable or truncated records count as misses
+            return None, None
+        if expires_at <= now:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None, None
+        return value, expires_at
+
+    def _write_disk(self, key, encoded, expires_at):
+        if not self.persist_dir:
+            return
+        tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f'{{"expires_at": {expires_at}, "value": {encoded}}}')
+        os.replace(tmp, self._path(key))
+
+    # ------------------------------------------------------------------
+    # Internals (shared part)
+    # ------------------------------------------------------------------
+
+    def _read_shared(self, key):
+        if self.shared is None:
+            return None, None
+        payload = self.shared.get(f"response:{key}")
+        if payload is None:
+            return None, None
+        try:
+            record = json.loads(payload)
+            return record["value"], record["expires_at"]
+        except (ValueError, KeyError, TypeError):
+            return None, None
+
+    def _write_shared(self, key, encoded, expires_at):
+        if self.shared is None:
+            return
+        ttl = expires_at - time.time()
+        if ttl > 0:
+            payload = f'{{"expires_at": {expires_at}, "value": {encoded}}}'.encode("utf-8")
+            self.shared.set(f"response:{key}", payload, ttl=ttl)
@@ -0,0 +1,366 @@
+"""Named ΚΗΜΔΗΣ searches evaluated on the server
+
+A saved search is a set of sidebar filters with a name. Every run answers
+it again and compares the result with the reference numbers of its
+previous run, kept in SQLite, so only the new matches are reported, to the
+dashboard and to the search's sink (the alert sinks of alerts.py). The
+first run of a search only records what already matches.
+
+Searches are grouped by their date window: each window is fetched once
+(from the API only when the local notice store does not cover it) and
+every search of the window is then filtered locally in the store, so 200
+saved searches over the usual "last 30 days" cost no more API calls than
+one. The date ranges swept from the API are remembered, so a window the
+store does not cover is fetched in full once and afterwards only from
+where the earlier sweeps end (less SYNC_LOOKBACK_DAYS, for amendments).
+The dashboard runs them in the background after each notice sync; they
+can also run headless:
+
+    python saved_searches.py add "Καύσιμα" --title καυσίμων --contract-type Προμήθειες --window-days 30
+    python saved_searches.py add "Λογισμικό" --cpv 48 --budget-from 50000 --sink file:data/new_matches.jsonl
+    python saved_searches.py run --interval 900
+    python saved_searches.py list
+
+Sinks are checked on the server, as they write files or call URLs: a
+search may only use a file sink under SAVED_SEARCH_FILE_DIR or one of the
+specs listed (whitespace separated) in the SAVED_SEARCH_SINKS environment
+variable, the only ones the dashboard offers:
+
+    SAVED_SEARCH_SINKS="webhook:http://hooks.internal/tenders smtp:localhost:1025:team@example.com"
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta, timezone
+
+from alerts import parse_sink, to_utc
+from khmdhs_api import (
+    KHMDHS_CONTRACT_TYPES,
+    build_khmdhs_payload,
+    create_khmdhs_client,
+    fetch_khmdhs_pages,
+    get_khmdhs_pdf_link,
+)
+from notice_store import NOTICE_STORE_PATH, SYNC_LOOKBACK_DAYS, NoticeStore
+
+SAVED_SEARCHES_PATH = os.environ.get("SAVED_SEARCHES_PATH", "data/saved_searches.db")
+# Sink specs a search may use besides file sinks under SAVED_SEARCH_FILE_DIR
+SAVED_SEARCH_SINKS = os.environ.get("SAVED_SEARCH_SINKS", "").split()
+SAVED_SEARCH_FILE_DIR = os.environ.get("SAVED_SEARCH_FILE_DIR", "data")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_searches (
+    name TEXT PRIMARY KEY,
+    filters TEXT NOT NULL,
+    window_days INTEGER,
+    sink TEXT,
+    created_at TEXT NOT NULL,
+    last_run TEXT,
+    last_total INTEGER,
+    last_new INTEGER,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS saved_search_matches (
+    name TEXT NOT NULL,
+    reference_number TEXT NOT NULL,
+    title TEXT,
+    final_submission_date TEXT,
+    first_seen TEXT NOT NULL,
+    PRIMARY KEY (name, reference_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_saved_search_matches_seen ON saved_search_matches (name, first_seen);
+CREATE TABLE IF NOT EXISTS saved_search_sweeps (
+    date_from TEXT PRIMARY KEY,
+    covered_to TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def check_sink(spec):
+    """Sink of an allowed spec, ValueError for any other
+
+    Allowed are the specs of SAVED_SEARCH_SINKS and file sinks whose path
+    resolves inside SAVED_SEARCH_FILE_DIR.
+    """
+    if spec in SAVED_SEARCH_SINKS:
+        return parse_sink(spec)
+    kind, _, target = spec.partition(":")
+    if kind == "file" and target:
+        root = os.path.realpath(SAVED_SEARCH_FILE_DIR)
+        if os.path.realpath(target).startswith(root + os.sep):
+            return parse_sink(spec)
+    raise ValueError(f"Μη επιτρεπτός προορισμός ειδοποιήσεων: {spec}")
+
+
+def resolve_window(filters, window_days, today=None):
+    """(dateFrom, dateTo) of a search: the last window_days days, or the saved dates"""
+    if window_days:
+        today = today or date.today()
+        return (today - timedelta(days=window_days)).isoformat(), today.isoformat()
+    return filters.get("dateFrom", ""), filters.get("dateTo", "")
+
+
+class SavedSearches:
+    """Saved searches and the result set of each one's last run"""
+
+    def __init__(self, path=SAVED_SEARCHES_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ------------------------------------------------------------------
+    # Searches
+    # ------------------------------------------------------------------
+
+    def save(self, name, filters, window_days=None, sink=None):
+        """Create or replace a search; a replaced search starts over with a new baseline"""
+        if sink:
+            check_sink(sink)  # rejects a sink that is not allowed before it is stored
+        filters = {k: v for k, v in filters.items() if k not in ("dateFrom", "dateTo") or not window_days}
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM saved_search_matches WHERE name = ?", (name,))
+            conn.execute(
+                "INSERT OR REPLACE INTO saved_searches (name, filters, window_days, sink, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, json.dumps(filters, ensure_ascii=False), window_days, sink or None,
+                 datetime.now().isoformat(timespec="seconds"))
+            )
+
+    def remove(self, name):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM saved_search_matches WHERE name = ?", (name,))
+            conn.execute("DELETE FROM saved_searches WHERE name = ?", (name,))
+
+    def list(self):
+        """Every search as a dict, filters decoded"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("SELECT * FROM saved_searches ORDER BY name")
+            columns = [d[0] for d in cursor.description]
+            searches = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for search in searches:
+            search["filters"] = json.loads(search["filters"])
+        return searches
+
+    def matches(self, name, new_only=False):
+        """Matches of a search's last run, newest first; with new_only, those it added"""
+        sql = (
+            "SELECT m.reference_number, m.title, m.final_submission_date, m.first_seen "
+            "FROM saved_search_matches m JOIN saved_searches s ON s.name = m.name WHERE m.name = ?"
+        )
+        if new_only:
+            sql += " AND m.first_seen = s.last_run AND s.last_new > 0"
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql + " ORDER BY m.first_seen DESC, m.reference_number", (name,))
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def _record(self, search, current, run_at):
+        """Replace the stored result set of a search, returns the new matches"""
+        name = search["name"]
+        with closing(self._connect()) as conn:
+            previous = {row[0] for row in conn.execute(
+                "SELECT reference_number FROM saved_search_matches WHERE name = ?", (name,)
+            )}
+        # The first run is the baseline: what already matches is not news
+        baseline = search["last_run"] is None
+        new = [] if baseline else [row for ref, row in current.items() if ref not in previous]
+
+        if new and search["sink"]:
+            now = datetime.now(timezone.utc)
+            alerts = []
+            for reference, title, deadline in new:
+                days_left = (to_utc(deadline) - now).days if deadline else None
+                alerts.append({
+                    "key": f"saved:{name}:{reference}",
+                    "search": name,
+                    "source": f"ΚΗΜΔΗΣ • {name}",
+                    "title": title,
+                    "deadline": deadline or "",
+                    "days_left": days_left,
+                    "found_at": run_at,
+                    "link": get_khmdhs_pdf_link(reference),
+                })
+            # Raises before anything is recorded, so the next run reports them again;
+            # checked again as the allowed sinks may have changed since the search was saved
+            check_sink(search["sink"]).send(alerts)
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "DELETE FROM saved_search_matches WHERE name = ? AND reference_number = ?",
+                [(name, ref) for ref in previous - current.keys()]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO saved_search_matches "
+                "(name, reference_number, title, final_submission_date, first_seen) VALUES (?, ?, ?, ?, ?)",
+                [(name, *row, run_at) for ref, row in current.items() if ref not in previous]
+            )
+            conn.execute(
+                "UPDATE saved_searches SET last_run = ?, last_total = ?, last_new = ?, last_error = NULL "
+                "WHERE name = ?",
+                (run_at, len(current), len(new), name)
+            )
+        return new
+
+    def _swept_until(self, date_from):
+        """Last day of the swept range that includes date_from, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT covered_to FROM saved_search_sweeps WHERE date_from <= ? AND covered_to >= ?",
+                (date_from, date_from)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _mark_swept(self, date_from, date_to, today):
+        """Record a complete sweep of [date_from, date_to], merged with the ranges it overlaps or touches
+
+        Days within SYNC_LOOKBACK_DAYS of today are left out, since notices
+        registered on them can still be amended.
+        """
+        covered_to = min(date_to, (today - timedelta(days=SYNC_LOOKBACK_DAYS)).isoformat())
+        if covered_to < date_from:
+            return
+        low = (date.fromisoformat(date_from) - timedelta(days=1)).isoformat()
+        high = (date.fromisoformat(covered_to) + timedelta(days=1)).isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            merged = conn.execute(
+                "SELECT MIN(date_from), MAX(covered_to) FROM saved_search_sweeps "
+                "WHERE date_from <= ? AND covered_to >= ?",
+                (high, low)
+            ).fetchone()
+            conn.execute(
+                "DELETE FROM saved_search_sweeps WHERE date_from <= ? AND covered_to >= ?",
+                (high, low)
+            )
+            conn.execute(
+                "INSERT INTO saved_search_sweeps (date_from, covered_to) VALUES (?, ?)",
+                (min(filter(None, (merged[0], date_from))), max(filter(None, (merged[1], covered_to))))
+            )
+
+    def _fail(self, names, error):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE saved_searches SET last_error = ? WHERE name = ?", [(error, n) for n in names])
+
+    def run(self, store, client=None, max_workers=4, today=None):
+        """Evaluate every search, one sweep per distinct date window
+
+        The part of a window that neither the store's sync nor an earlier
+        sweep covers is fetched from the API and written to the store; each
+        search of the window is then a local query. A window with failed
+        pages is skipped, so a partial result is never mistaken for notices
+        that stopped matching.
+        """
+        today = today or date.today()
+        searches = self.list()
+        windows = {}
+        for search in searches:
+            window = resolve_window(search["filters"], search["window_days"], today)
+            windows.setdefault(window, []).append(search)
+
+        summary = {"searches": len(searches), "windows": len(windows), "api_sweeps": 0, "new": 0, "errors": 0}
+        for (date_from, date_to), group in windows.items():
+            window_filters = {"dateFrom": date_from, "dateTo": date_to}
+            sweep_from = date_from
+            swept_until = self._swept_until(date_from) if date_from else None
+            if swept_until:
+                sweep_from = (date.fromisoformat(swept_until) + timedelta(days=1)).isoformat()
+            if not store.covers(window_filters) and not (date_to and sweep_from > date_to):
+                summary["api_sweeps"] += 1
+                results, failed = fetch_khmdhs_pages(
+                    client or create_khmdhs_client(),
+                    build_khmdhs_payload({"dateFrom": sweep_from, "dateTo": date_to}),
+                    all_pages=True,
+                    max_workers=max_workers
+                )
+                if failed:
+                    self._fail([s["name"] for s in group], f"{len(failed)} σελίδες απέτυχαν")
+                    summary["errors"] += len(group)
+                    continue
+                store.upsert(results.get("content", []))
+                if sweep_from and date_to:
+                    self._mark_swept(sweep_from, date_to, today)
+
+            run_at = datetime.now().isoformat(timespec="seconds")
+            for search in group:
+                filters = {**search["filters"], **window_filters}
+                current = {row[0]: row for row in store.query_references(filters)}
+                try:
+                    summary["new"] += len(self._record(search, current, run_at))
+                except Exception as e:
+                    self._fail([search["name"]], f"{type(e).__name__}: {e}")
+                    summary["errors"] += 1
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Αποθηκευμένες αναζητήσεις ΚΗΜΔΗΣ")
+    parser.add_argument("--path", default=SAVED_SEARCHES_PATH, help="saved searches SQLite file")
+    parser.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_cmd = sub.add_parser("add", help="save (or replace) a search")
+    add_cmd.add_argument("name")
+    add_cmd.add_argument("--title", default="")
+    add_cmd.add_argument("--contract-type", choices=list(KHMDHS_CONTRACT_TYPES), default="Όλα")
+    add_cmd.add_argument("--window-days", type=int, help="rolling window ending today")
+    add_cmd.add_argument("--date-from", help="fixed window start, without --window-days")
+    add_cmd.add_argument("--date-to", help="fixed window end, without --window-days")
+    add_cmd.add_argument("--budget-from", type=float, default=0)
+    add_cmd.add_argument("--budget-to", type=float, default=0)
+    add_cmd.add_argument("--cpv", action="append", default=[], help="CPV code or prefix, repeatable")
+    add_cmd.add_argument("--sink", help="file:PATH under SAVED_SEARCH_FILE_DIR, or a spec of SAVED_SEARCH_SINKS, for new matches")
+    remove_cmd = sub.add_parser("remove", help="delete a search")
+    remove_cmd.add_argument("name")
+    sub.add_parser("list", help="show the searches and their last run")
+    run_cmd = sub.add_parser("run", help="evaluate the searches periodically")
+    run_cmd.add_argument("--interval", type=int, default=900, help="seconds between runs")
+    run_cmd.add_argument("--workers", type=int, default=4, help="parallel page requests per sweep")
+    run_cmd.add_argument("--once", action="store_true", help="run once and exit")
+    args = parser.parse_args(argv)
+
+    saved = SavedSearches(args.path)
+    if args.command == "add":
+        window_days = args.window_days or (None if args.date_from or args.date_to else 30)
+        saved.save(args.name, {
+            "title": args.title,
+            "contractType": KHMDHS_CONTRACT_TYPES[args.contract_type],
+            "dateFrom": args.date_from or "",
+            "dateTo": args.date_to or "",
+            "totalCostFrom": args.budget_from,
+            "totalCostTo": args.budget_to,
+            "cpvItems": args.cpv,
+        }, window_days=window_days, sink=args.sink)
+        return 0
+    if args.command == "remove":
+        saved.remove(args.name)
+        return 0
+    if args.command == "list":
+        for search in saved.list():
+            print(json.dumps(search, ensure_ascii=False))
+        return 0
+
+    store = NoticeStore(args.db)
+    client = create_khmdhs_client()
+    while True:
+        summary = saved.run(store, client=client, max_workers=args.workers)
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {json.dumps(summary)}")
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
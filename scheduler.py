@@ -0,0 +1,257 @@
+"""In-process background refresh of the dashboard's hot datasets
+
+One BackgroundRefresher per server process (the dashboard creates it with
+st.cache_resource) runs every registered job on its own daemon thread at
+its own cadence, so a slow job (a cold Διαύγεια ingest) does not hold up
+the others; a job registered with after= waits for another job's first
+attempt before its own. A job's loader builds the complete new value off the request
+path; only then is it swapped in with a single reference assignment, so
+readers always see either the previous or the new dataset, never a half
+built one. A failed refresh keeps serving the previous value and is
+retried sooner than the regular interval.
+
+With a shared-state backend (see shared_state.py), several processes or
+replicas cooperate on the jobs registered with a codec: a job first adopts
+the dataset another process published within its interval, and otherwise
+takes the job's cross-process lock, loads and publishes. A process that
+finds the lock held waits for the holder's result instead of loading the
+same dataset again. The lock is renewed while the load runs, however long
+a cold load takes.
+
+A codec is a (dumps, loads) pair between the value and bytes in a data
+format (JSON_CODEC, Parquet through FilterIndex.to_parquet/from_parquet);
+values are never pickled, since loading a pickle from a backend other
+hosts can write to would run their code. Jobs without a codec are loaded
+by every process; a job that writes local state (a store, an index) must
+not have one, or a process adopting its result would skip those writes.
+"""
+import json
+import threading
+import time
+from datetime import datetime
+
+# Seconds before a failed job is retried (capped by its interval)
+RETRY_DELAY = 60
+# Seconds before a process that found the refresh lock held looks for the published dataset
+LOCK_RETRY_DELAY = 5
+# TTL of a refresh lock; renewed while the load runs, so it only bounds a crashed holder
+REFRESH_LOCK_TTL = 60
+# Seconds between checks of a stop request while a job waits for the one it runs after
+STOP_POLL_SECONDS = 1
+
+
+def json_dumps(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+# Codec of plain dict/list values such as run summaries
+JSON_CODEC = (json_dumps, json.loads)
+
+
+class RefreshJob:
+    def __init__(self, name, loader, interval, shared=None, after=None, codec=None):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        # Only a job with a codec has anything to share
+        self.shared = shared if codec is not None else None
+        self.codec = codec
+        # Job whose first attempt this one waits for
+        self.after = after
+        # (value, loaded_at) replaced as a whole so readers never see a mix
+        self.snapshot = None
+        self.last_error = None
+        self.last_duration = None
+        self.next_run = 0.0
+        # "local" when this process loaded the snapshot, "shared" when it was adopted
+        self.source = None
+        # Set by refresh_now: load even when a fresh published dataset exists
+        self.forced = False
+        self.ready = threading.Event()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def run(self):
+        if self.shared is None:
+            self._load()
+            return
+        try:
+            self._run_shared()
+        except Exception as e:
+            # An unreachable backend must not stop the refresh thread; a dataset
+            # loaded before the failure keeps its regular schedule
+            self.last_error = f"shared state: {type(e).__name__}: {e}"
+            if self.next_run <= time.monotonic():
+                self.next_run = time.monotonic() + min(RETRY_DELAY, self.interval)
+            self.ready.set()
+
+    def _run_shared(self):
+        forced, self.forced = self.forced, False
+        if not forced and self._adopt():
+            return
+        with self.shared.lock(f"refresh:{self.name}", ttl=REFRESH_LOCK_TTL, keepalive=True) as acquired:
+            if not acquired:
+                # Another process is loading; pick up its result shortly
+                self.next_run = time.monotonic() + min(LOCK_RETRY_DELAY, self.interval)
+                return
+            # The previous holder may have published between our check and the lock
+            if not forced and self._adopt():
+                return
+            self._load()
+            if self.last_error is None:
+                self._publish()
+
+    def _load(self):
+        started = time.monotonic()
+        try:
+            value = self.loader()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.next_run = time.monotonic() + min(RETRY_DELAY, self.interval)
+        else:
+            self.snapshot = (value, datetime.now())
+            self.last_error = None
+            self.source = "local"
+            self.next_run = time.monotonic() + self.interval
+        finally:
+            self.last_duration = time.monotonic() - started
+            # Waiters are released after the first attempt, successful or not
+            self.ready.set()
+
+    # ------------------------------------------------------------------
+    # Shared state
+    # ------------------------------------------------------------------
+
+    def _adopt(self):
+        """Take the dataset another process published within the interval, if any"""
+        stamp = self.shared.get(f"dataset:{self.name}:loaded_at")
+        if stamp is None:
+            return False
+        loaded_at = float(stamp)
+        age = time.time() - loaded_at
+        if age >= self.interval:
+            return False
+        current = self.snapshot
+        if current is None or current[1].timestamp() != loaded_at:
+            # The timestamp is checked first so an unchanged dataset is not transferred again
+            payload = self.shared.get(f"dataset:{self.name}")
+            if payload is None:
+                return False
+            self.snapshot = (self.codec[1](payload), datetime.fromtimestamp(loaded_at))
+            self.last_error = None
+            self.source = "shared"
+        self.next_run = time.monotonic() + self.interval - age
+        self.ready.set()
+        return True
+
+    def _publish(self):
+        value, loaded_at = self.snapshot
+        ttl = 2 * self.interval
+        self.shared.set(f"dataset:{self.name}", self.codec[0](value), ttl=ttl)
+        # Written last: readers only look for the dataset once its timestamp is there
+        self.shared.set(f"dataset:{self.name}:loaded_at", repr(loaded_at.timestamp()).encode("ascii"), ttl=ttl)
+
+
+class BackgroundRefresher:
+    """Runs registered loaders on a daemon thread each and serves their latest values
+
+    shared is an optional shared-state backend (shared_state.open_shared_state)
+    through which the jobs of several processes share their datasets (jobs registered with a codec).
+    """
+
+    def __init__(self, shared=None):
+        self.shared = shared
+        self._jobs = {}
+        self._stop = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, interval, after=None, codec=None):
+        """Add a job; it first runs as soon as the refresher is started
+
+        after names a registered job whose first attempt (successful or
+        not) this job waits for, e.g. a tree built from the synced store.
+        codec, a (dumps, loads) pair, lets processes share the job's value.
+        """
+        with self._lock:
+            job = RefreshJob(name, loader, interval, shared=self.shared,
+                             after=self._jobs[after] if after else None, codec=codec)
+            self._jobs[name] = job
+            if self._started:
+                self._start_job(job)
+
+    def start(self):
+        with self._lock:
+            self._stop.clear()
+            self._started = True
+            for job in self._jobs.values():
+                self._start_job(job)
+        return self
+
+    def _start_job(self, job):
+        if job.thread is None or not job.thread.is_alive():
+            job.thread = threading.Thread(target=self._loop, args=(job,), name=f"refresh-{job.name}", daemon=True)
+            job.thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._lock:
+            self._started = False
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.wake.set()
+        for job in jobs:
+            if job.thread is not None:
+                job.thread.join(timeout)
+
+    def _loop(self, job):
+        if job.after is not None:
+            while not job.after.ready.wait(STOP_POLL_SECONDS):
+                if self._stop.is_set():
+                    return
+        while not self._stop.is_set():
+            job.wake.clear()
+            if job.next_run <= time.monotonic():
+                job.run()
+            job.wake.wait(max(0.0, job.next_run - time.monotonic()))
+
+    def refresh_now(self, name):
+        """Run a job as soon as its thread is free"""
+        job = self._jobs[name]
+        job.forced = True
+        job.next_run = 0.0
+        job.wake.set()
+
+    def get(self, name, wait=None):
+        """Latest value of a job, or None before its first successful run
+
+        With wait (seconds), blocks until the job's first attempt finished
+        or the wait ran out; only readers right after a server start wait.
+        """
+        job = self._jobs[name]
+        if wait:
+            job.ready.wait(wait)
+        snapshot = job.snapshot
+        if snapshot is None and job.last_error:
+            raise RuntimeError(job.last_error)
+        return snapshot[0] if snapshot else None
+
+    def ready(self, name):
+        """Whether a job's first attempt has finished"""
+        return self._jobs[name].ready.is_set()
+
+    def status(self):
+        """One dict per job for diagnostics (loaded_at, source, last error, duration)"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            {
+                "name": job.name,
+                "loaded_at": job.snapshot[1] if job.snapshot else None,
+                "source": job.source,
+                "error": job.last_error,
+                "duration_s": job.last_duration,
+                "interval_s": job.interval,
+            }
+            for job in jobs
+        ]
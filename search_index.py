@@ -0,0 +1,288 @@
+"""Local full-text search over ΚΗΜΔΗΣ and Διαύγεια titles (SQLite FTS5)
+
+Documents are tokenized in Python (greek_text.tokenize: accent folding,
+uppercase, final sigma) and stored in an FTS5 table; queries are reduced
+with a light Greek stemmer and run as prefix queries, so "προμηθειών"
+finds "Προμήθεια" and "ΠΡΟΜΗΘΕΙΑΣ". Results are ranked with bm25, the
+title weighing ten times the body. Updates are incremental: a document is
+re-indexed only when its text fingerprint changes, and the notice store is
+read from the last indexed synced_at onwards.
+
+The body holds text extracted from the notice PDF when pypdf is installed:
+
+    python search_index.py update
+    python search_index.py pdfs --limit 50
+    python search_index.py search "προμήθεια καυσίμων" --source khmdhs
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+
+from attachments import ATTACHMENT_CACHE_DIR, AttachmentCache
+from greek_text import light_stem, tokenize
+from khmdhs_api import get_khmdhs_pdf_link
+from notice_store import NOTICE_STORE_PATH, NoticeStore
+
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", "data/search_index.db")
+SOURCES = ("khmdhs", "diavgeia")
+# bm25 column weights: title, body (source is only used as a filter)
+BM25 = "bm25(docs_fts, 10.0, 1.0, 0.0)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT UNIQUE NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT,
+    link TEXT,
+    published TEXT,
+    fingerprint TEXT NOT NULL,
+    has_body INTEGER NOT NULL DEFAULT 0,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_source ON docs (source);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, source, tokenize = 'unicode61');
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def index_terms(text):
+    return " ".join(tokenize(text))
+
+
+def match_expression(query):
+    """FTS5 MATCH expression: every stemmed query token as a quoted prefix term"""
+    stems = [light_stem(token) for token in tokenize(query)]
+    return " AND ".join(f'"{stem}"*' for stem in stems)
+
+
+def pdf_reader_class():
+    """pypdf's PdfReader; pypdf is optional and only needed for PDF text"""
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("pip install pypdf για εξαγωγή κειμένου από PDF") from e
+    return PdfReader
+
+
+def extract_pdf_text(data, max_pages=20):
+    """Text of the first pages of a PDF"""
+    reader = pdf_reader_class()(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[:max_pages])
+
+
+class SearchIndex:
+    """FTS5 index of titles (and optional PDF text) keyed by source:id"""
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_state(self, key, default=None):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM index_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, **values):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO index_state (key, value) VALUES (?, ?)",
+                [(k, str(v)) for k, v in values.items()]
+            )
+
+    def upsert(self, docs):
+        """Index dicts with doc_id, source, title and optionally body, link, published
+
+        A document whose title and body are unchanged is skipped. A missing
+        body keeps the previously extracted one. Returns the number indexed.
+        """
+        indexed_at = datetime.now().isoformat(timespec="seconds")
+        written = 0
+        with closing(self._connect()) as conn, conn:
+            for doc in docs:
+                existing = conn.execute(
+                    "SELECT id, fingerprint, has_body FROM docs WHERE doc_id = ?", (doc["doc_id"],)
+                ).fetchone()
+                body = doc.get("body")
+                if body is None and existing and existing[2]:
+                    body = conn.execute("SELECT body FROM docs_fts WHERE rowid = ?", (existing[0],)).fetchone()[0]
+                    title_terms, body_terms = index_terms(doc.get("title")), body
+                else:
+                    title_terms, body_terms = index_terms(doc.get("title")), index_terms(body)
+                fingerprint = hashlib.sha1(f"{title_terms}\x00{body_terms}".encode("utf-8")).hexdigest()
+                if existing and existing[1] == fingerprint:
+                    continue
+
+                values = (
+                    doc["source"], doc.get("title"), doc.get("link"), doc.get("published"),
+                    fingerprint, int(bool(body_terms)), indexed_at
+                )
+                if existing:
+                    rowid = existing[0]
+                    conn.execute(
+                        "UPDATE docs SET source = ?, title = ?, link = ?, published = ?, fingerprint = ?, "
+                        "has_body = ?, indexed_at = ? WHERE id = ?",
+                        values + (rowid,)
+                    )
+                    conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (rowid,))
+                else:
+                    rowid = conn.execute(
+                        "INSERT INTO docs (doc_id, source, title, link, published, fingerprint, has_body, indexed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (doc["doc_id"],) + values
+                    ).lastrowid
+                conn.execute(
+                    "INSERT INTO docs_fts (rowid, title, body, source) VALUES (?, ?, ?, ?)",
+                    (rowid, title_terms, body_terms, doc["source"])
+                )
+                written += 1
+        return written
+
+    def search(self, query, source=None, limit=50):
+        """Ranked matches (best first) as dicts with doc_id, source, title, link, published, score"""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        if source:
+            expression = f'({expression}) AND source : "{source}"'
+        # Rank inside the FTS table first, then join only the top rows
+        sql = (
+            "SELECT d.doc_id, d.source, d.title, d.link, d.published, -r.rank AS score FROM ("
+            f"SELECT rowid, {BM25} AS rank FROM docs_fts WHERE docs_fts MATCH ? ORDER BY rank LIMIT ?"
+            ") r JOIN docs d ON d.id = r.rowid ORDER BY r.rank"
+        )
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql, (expression, limit))
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def count(self, source=None):
+        with closing(self._connect()) as conn:
+            if source:
+                return conn.execute("SELECT COUNT(*) FROM docs WHERE source = ?", (source,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def index_store(self, store):
+        """Index the notice titles written to the store since the last call"""
+        since = self.get_state("khmdhs_synced_at", "")
+        latest = since
+        written = 0
+        for rows in store.iter_synced(since):
+            written += self.upsert(
+                {
+                    "doc_id": f"khmdhs:{reference}",
+                    "source": "khmdhs",
+                    "title": title,
+                    "link": get_khmdhs_pdf_link(reference),
+                    "published": registration_date,
+                }
+                for reference, title, registration_date, _ in rows
+            )
+            latest = max(latest, rows[-1][3])
+        self.set_state(khmdhs_synced_at=latest)
+        return written
+
+    def index_announcements(self, df):
+        """Index the titles of a normalized Διαύγεια announcements frame"""
+        published = df["published_date"].astype(str).str[:10] if "published_date" in df else None
+        return self.upsert(
+            {
+                "doc_id": f"diavgeia:{ada}",
+                "source": "diavgeia",
+                "title": title,
+                "link": link,
+                "published": published.iloc[i] if published is not None else None,
+            }
+            for i, (ada, title, link) in enumerate(zip(df["ada"], df["title"], df["link"]))
+        )
+
+    def index_pdfs(self, fetch, limit=50):
+        """Extract and index the PDF text of up to `limit` ΚΗΜΔΗΣ notices without a body
+
+        fetch(url) returns the PDF bytes. Returns (indexed, failed).
+        """
+        pdf_reader_class()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT doc_id, source, title, link, published FROM docs "
+                "WHERE source = 'khmdhs' AND has_body = 0 AND link IS NOT NULL "
+                "ORDER BY published DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        indexed, failed = 0, 0
+        for doc_id, source, title, link, published in rows:
+            try:
+                body = extract_pdf_text(fetch(link))
+            except Exception:
+                failed += 1
+                continue
+            indexed += self.upsert([{
+                "doc_id": doc_id, "source": source, "title": title,
+                "link": link, "published": published, "body": body,
+            }])
+        return indexed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Τοπική αναζήτηση κειμένου")
+    parser.add_argument("--index", default=SEARCH_INDEX_PATH, help="search index SQLite file")
+    parser.add_argument("--db", default=NOTICE_STORE_PATH, help="notice store SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("update", help="index notices added to the store since the last update")
+    pdfs_cmd = sub.add_parser("pdfs", help="index the PDF text of notices (needs pypdf)")
+    pdfs_cmd.add_argument("--limit", type=int, default=50)
+    pdfs_cmd.add_argument("--attachments", default=ATTACHMENT_CACHE_DIR, help="attachment cache directory")
+    search_cmd = sub.add_parser("search", help="ranked search")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--source", choices=SOURCES)
+    search_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    if args.command == "update":
+        print(json.dumps({"indexed": index.index_store(NoticeStore(args.db)), "documents": index.count()}))
+    elif args.command == "pdfs":
+        from khmdhs_api import create_khmdhs_client
+
+        client = create_khmdhs_client()
+        cache = AttachmentCache(args.attachments)
+
+        def fetch(url):
+            with open(cache.fetch(client, url), "rb") as f:
+                return f.read()
+
+        indexed, failed = index.index_pdfs(fetch, limit=args.limit)
+        print(json.dumps({"indexed": indexed, "failed": failed}))
+        return 1 if failed and not indexed else 0
+    elif args.command == "search":
+        started = time.perf_counter()
+        results = index.search(args.query, source=args.source, limit=args.limit)
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False))
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
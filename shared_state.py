@@ -0,0 +1,338 @@
+"""Shared state for running several dashboard processes or replicas
+
+Every process keeps its own st.cache_resource objects, so N workers behind
+a load balancer would otherwise refresh every dataset, repeat every
+upstream search and fire every alert N times. A shared-state backend holds
+what they have in common:
+
+- published datasets of the background refresher, and a lock per job so
+  only one process loads a dataset while the others reuse it,
+- ΚΗΜΔΗΣ search responses (a second tier behind the in-memory cache),
+- the fired-alert keys, claimed atomically before an alert is delivered.
+
+Two backends with the same small interface (bytes values, optional TTL):
+
+    sqlite:///data/shared_state.db   processes on one host or one volume
+    redis://host:6379/0              replicas on several hosts; any server
+                                     speaking the Redis protocol will do
+                                     (Redis, Valkey, a local stand-in)
+
+The Redis backend needs `pip install redis`. It is enabled with the
+SHARED_STATE_URL environment variable; without it every process keeps its
+state to itself, as before:
+
+    SHARED_STATE_URL=sqlite:///data/shared_state.db streamlit run streamlit_app.py --server.port 8501
+    python shared_state.py stats
+    python shared_state.py locks
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+SHARED_STATE_URL = os.environ.get("SHARED_STATE_URL", "")
+# Seconds a lock is held at most, so a crashed holder cannot block the others forever
+LOCK_TTL = 600
+# A lock with keepalive is renewed every ttl / LOCK_RENEWALS seconds while it is held
+LOCK_RENEWALS = 3
+LOCK_POLL_SECONDS = 0.1
+KEY_PREFIX = "diavgeia-monitor:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_shared_state_expires ON shared_state (expires_at);
+"""
+
+# Expired rows are purged once every this many writes
+PURGE_EVERY = 500
+
+
+class SharedLock:
+    """Cross-process lock on a backend: set-if-absent with a TTL and an owner token
+
+        with state.lock("refresh:announcements", ttl=60, keepalive=True) as acquired:
+            if acquired:
+                ...
+
+    With keepalive, a daemon thread extends the TTL while the lock is held,
+    so work of any length keeps it and a crashed holder still frees it
+    within one TTL.
+    """
+
+    def __init__(self, backend, name, ttl=LOCK_TTL, blocking=False, timeout=None, keepalive=False):
+        self.backend = backend
+        self.key = f"lock:{name}"
+        self.ttl = ttl
+        self.blocking = blocking
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.token = uuid.uuid4().hex.encode("ascii")
+        self.acquired = False
+        self._released = threading.Event()
+        self._renewer = None
+
+    def acquire(self):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            if self.backend.add(self.key, self.token, ttl=self.ttl):
+                self.acquired = True
+                if self.keepalive:
+                    self._released.clear()
+                    self._renewer = threading.Thread(target=self._renew, name=f"renew-{self.key}", daemon=True)
+                    self._renewer.start()
+                return True
+            if not self.blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(LOCK_POLL_SECONDS)
+
+    def _renew(self):
+        while not self._released.wait(self.ttl / LOCK_RENEWALS):
+            try:
+                if not self.backend.expire_if(self.key, self.token, self.ttl):
+                    return  # expired and possibly taken by another process: nothing to keep
+            except Exception:
+                pass  # a backend hiccup; the next renewal retries before the TTL runs out
+
+    def release(self):
+        """Release the lock if this holder still owns it (it may have expired meanwhile)"""
+        if self.acquired:
+            self._released.set()
+            if self._renewer is not None:
+                self._renewer.join()
+                self._renewer = None
+            self.backend.delete_if(self.key, self.token)
+            self.acquired = False
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class SqliteState:
+    """Shared state in one SQLite file (WAL), safe across processes on a host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f"SqliteState({self.path!r})"
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        """Value of a key as bytes, or None when missing or expired"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+        self._maybe_purge()
+
+    def add(self, key, value, ttl=None):
+        """Set a key only if it is missing or expired, returns whether it was set"""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with closing(self._connect()) as conn, conn:
+            # BEGIN IMMEDIATE takes the write lock before the check, so two processes cannot both add
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM shared_state WHERE key = ? AND expires_at <= ?", (key, now))
+            added = conn.execute(
+                "INSERT OR IGNORE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            ).rowcount
+        return bool(added)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM shared_state WHERE key = ?", [(key,) for key in keys])
+
+    def delete_if(self, key, value):
+        """Delete a key only while it still holds value (lock release)"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM shared_state WHERE key = ? AND value = ?", (key, value))
+
+    def expire_if(self, key, value, ttl):
+        """Reset the TTL of a key only while it still holds value (lock renewal)"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            return bool(conn.execute(
+                "UPDATE shared_state SET expires_at = ? WHERE key = ? AND value = ? AND expires_at > ?",
+                (now + ttl, key, value, now)
+            ).rowcount)
+
+    def keys(self, prefix=""):
+        with closing(self._connect()) as conn:
+            return [
+                row[0] for row in conn.execute(
+                    "SELECT key FROM shared_state WHERE key >= ? AND key < ? "
+                    "AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+                    (prefix, f"{prefix}￿", time.time())
+                )
+            ]
+
+    def lock(self, name, ttl=LOCK_TTL, blocking=False, timeout=None, keepalive=False):
+        return SharedLock(self, name, ttl=ttl, blocking=blocking, timeout=timeout, keepalive=keepalive)
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM shared_state "
+                "WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),)
+            ).fetchone()
+        return {"backend": "sqlite", "entries": entries, "bytes": size}
+
+    def _maybe_purge(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes % PURGE_EVERY:
+                return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+
+
+def redis_module():
+    """redis-py; only needed for redis:// URLs"""
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("pip install redis για κοινή κατάσταση σε Redis") from e
+    return redis
+
+
+class RedisState:
+    """Shared state on a Redis-protocol server, every key under KEY_PREFIX
+
+    Only plain commands and WATCH/MULTI transactions are used (no Lua), so
+    lightweight stand-ins of the protocol work as well as Redis itself.
+    """
+
+    def __init__(self, url, prefix=KEY_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        self.redis = redis_module()
+        self.client = self.redis.Redis.from_url(url)
+
+    def __repr__(self):
+        return f"RedisState({self.url!r})"
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self.prefix + key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def delete_if(self, key, value):
+        # WATCH makes the delete fail if the key changed after the comparison, so a lock
+        # that expired and was taken by another process is never released by its old holder
+        key = self.prefix + key
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == value:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+            except self.redis.WatchError:
+                pass
+
+    def expire_if(self, key, value, ttl):
+        key = self.prefix + key
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) != value:
+                    return False
+                pipe.multi()
+                pipe.pexpire(key, int(ttl * 1000))
+                return bool(pipe.execute()[0])
+            except self.redis.WatchError:
+                return False
+
+    def keys(self, prefix=""):
+        return sorted(
+            key.decode("utf-8")[len(self.prefix):]
+            for key in self.client.scan_iter(match=f"{self.prefix}{prefix}*", count=1000)
+        )
+
+    def lock(self, name, ttl=LOCK_TTL, blocking=False, timeout=None, keepalive=False):
+        return SharedLock(self, name, ttl=ttl, blocking=blocking, timeout=timeout, keepalive=keepalive)
+
+    def stats(self):
+        entries = sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}*", count=1000))
+        return {"backend": "redis", "entries": entries}
+
+
+def open_shared_state(url=SHARED_STATE_URL):
+    """Backend of a URL (sqlite:///path, a plain path or redis://...), None for an empty URL"""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SqliteState(url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Κοινή κατάσταση πολλών διεργασιών")
+    parser.add_argument("--url", default=SHARED_STATE_URL or "sqlite:///data/shared_state.db",
+                        help="sqlite:///PATH or redis://HOST:PORT/DB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="entries in the shared state")
+    sub.add_parser("locks", help="locks currently held")
+    unlock_cmd = sub.add_parser("unlock", help="drop a lock left behind by a stopped process")
+    unlock_cmd.add_argument("name")
+    args = parser.parse_args(argv)
+
+    state = open_shared_state(args.url)
+    if args.command == "stats":
+        print(json.dumps(state.stats()))
+    elif args.command == "locks":
+        for key in state.keys("lock:"):
+            print(key[len("lock:"):])
+    elif args.command == "unlock":
+        state.delete(f"lock:{args.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
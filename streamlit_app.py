@@ -1,11 +1,49 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
 import requests
 import json
+import os
+import tempfile
+import time
+
+from khmdhs_api import (
+    build_khmdhs_payload,
+    create_khmdhs_client,
+    create_khmdhs_limiter,
+    fetch_khmdhs_pages,
+    get_khmdhs_pdf_link,
+    KHMDHS_CONTRACT_TYPES,
+    KHMDHS_MAX_WORKERS,
+)
+from aaht_registry import AahtRegistry
+from aggregates import (
+    AggregateMemo,
+    KHMDHS_DIMENSIONS,
+    RunningAggregates,
+    aggregate_diavgeia,
+    aggregate_khmdhs,
+)
+from alerts import urgent_notices
+from archive import ARCHIVE_DIR, Archive, import_synced
+from attachments import AttachmentCache, ATTACHMENT_CACHE_DIR, fetch_attachments
+from cpv_index import CPV_LEVELS, CpvTree, cpv_pairs, cpv_rollup
+from diavgeia_api import create_diavgeia_client, ingest_announcements
+from exports import export_table
+from filter_index import FilterIndex
+from instrumentation import METRICS_PORT, metrics, stage, start_http_server
+from notice_store import NoticeStore, NOTICE_STORE_PATH
+from notice_table import concat_tables, display_rows, parse_notices
+from org_matcher import OrgMatcher, ORG_MATCH_CACHE_PATH
+from response_cache import ResponseCache, RESPONSE_CACHE_DIR, payload_key
+from saved_searches import SavedSearches, SAVED_SEARCH_SINKS, SAVED_SEARCHES_PATH
+from scheduler import BackgroundRefresher
+from search_index import SearchIndex, SEARCH_INDEX_PATH
+from shared_state import SHARED_STATE_URL, open_shared_state
 
 # ============================================================================
 # PAGE CONFIGURATION
@@ -17,72 +55,374 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# ============================================================================
-# ΚΗΜΔΗΣ API CONFIGURATION
-# ============================================================================
-KHMDHS_BASE_URL = "https://cerpp.eprocurement.gov.gr"
-
 # ============================================================================
 # DATA LOADING FUNCTIONS
 # ============================================================================
 
-@st.cache_data
-def load_aaht_list():
-    """Load AAHT list from Excel"""
+@st.cache_resource
+def get_aaht_registry():
+    """AAHT registry from the Parquet cache (the xlsx is parsed only when it changes)"""
     try:
-        df = pd.read_excel('AAHTList.xlsx')
-        return df
+        with stage("aaht.load"):
+            return AahtRegistry.load('AAHTList.xlsx')
     except Exception as e:
         st.warning(f"⚠️ Δεν βρέθηκε το AAHTList.xlsx: {e}")
-        return pd.DataFrame()
+        return None
+
+@st.cache_resource
+def get_org_matcher():
+    """Αντιστοίχιση φορέων ΚΗΜΔΗΣ/Διαύγειας με ΑΑΗΤ, κοινή για όλες τις sessions"""
+    registry = get_aaht_registry()
+    if registry is None:
+        return None
+    return OrgMatcher(registry, cache_path=ORG_MATCH_CACHE_PATH)
+
+def annotate_organizations(df, column='organization'):
+    """Add aaht_code/aaht_name/aaht_score columns (unchanged df without a registry)"""
+    matcher = get_org_matcher()
+    if matcher is None or df.empty:
+        return df
+    with stage("organizations.annotate"):
+        annotated = matcher.annotate(df, column)
+    matcher.save()
+    return annotated
 
 # ============================================================================
 # ΚΗΜΔΗΣ API FUNCTIONS
 # ============================================================================
 
-def fetch_khmdhs_notices(filters):
-    """Fetch active tenders from ΚΗΜΔΗΣ API"""
-    url = f"{KHMDHS_BASE_URL}/khmdhs-opendata/notice"
-    
-    # Prepare request body
-    payload = {
-        "title": filters.get("title", ""),
-        "cpvItems": filters.get("cpvItems", []),
-        "organizations": filters.get("organizations", []),
-        "contractType": filters.get("contractType", ""),
-        "dateFrom": filters.get("dateFrom", ""),
-        "dateTo": filters.get("dateTo", ""),
-        "totalCostFrom": filters.get("totalCostFrom", 0),
-        "totalCostTo": filters.get("totalCostTo", 0),
-        "finalDateFrom": filters.get("finalDateFrom", ""),
-        "finalDateTo": filters.get("finalDateTo", ""),
-        "isModified": False
-    }
+@st.cache_resource
+def get_khmdhs_limiter():
+    """Rate limiter κοινός για όλες τις sessions της εφαρμογής"""
+    return create_khmdhs_limiter()
+
+@st.cache_resource
+def get_khmdhs_client():
+    """Shared pooled client για όλες τις κλήσεις ΚΗΜΔΗΣ"""
+    return create_khmdhs_client(limiter=get_khmdhs_limiter())
+
+@st.cache_resource
+def get_notice_store():
+    """Τοπική βάση διαγωνισμών, κοινή για όλες τις sessions"""
+    return NoticeStore(NOTICE_STORE_PATH)
+
+@st.cache_resource
+def get_attachment_cache():
+    """Τοπική cache εγγράφων (PDF) διαγωνισμών, κοινή για όλες τις sessions"""
+    return AttachmentCache(ATTACHMENT_CACHE_DIR)
+
+def get_cpv_tree():
+    """Ιεραρχία CPV από την επίσημη λίστα (αν υπάρχει) και τους κωδικούς της τοπικής βάσης,
+    ξαναχτίζεται στο παρασκήνιο μετά από κάθε sync"""
+    tree = get_refresher().get("cpv_tree")
+    return tree if tree is not None else CpvTree([])
+
+@st.cache_resource
+def get_archive():
+    """Ιστορικό αρχείο διαγωνισμών/προκηρύξεων με ημερήσια, εβδομαδιαία και μηνιαία rollups"""
+    return Archive(ARCHIVE_DIR)
+
+@st.cache_resource
+def get_saved_searches():
+    """Αποθηκευμένες αναζητήσεις ΚΗΜΔΗΣ, κοινές για όλες τις sessions"""
+    return SavedSearches(SAVED_SEARCHES_PATH)
+
+@st.cache_resource
+def get_search_index():
+    """Τοπικό full-text index τίτλων ΚΗΜΔΗΣ και Διαύγειας"""
+    return SearchIndex(SEARCH_INDEX_PATH)
+
+@st.cache_resource
+def get_shared_state():
+    """Κοινή κατάσταση μεταξύ διεργασιών/replicas (SHARED_STATE_URL), None όταν δεν έχει οριστεί"""
+    return open_shared_state(SHARED_STATE_URL)
+
+@st.cache_resource
+def get_response_cache():
+    """Κοινή cache απαντήσεων ΚΗΜΔΗΣ (15' TTL, 64MB, με αποθήκευση στο δίσκο και στην κοινή κατάσταση)"""
+    return ResponseCache(
+        ttl=900,
+        max_bytes=64 * 1024 * 1024,
+        persist_dir=RESPONSE_CACHE_DIR,
+        shared=get_shared_state()
+    )
+
+def fetch_khmdhs_notices(filters, all_pages=False, max_workers=4, on_page=None):
+    """Fetch active tenders from ΚΗΜΔΗΣ API
     
-    # Remove empty values
-    payload = {k: v for k, v in payload.items() if v not in ["", [], None]}
+    With all_pages=True, page 0 is read first to find the page count and the
+    remaining pages are fetched concurrently over at most max_workers
+    connections. on_page(page, content, done, total) is called for every
+    page as it arrives. Complete responses are cached per cleaned payload.
+    """
+    payload = build_khmdhs_payload(filters)
+    cache = get_response_cache()
+    cache_key = payload_key(payload, variant="all" if all_pages else "page0")
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers={"Accept": "application/json"},
-            params={"page": 0},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"❌ Σφάλμα API: {response.status_code}")
-            return None
+        with stage("khmdhs.fetch"):
+            results, failed = fetch_khmdhs_pages(
+                get_khmdhs_client(),
+                payload,
+                all_pages=all_pages,
+                max_workers=max_workers,
+                on_page=on_page
+            )
+    except requests.HTTPError as e:
+        st.error(f"❌ Σφάλμα API: {e.response.status_code}")
+        return None
     except Exception as e:
         st.error(f"❌ Σφάλμα σύνδεσης: {str(e)}")
         return None
+    
+    if failed:
+        st.warning(f"⚠️ Αποτυχία ανάκτησης {len(failed)} σελίδων")
+    else:
+        cache.set(cache_key, results)
+    return results
+
+def search_khmdhs_notices(filters, all_pages=False, max_workers=4, on_page=None):
+    """Answer a search from the local store when it covers the date range,
+    otherwise from the API (and keep what was fetched)"""
+    store = get_notice_store()
+    if store.covers(filters):
+        with stage("khmdhs.store_query"):
+            return store.query(filters)
+    
+    results = fetch_khmdhs_notices(filters, all_pages, max_workers, on_page)
+    if results and results.get("content"):
+        store.upsert(results["content"])
+    return results
+
+# Label -> (format, MIME type) of the on-demand exports
+KHMDHS_EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel (xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/octet-stream"),
+}
+
+# Attachments downloaded per click (the rest on the next click)
+ATTACHMENT_BATCH_LIMIT = 200
+
+# Exports of sessions that ended without replacing them are removed after this many seconds
+EXPORT_MAX_AGE_SECONDS = 3600
+
+@st.cache_resource
+def get_export_dir():
+    """Κατάλογος των εξαγωγών του server, διαγράφεται μαζί του όταν τερματίζει η διεργασία"""
+    return tempfile.TemporaryDirectory(prefix="khmdhs_exports_")
+
+def prepare_khmdhs_export(table, fmt):
+    """Write the full result table to a temp file, only when the user asks for it"""
+    previous = st.session_state.pop('khmdhs_export', None)
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+    export_dir = get_export_dir().name
+    expired = time.time() - EXPORT_MAX_AGE_SECONDS
+    for entry in os.scandir(export_dir):
+        try:
+            if entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except OSError:
+            pass  # removed by another session meanwhile
+    fd, path = tempfile.mkstemp(prefix="khmdhs_", suffix=f".{fmt}", dir=export_dir)
+    os.close(fd)
+    try:
+        with stage(f"khmdhs.export.{fmt}"):
+            export_table(table, path, fmt)
+    except BaseException:
+        os.remove(path)
+        raise
+    st.session_state['khmdhs_export'] = {
+        'key': st.session_state.get('khmdhs_aggregates_key'),
+        'fmt': fmt,
+        'path': path
+    }
+
+@st.cache_resource
+def get_aggregate_memo():
+    """Analytics aggregates ανά κατάσταση φίλτρων, κοινά για όλες τις sessions"""
+    return AggregateMemo(maxsize=256)
+
+@st.cache_resource
+def get_figure_memo():
+    """Plotly figures ανά αποτύπωμα φιλτραρισμένων δεδομένων, κοινά για όλες τις sessions"""
+    return AggregateMemo(maxsize=128)
+
+def memo_figure(chart, key, build):
+    """The figure of a chart for a filter key, built (and timed as that chart) only on a miss"""
+    def timed_build():
+        with stage(chart):
+            return build()
+    return get_figure_memo().get_or_compute((chart,) + key, timed_build)
+
+# Archive dimension -> label of the trend selectors, per source
+TREND_DIMENSIONS = {
+    "khmdhs": {"all": "Σύνολο", "contract_type": "Τύπο σύμβασης", "organization": "Φορέα"},
+    "diavgeia": {"all": "Σύνολο", "type": "Τύπο", "specialty": "Ειδικότητα", "organization": "Φορέα"},
+}
+TREND_GRAINS = {"month": "Μήνα", "week": "Εβδομάδα", "day": "Ημέρα"}
+# Groups drawn per trend chart, the rest are summed into "Άλλα"
+TREND_TOP_GROUPS = 8
+
+def render_trends(source, total_label):
+    """Multi-year trend charts of a source, read from the archive rollups (never raw rows)"""
+    archive = get_archive()
+    st.markdown("#### 📈 Ιστορικές Τάσεις")
+    col_grain, col_dimension, col_years = st.columns(3)
+    with col_grain:
+        grain = st.selectbox("Ανά", list(TREND_GRAINS), format_func=TREND_GRAINS.get, key=f"{source}_trend_grain")
+    with col_dimension:
+        dimensions = TREND_DIMENSIONS[source]
+        dimension = st.selectbox("Ομαδοποίηση", list(dimensions), format_func=dimensions.get, key=f"{source}_trend_dimension")
+    with col_years:
+        years = st.slider("Έτη", 1, 10, 5, key=f"{source}_trend_years")
+    
+    date_from = (datetime.now() - timedelta(days=365 * years)).strftime("%Y-%m-%d")
+    # updated_at changes with every append, so new archive rows invalidate the memo
+    trend_key = (source, grain, dimension, date_from, archive.updated_at())
+    trend = get_aggregate_memo().get_or_compute(
+        ("trend",) + trend_key,
+        lambda: archive.trend(
+            source, grain, dimension, date_from=date_from,
+            top=TREND_TOP_GROUPS if dimension != "all" else None
+        )
+    )
+    if trend.empty:
+        st.info("ℹ️ Το ιστορικό αρχείο είναι κενό - γεμίζει με κάθε ανανέωση ή με `python archive.py import-store`")
+        return
+    
+    color = None if dimension == "all" else 'group'
+    labels = {'period': 'Περίοδος', 'count': 'Πλήθος', 'total': total_label, 'group': dimensions[dimension]}
+    col1, col2 = st.columns(2)
+    with col1:
+        fig_count = memo_figure(f"{source}.chart.trend_count", trend_key, lambda: px.line(
+            trend, x='period', y='count', color=color, labels=labels
+        ))
+        st.plotly_chart(fig_count, use_container_width=True)
+    with col2:
+        fig_total = memo_figure(f"{source}.chart.trend_total", trend_key, lambda: px.line(
+            trend, x='period', y='total', color=color, labels=labels
+        ))
+        st.plotly_chart(fig_total, use_container_width=True)
+
+# ============================================================================
+# ΔΙΑΥΓΕΙΑ DATA LOADING
+# ============================================================================
+
+@st.cache_resource
+def get_diavgeia_client():
+    """Shared pooled client για το Διαύγεια OpenData API"""
+    return create_diavgeia_client()
+
+# Seconds a page load waits for the first Διαύγεια load before showing the loading state
+ANNOUNCEMENTS_WAIT_SECONDS = 10
+
+def get_announcement_index():
+    """Filter index over the last 30 days of Διαύγεια data, kept warm in the background;
+    None while the first load after a server start is still running"""
+    refresher = get_refresher()
+    with st.spinner("⏳ Ανάκτηση προκηρύξεων από Διαύγεια..."):
+        return refresher.get("announcements", wait=ANNOUNCEMENTS_WAIT_SECONDS)
 
-def get_khmdhs_pdf_link(adam):
-    """Generate PDF download link for ΚΗΜΔΗΣ tender"""
-    return f"{KHMDHS_BASE_URL}/khmdhs-opendata/notice/attachment/{adam}"
+# ============================================================================
+# BACKGROUND REFRESH
+# ============================================================================
+
+# Seconds between refreshes of the hot datasets
+REFRESH_NOTICES_SECONDS = int(os.environ.get("REFRESH_NOTICES_SECONDS", 900))
+REFRESH_ANNOUNCEMENTS_SECONDS = int(os.environ.get("REFRESH_ANNOUNCEMENTS_SECONDS", 3600))
+
+@st.cache_resource
+def get_refresher():
+    """Background threads ανά server (ένα ανά dataset) που ανανεώνουν τα hot datasets:
+    sync των ΚΗΜΔΗΣ διαγωνισμών 30 ημερών, την ιεραρχία CPV, τις αποθηκευμένες αναζητήσεις
+    και το index των προκηρύξεων
+    (με κοινή κατάσταση, μόνο μία διεργασία φορτώνει κάθε dataset και οι άλλες το παραλαμβάνουν)"""
+    # Resources are resolved here, on the script thread, and captured by the loaders
+    store = get_notice_store()
+    khmdhs_client = get_khmdhs_client()
+    diavgeia_client = get_diavgeia_client()
+    matcher = get_org_matcher()
+    search_index = get_search_index()
+    archive = get_archive()
+    saved_searches = get_saved_searches()
+    shared = get_shared_state()
+    
+    def sync_notices():
+        summary = store.sync(days=30, client=khmdhs_client)
+        # Also picks up notices stored by API searches since the last run
+        summary["indexed"] = search_index.index_store(store)
+        summary["archived"] = import_synced(archive, store)
+        return summary
+    
+    def load_announcements():
+        failed = []
+        with stage("diavgeia.ingest"):
+            df = ingest_announcements(days=30, client=diavgeia_client, failed=failed)
+        if matcher is not None and not df.empty:
+            df = matcher.annotate(df, 'organization')
+            matcher.save()
+        search_index.index_announcements(df)
+        archive.append("diavgeia", df)
+        # A partial result is still served, with the number of missing pages for the view
+        df.attrs["failed_pages"] = len(failed)
+        return FilterIndex(df)
+    
+    refresher = BackgroundRefresher(shared=shared)
+    metrics.register_collector("response_cache", lambda: get_response_cache().stats())
+    if shared is not None:
+        metrics.register_collector("shared_state", shared.stats)
+    metrics.register_collector("attachment_cache", lambda: get_attachment_cache().stats())
+    metrics.register_collector(
+        "archive",
+        lambda: {f"{source}_{stat}": value for source, stats in archive.stats().items()
+                 for stat, value in stats.items()}
+    )
+    metrics.register_collector("khmdhs_api", khmdhs_client.metrics.summary)
+    metrics.register_collector("diavgeia_api", diavgeia_client.metrics.summary)
+    metrics.register_collector(
+        "refresh_seconds",
+        lambda: {job['name']: job['duration_s'] for job in refresher.status() if job['duration_s'] is not None}
+    )
+    # Every job has its own thread: the Διαύγεια ingest does not wait for the ΚΗΜΔΗΣ sync
+    # Datasets are shared between processes as Parquet/JSON, rebuilt locally by the codecs
+    refresher.register(
+        "announcements",
+        load_announcements,
+        REFRESH_ANNOUNCEMENTS_SECONDS,
+        codec=(FilterIndex.to_parquet, FilterIndex.from_parquet)
+    )
+    # No codec: the sync fills this process's store, search index and archive, so every
+    # process runs it; adopting another replica's summary would leave them stale
+    refresher.register("notices", sync_notices, REFRESH_NOTICES_SECONDS)
+    # After the first sync, so the first tree already has the synced codes
+    refresher.register(
+        "cpv_tree",
+        lambda: CpvTree.load(extra=store.cpv_codes()),
+        REFRESH_NOTICES_SECONDS,
+        after="notices",
+        codec=(CpvTree.to_json, CpvTree.from_json)
+    )
+    # Also after it, so the usual windows are answered from the store without API calls;
+    # no codec either, as the run writes this process's match database
+    refresher.register(
+        "saved_searches",
+        lambda: saved_searches.run(store, client=khmdhs_client),
+        REFRESH_NOTICES_SECONDS,
+        after="notices"
+    )
+    return refresher.start()
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus endpoint στο METRICS_PORT, όταν οι μετρήσεις είναι ενεργές"""
+    if not (metrics.enabled and METRICS_PORT):
+        return None
+    return start_http_server(METRICS_PORT)
 
 # ============================================================================
 # ΔΙΑΥΓΕΙΑ MOCK DATA GENERATOR
@@ -166,19 +506,75 @@ def generate_mock_diavgeia_data(days=30, count=50):
     
     return pd.DataFrame(data)
 
+# ============================================================================
+# ΔΙΑΥΓΕΙΑ RENDERING HELPERS
+# ============================================================================
+
+CARD_PAGE_SIZES = [20, 50, 100]
+
+def escape_html(series):
+    """Vectorized HTML escaping of a string Series"""
+    return (
+        series.astype(str)
+        .str.replace("&", "&amp;", regex=False)
+        .str.replace("<", "&lt;", regex=False)
+        .str.replace(">", "&gt;", regex=False)
+        .str.replace('"', "&quot;", regex=False)
+    )
+
+def build_announcement_cards(df):
+    """Card HTML for every row, built in one vectorized pass"""
+    if df.empty:
+        return []
+    
+    # Color coding
+    conditions = [
+        df['status'] == 'Έληξε',
+        df['days_remaining'] <= 7,
+        df['days_remaining'] <= 14,
+    ]
+    border_color = pd.Series(np.select(conditions, ["#ff4444", "#ff6600", "#ffaa00"], default="#00aa00"), index=df.index)
+    emoji = pd.Series(np.select(conditions, ["❌", "🔥", "⚠️"], default="✅"), index=df.index)
+    
+    cards = (
+        '<div style="border-left: 5px solid ' + border_color + '; padding: 15px; '
+        'margin: 10px 0; background: #f8f9fa; border-radius: 5px;">'
+        '<h4>' + emoji + ' ' + escape_html(df['title']) + '</h4>'
+        '<p><strong>📅 Δημοσίευση:</strong> ' + df['published_date'].dt.strftime('%d/%m/%Y') + ' | '
+        '<strong>⏰ Καταληκτική:</strong> ' + df['deadline'].dt.strftime('%d/%m/%Y') + ' | '
+        '<strong>⏳ Υπόλοιπες:</strong> ' + df['days_remaining'].astype(str) + ' ημέρες</p>'
+        '<p><strong>🏛️ Φορέας:</strong> ' + escape_html(df['organization']) + ' | '
+        '<strong>👥 Θέσεις:</strong> ' + df['positions'].astype(str) + ' | '
+        '<strong>📌 Κατάσταση:</strong> ' + df['status'].astype(str) + '</p>'
+        '<p><a href="' + escape_html(df['link']) + '" target="_blank">🔗 Διαύγεια</a> | '
+        '📋 ADA: <code>' + escape_html(df['ada']) + '</code></p>'
+        '</div>'
+    )
+    return cards.tolist()
+
 # ============================================================================
 # MAIN APP
 # ============================================================================
 
+rerun_started = time.perf_counter()
+
 # Header
 st.title("🏛️ Ενοποιημένο Dashboard - ΚΗΜΔΗΣ & Διαύγεια")
 st.markdown("Παρακολούθηση Διαγωνισμών & Προκηρύξεων Θέσεων")
 st.markdown("---")
 
+# Starts the background refresh on the first page load of the server
+refresher = get_refresher()
+get_metrics_server()
+
 # Main Navigation
+sections = ["🏛️ ΚΗΜΔΗΣ - Διαγωνισμοί", "👥 Διαύγεια - Προκηρύξεις Θέσεων", "🔎 Αναζήτηση Κειμένου"]
+# Hidden section, opened with ?diagnostics=1
+if st.query_params.get("diagnostics") == "1":
+    sections.append("🩺 Διαγνωστικά")
 main_tab = st.radio(
     "Επιλέξτε Ενότητα:",
-    ["🏛️ ΚΗΜΔΗΣ - Διαγωνισμοί", "👥 Διαύγεια - Προκηρύξεις Θέσεων"],
+    sections,
     horizontal=True
 )
 
@@ -197,14 +593,7 @@ if main_tab == "🏛️ ΚΗΜΔΗΣ - Διαγωνισμοί":
         
         title_filter = st.text_input("Τίτλος", placeholder="π.χ. Προμήθεια")
         
-        contract_type_options = {
-            "Όλα": "",
-            "Υπηρεσίες": "9",
-            "Έργα": "10",
-            "Μελέτες": "12",
-            "Προμήθειες": "13",
-            "Τεχνικές Υπηρεσίες": "14"
-        }
+        contract_type_options = KHMDHS_CONTRACT_TYPES
         contract_type = st.selectbox("Τύπος Σύμβασης", list(contract_type_options.keys()))
         
         col1, col2 = st.columns(2)
@@ -219,89 +608,269 @@ if main_tab == "🏛️ ΚΗΜΔΗΣ - Διαγωνισμοί":
         budget_from = st.number_input("Budget Από (€)", min_value=0, value=0, step=1000)
         budget_to = st.number_input("Budget Έως (€)", min_value=0, value=1000000, step=1000)
         
+        cpv_tree = get_cpv_tree()
+        cpv_selected = st.multiselect(
+            "Κατηγορίες CPV",
+            cpv_tree.options(max_level=3),
+            format_func=cpv_tree.describe,
+            help="Μια κατηγορία περιλαμβάνει όλους τους υποκωδικούς της"
+        )
+        
+        all_pages = st.checkbox("Όλες οι σελίδες αποτελεσμάτων", value=False)
+        max_workers = st.slider(
+            "Παράλληλες αιτήσεις",
+            min_value=1,
+            max_value=KHMDHS_MAX_WORKERS,
+            value=4,
+            disabled=not all_pages
+        )
+        
         search_btn = st.button("🔎 Αναζήτηση", type="primary", use_container_width=True)
         reset_btn = st.button("🔄 Καθαρισμός", use_container_width=True)
+        
+        filters = {
+            "title": title_filter,
+            "contractType": contract_type_options[contract_type],
+            "dateFrom": date_from.strftime("%Y-%m-%d"),
+            "dateTo": date_to.strftime("%Y-%m-%d"),
+            "totalCostFrom": budget_from,
+            "totalCostTo": budget_to,
+        }
+        
+        with st.expander("⭐ Αποθήκευση αναζήτησης"):
+            saved_name = st.text_input("Όνομα", key="saved_search_name")
+            saved_rolling = st.checkbox(
+                f"Κυλιόμενο παράθυρο ({(date_to - date_from).days} ημέρες έως σήμερα)",
+                value=True,
+                key="saved_search_rolling"
+            )
+            # Only sinks allowed on the server are offered, never a free-text spec
+            saved_sink = st.selectbox(
+                "Ειδοποίηση νέων",
+                [None] + SAVED_SEARCH_SINKS,
+                format_func=lambda spec: spec or "Καμία",
+                key="saved_search_sink"
+            ) if SAVED_SEARCH_SINKS else None
+            if st.button("💾 Αποθήκευση", disabled=not saved_name, use_container_width=True):
+                try:
+                    get_saved_searches().save(
+                        saved_name,
+                        # Categories are kept as selected; the store expands them when filtering
+                        {**filters, "cpvItems": cpv_selected},
+                        window_days=(date_to - date_from).days if saved_rolling else None,
+                        sink=saved_sink
+                    )
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.success(f"✅ Αποθηκεύτηκε: {saved_name}")
+        
+        store = get_notice_store()
+        last_sync = store.get_state("last_sync")
+        if last_sync:
+            st.caption(f"🗄️ Τοπική βάση: {store.count():,} διαγωνισμοί • sync {last_sync[:16].replace('T', ' ')}")
+        else:
+            st.caption("🗄️ Τοπική βάση: το πρώτο sync εκτελείται στο παρασκήνιο")
+        for job in refresher.status():
+            if job['error']:
+                st.caption(f"⚠️ Ανανέωση {job['name']}: {job['error']}")
+        cache_stats = get_response_cache().stats()
+        st.caption(
+            f"⚡ Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%})"
+        )
+        attachment_stats = get_attachment_cache().stats()
+        if attachment_stats['files']:
+            st.caption(
+                f"📎 Έγγραφα: {attachment_stats['files']} αρχεία • "
+                f"{attachment_stats['bytes'] / 1024 / 1024:,.0f}/{attachment_stats['max_bytes'] / 1024 / 1024:,.0f} MB"
+            )
+        api_stats = get_khmdhs_client().metrics.summary()
+        if api_stats["requests"]:
+            st.caption(
+                f"📡 API: {api_stats['requests']} αιτήσεις • p50 {api_stats['p50_ms']:.0f}ms • "
+                f"p95 {api_stats['p95_ms']:.0f}ms • {api_stats['retries']} retries • {api_stats['errors']} σφάλματα"
+            )
     
-    # ΚΗΜΔΗΣ Tabs
-    khmdhs_tab1, khmdhs_tab2, khmdhs_tab3, khmdhs_tab4 = st.tabs([
-        "📋 Αποτελέσματα",
-        "📊 Analytics",
-        "🔔 Alerts",
-        "📁 Data Explorer"
-    ])
+    # ΚΗΜΔΗΣ views: only the selected one runs on a rerun (st.tabs would run all five)
+    khmdhs_view = st.radio(
+        "Προβολή ΚΗΜΔΗΣ",
+        ["📋 Αποτελέσματα", "📊 Analytics", "🔔 Alerts", "📁 Data Explorer", "🆕 Αλλαγές", "⭐ Αποθηκευμένες"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="khmdhs_view"
+    )
     
     # Handle search
     if search_btn:
         with st.spinner("⏳ Ανάκτηση δεδομένων από ΚΗΜΔΗΣ..."):
-            filters = {
-                "title": title_filter,
-                "contractType": contract_type_options[contract_type],
-                "dateFrom": date_from.strftime("%Y-%m-%d"),
-                "dateTo": date_to.strftime("%Y-%m-%d"),
-                "totalCostFrom": budget_from,
-                "totalCostTo": budget_to
-            }
+            filters = {**filters, "cpvItems": cpv_tree.expand(cpv_selected)}
             
-            results = fetch_khmdhs_notices(filters)
+            progress = st.progress(0.0) if all_pages else None
+            fetched = []
+            page_tables = {}
+            running = RunningAggregates(KHMDHS_DIMENSIONS, id_column="reference_number")
+            
+            def show_page(page, content, done, total):
+                fetched.append(len(content))
+                # Parse each page once, as it arrives
+                with stage("khmdhs.parse"):
+                    parsed = parse_notices(content)
+                page_tables[page] = annotate_organizations(parsed)
+                running.update(page_tables[page])
+                if progress is not None:
+                    progress.progress(
+                        done / total,
+                        text=f"Σελίδα {done}/{total} • {sum(fetched):,} διαγωνισμοί"
+                    )
+            
+            results = search_khmdhs_notices(
+                filters,
+                all_pages=all_pages,
+                max_workers=max_workers,
+                on_page=show_page
+            )
+            if progress is not None:
+                progress.empty()
             
             if results and results.get("content"):
-                st.session_state['khmdhs_results'] = results
+                content = results["content"]
+                # Store/cache hits skip show_page and are parsed here in one go
+                if sum(fetched) == len(content):
+                    table = concat_tables([page_tables[page] for page in sorted(page_tables)])
+                else:
+                    with stage("khmdhs.parse"):
+                        parsed = parse_notices(content)
+                    table = annotate_organizations(parsed)
+                    running.update(table)
+                # Keyed on the content, not the row count: amended notices under the same filters
+                # get their own aggregates instead of replacing those other sessions still read
+                aggregates_key = ("khmdhs", payload_key(build_khmdhs_payload(filters)), payload_key(content))
+                get_aggregate_memo().put(aggregates_key, running.snapshot())
+                st.session_state['khmdhs_table'] = table
+                st.session_state['khmdhs_total'] = results.get('totalElements', len(table))
+                st.session_state['khmdhs_aggregates_key'] = aggregates_key
             else:
                 st.warning("⚠️ Δεν βρέθηκαν αποτελέσματα")
     
     # Display results
-    with khmdhs_tab1:
-        if 'khmdhs_results' in st.session_state:
-            results = st.session_state['khmdhs_results']
-            content = results.get("content", [])
+    if khmdhs_view == "📋 Αποτελέσματα":
+        if 'khmdhs_table' in st.session_state:
+            table = st.session_state['khmdhs_table']
             
-            st.success(f"✅ Βρέθηκαν {results.get('totalElements', 0)} διαγωνισμοί")
+            st.success(f"✅ Βρέθηκαν {st.session_state['khmdhs_total']} διαγωνισμοί")
             
-            if content:
-                display_data = []
-                for item in content:
-                    display_data.append({
-                        "ΑΔΑΜ": item.get("referenceNumber", "N/A"),
-                        "Τίτλος": item.get("title", "N/A")[:60] + "...",
-                        "Φορέας": item.get("organization", {}).get("value", "N/A")[:40],
-                        "Τύπος": item.get("contractType", {}).get("value", "N/A"),
-                        "Budget (€)": f"{item.get('totalCostWithoutVAT', 0):,.0f}",
-                        "Καταληκτική": item.get("finalSubmissionDate", "N/A")[:10] if item.get("finalSubmissionDate") else "N/A",
-                    })
-                
-                df = pd.DataFrame(display_data)
+            if not table.empty:
+                df = display_rows(table)
+                if 'aaht_code' in table:
+                    df.insert(3, 'ΑΑΗΤ', table['aaht_code'].fillna('-').to_numpy())
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 
-                # Export
-                csv = df.to_csv(index=False, encoding='utf-8-sig')
-                st.download_button(
-                    "📥 Εξαγωγή CSV",
-                    csv,
-                    f"khmdhs_{datetime.now().strftime('%Y%m%d')}.csv",
-                    "text/csv"
-                )
+                # Export: built only on request, from the full table
+                col_fmt, col_prepare = st.columns([2, 1])
+                with col_fmt:
+                    export_label = st.selectbox(
+                        "Μορφή εξαγωγής",
+                        list(KHMDHS_EXPORT_FORMATS),
+                        label_visibility="collapsed"
+                    )
+                export_fmt, export_mime = KHMDHS_EXPORT_FORMATS[export_label]
+                with col_prepare:
+                    prepare_btn = st.button("📦 Προετοιμασία εξαγωγής", use_container_width=True)
+                
+                if prepare_btn:
+                    with st.spinner(f"⏳ Εξαγωγή {len(table):,} διαγωνισμών..."):
+                        try:
+                            prepare_khmdhs_export(table, export_fmt)
+                        except Exception as e:
+                            st.error(f"❌ Σφάλμα εξαγωγής: {e}")
+                
+                export = st.session_state.get('khmdhs_export')
+                if (export and export['fmt'] == export_fmt
+                        and export['key'] == st.session_state.get('khmdhs_aggregates_key')
+                        and os.path.exists(export['path'])):
+                    with open(export['path'], 'rb') as f:
+                        st.download_button(
+                            f"📥 Λήψη {export_label}",
+                            f,
+                            f"khmdhs_{datetime.now().strftime('%Y%m%d')}.{export_fmt}",
+                            export_mime
+                        )
+                
+                # Attachments: downloaded once into the shared local cache
+                with st.expander("📎 Έγγραφα διαγωνισμών"):
+                    attachment_cache = get_attachment_cache()
+                    references = table['reference_number'].dropna().astype(str).tolist()
+                    links = {reference: get_khmdhs_pdf_link(reference) for reference in references}
+                    cached = attachment_cache.cached(links.values())
+                    missing = [reference for reference in references if links[reference] not in cached]
+                    cache_status = st.empty()
+                    
+                    batch = missing[:ATTACHMENT_BATCH_LIMIT]
+                    if batch and st.button(f"⬇️ Λήψη {len(batch)} εγγράφων", key="khmdhs_fetch_attachments"):
+                        attachment_progress = st.progress(0.0)
+                        
+                        def show_attachment(url, path, error, done, total):
+                            attachment_progress.progress(done / total, text=f"Έγγραφο {done}/{total}")
+                        
+                        fetched_paths, failed = fetch_attachments(
+                            attachment_cache,
+                            get_khmdhs_client(),
+                            [links[reference] for reference in batch],
+                            max_workers=max_workers,
+                            on_done=show_attachment
+                        )
+                        attachment_progress.empty()
+                        if failed:
+                            st.warning(f"⚠️ {len(failed)} έγγραφα δεν κατέβηκαν")
+                        cached = cached | set(fetched_paths)
+                    
+                    available = [reference for reference in references if links[reference] in cached]
+                    cache_status.caption(f"💾 {len(available)}/{len(references)} έγγραφα στην τοπική cache")
+                    if available:
+                        titles = dict(zip(table['reference_number'].astype(str), table['title'].fillna('')))
+                        selected = st.selectbox(
+                            "Έγγραφο",
+                            available,
+                            format_func=lambda reference: f"{reference} • {titles.get(reference, '')[:60]}"
+                        )
+                        entry = attachment_cache.entry(links[selected])
+                        if entry:
+                            path, content_type = entry
+                            with open(path, 'rb') as f:
+                                st.download_button(
+                                    "📄 Άνοιγμα εγγράφου",
+                                    f,
+                                    f"{selected}.pdf",
+                                    content_type or "application/pdf"
+                                )
         else:
             st.info("ℹ️ Κάντε αναζήτηση για να δείτε αποτελέσματα")
     
-    with khmdhs_tab2:
-        if 'khmdhs_results' in st.session_state:
-            results = st.session_state['khmdhs_results']
-            content = results.get("content", [])
+    elif khmdhs_view == "📊 Analytics":
+        if 'khmdhs_table' in st.session_state:
+            table = st.session_state['khmdhs_table']
             
-            if content:
+            if not table.empty:
+                with stage("khmdhs.aggregates"):
+                    aggregates = get_aggregate_memo().get_or_compute(
+                        st.session_state.get('khmdhs_aggregates_key'),
+                        lambda: aggregate_khmdhs(table)
+                    )
+                by_type = aggregates['contract_type']
+                
                 col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
-                    st.metric("Σύνολο", results.get('totalElements', 0))
+                    st.metric("Σύνολο", st.session_state['khmdhs_total'])
                 with col2:
-                    total_budget = sum([item.get('totalCostWithoutVAT', 0) for item in content])
+                    total_budget = by_type['sum'].sum()
                     st.metric("Συνολικός Budget", f"€{total_budget:,.0f}")
                 with col3:
-                    avg = total_budget / len(content) if content else 0
+                    avg = total_budget / aggregates['rows'] if aggregates['rows'] else 0
                     st.metric("Μέσος Budget", f"€{avg:,.0f}")
                 with col4:
-                    types = [item.get("contractType", {}).get("value", "Άγνωστο") for item in content]
-                    st.metric("Τύποι", len(set(types)))
+                    st.metric("Τύποι", len(by_type))
                 
                 st.markdown("---")
                 
@@ -309,62 +878,189 @@ if main_tab == "🏛️ ΚΗΜΔΗΣ - Διαγωνισμοί":
                 col_c1, col_c2 = st.columns(2)
                 with col_c1:
                     st.markdown("#### Κατανομή ανά Τύπο")
-                    type_counts = pd.Series(types).value_counts()
-                    st.bar_chart(type_counts)
+                    st.bar_chart(by_type['count'].rename_axis("Τύπος"))
                 
                 with col_c2:
                     st.markdown("#### Budget ανά Τύπο")
-                    budget_df = pd.DataFrame([
-                        {"Τύπος": item.get("contractType", {}).get("value", "Άγνωστο"),
-                         "Budget": item.get('totalCostWithoutVAT', 0)}
-                        for item in content
-                    ])
-                    st.bar_chart(budget_df.set_index("Τύπος"))
+                    st.bar_chart(by_type['sum'].rename("Budget").rename_axis("Τύπος"))
+                
+                by_aaht = aggregates['aaht']
+                by_aaht = by_aaht[by_aaht.index.notna()]
+                if not by_aaht.empty:
+                    st.markdown("#### Top 10 Φορείς ΑΑΗΤ")
+                    st.dataframe(
+                        by_aaht.head(10).rename(columns={'count': 'Διαγωνισμοί', 'sum': 'Budget (€)', 'mean': 'Μέσος (€)'}),
+                        use_container_width=True
+                    )
+                
+                # CPV drill-down: one integer group-by per level on the memoized pairs
+                pairs = get_aggregate_memo().get_or_compute(
+                    (st.session_state.get('khmdhs_aggregates_key'), 'cpv'),
+                    lambda: cpv_pairs(table)
+                )
+                if not pairs.empty:
+                    st.markdown("#### Κατανομή ανά Κατηγορία CPV")
+                    col_level, col_parent = st.columns(2)
+                    with col_level:
+                        cpv_level = st.selectbox(
+                            "Επίπεδο CPV",
+                            list(CPV_LEVELS),
+                            format_func=CPV_LEVELS.get
+                        )
+                    with col_parent:
+                        parent_options = [None]
+                        if cpv_level > 2:
+                            parent_options += get_aggregate_memo().get_or_compute(
+                                (st.session_state.get('khmdhs_aggregates_key'), 'cpv', cpv_level - 1, None),
+                                lambda: cpv_rollup(pairs, cpv_level - 1)
+                            ).index.tolist()
+                        cpv_parent = st.selectbox(
+                            "Μέσα στην κατηγορία",
+                            parent_options,
+                            format_func=lambda node: "Όλες" if node is None else cpv_tree.describe(node)
+                        )
+                    by_cpv = get_aggregate_memo().get_or_compute(
+                        (st.session_state.get('khmdhs_aggregates_key'), 'cpv', cpv_level, cpv_parent),
+                        lambda: cpv_rollup(pairs, cpv_level, parent=cpv_parent)
+                    )
+                    by_cpv = by_cpv.set_axis(by_cpv.index.map(cpv_tree.describe))
+                    st.bar_chart(by_cpv['budget'].head(20).rename("Budget").rename_axis("CPV"))
+                    st.dataframe(
+                        by_cpv.rename(columns={'notices': 'Διαγωνισμοί', 'budget': 'Budget (€)', 'mean': 'Μέσος (€)'}),
+                        use_container_width=True
+                    )
         else:
             st.info("ℹ️ Κάντε αναζήτηση για analytics")
+        
+        st.markdown("---")
+        render_trends("khmdhs", "Budget (€)")
     
-    with khmdhs_tab3:
-        if 'khmdhs_results' in st.session_state:
-            results = st.session_state['khmdhs_results']
-            content = results.get("content", [])
-            
-            urgent = []
-            for item in content:
-                deadline_str = item.get("finalSubmissionDate", "")
-                if deadline_str:
-                    try:
-                        deadline = datetime.fromisoformat(deadline_str.replace("Z", "+00:00"))
-                        days_left = (deadline - datetime.now()).days
-                        if 0 <= days_left <= 7:
-                            urgent.append({
-                                "ΑΔΑΜ": item.get("referenceNumber"),
-                                "Τίτλος": item.get("title")[:50],
-                                "Καταληκτική": deadline_str[:10],
-                                "Μέρες": days_left
-                            })
-                    except:
-                        pass
+    elif khmdhs_view == "🔔 Alerts":
+        if 'khmdhs_table' in st.session_state:
+            urgent = urgent_notices(st.session_state['khmdhs_table'], within_days=7)
             
-            if urgent:
+            if not urgent.empty:
                 st.warning(f"⚠️ {len(urgent)} επείγοντες διαγωνισμοί")
-                st.dataframe(pd.DataFrame(urgent), use_container_width=True, hide_index=True)
+                st.dataframe(urgent, use_container_width=True, hide_index=True)
             else:
                 st.success("✅ Δεν υπάρχουν επείγοντες")
         else:
             st.info("ℹ️ Κάντε αναζήτηση")
     
-    with khmdhs_tab4:
-        if 'khmdhs_results' in st.session_state:
-            results = st.session_state['khmdhs_results']
-            with st.expander("🔍 Raw JSON"):
-                st.json(results)
+    elif khmdhs_view == "📁 Data Explorer":
+        if 'khmdhs_table' in st.session_state:
+            table = st.session_state['khmdhs_table']
+            # An expander body runs even when collapsed, so the JSON is built only on request
+            if st.toggle("🔍 Raw JSON (πρώτες 20 εγγραφές)"):
+                st.json(table.head(20).to_json(orient="records", date_format="iso", force_ascii=False))
             
-            content = results.get("content", [])
-            if content:
-                df_full = pd.json_normalize(content)
-                st.dataframe(df_full, use_container_width=True)
+            if not table.empty:
+                st.dataframe(table, use_container_width=True)
         else:
             st.info("ℹ️ Κάντε αναζήτηση")
+    
+    elif khmdhs_view == "🆕 Αλλαγές":
+        # Change feed of the local store, filled by every sync
+        col_since, col_kinds = st.columns([1, 2])
+        with col_since:
+            changes_since = st.date_input("Αλλαγές από", value=datetime.now() - timedelta(days=7))
+        with col_kinds:
+            change_labels = {"new": "🆕 Νέοι", "changed": "✏️ Τροποποιημένοι", "closed": "🔒 Έληξαν"}
+            selected_kinds = st.multiselect(
+                "Είδος",
+                list(change_labels),
+                default=list(change_labels),
+                format_func=change_labels.get
+            )
+        
+        changes = store.changes_since(changes_since.isoformat(), kinds=tuple(selected_kinds)) if selected_kinds else []
+        if changes:
+            changes_df = pd.DataFrame(changes)
+            counts = changes_df['change'].value_counts()
+            cols = st.columns(3)
+            for col, kind in zip(cols, change_labels):
+                col.metric(change_labels[kind], int(counts.get(kind, 0)))
+            st.dataframe(
+                changes_df.assign(change=changes_df['change'].map(change_labels)).rename(columns={
+                    'changed_at': 'Πότε',
+                    'change': 'Αλλαγή',
+                    'reference_number': 'ΑΔΑΜ',
+                    'version': 'Έκδοση',
+                    'title': 'Τίτλος',
+                    'organization': 'Φορέας',
+                    'total_cost': 'Budget (€)',
+                    'final_submission_date': 'Καταληκτική'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("ℹ️ Καμία αλλαγή στο διάστημα αυτό")
+    
+    elif khmdhs_view == "⭐ Αποθηκευμένες":
+        # Evaluated in the background after every sync; only new matches are reported
+        saved = get_saved_searches()
+        searches = saved.list()
+        last_run = refresher.get("saved_searches")
+        if last_run:
+            st.caption(
+                f"🔁 Τελευταία εκτέλεση: {last_run['searches']} αναζητήσεις σε {last_run['windows']} "
+                f"χρονικά παράθυρα • {last_run['api_sweeps']} κλήσεις API • {last_run['new']} νέα"
+            )
+        
+        if not searches:
+            st.info("ℹ️ Καμία αποθηκευμένη αναζήτηση - αποθηκεύστε τα φίλτρα από το ⭐ της πλαϊνής στήλης")
+        else:
+            st.dataframe(
+                pd.DataFrame([{
+                    'Όνομα': search['name'],
+                    'Παράθυρο': (
+                        f"{search['window_days']} ημέρες" if search['window_days']
+                        else f"{search['filters'].get('dateFrom', '')} - {search['filters'].get('dateTo', '')}"
+                    ),
+                    'Εκτέλεση': search['last_run'] or '⏳',
+                    'Αποτελέσματα': search['last_total'],
+                    'Νέα': search['last_new'],
+                    'Ειδοποίηση': search['sink'] or '',
+                    'Σφάλμα': search['last_error'] or '',
+                } for search in searches]),
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            col_select, col_run, col_delete = st.columns([3, 1, 1])
+            with col_select:
+                selected_search = st.selectbox("Αναζήτηση", [search['name'] for search in searches])
+            with col_run:
+                if st.button("▶️ Εκτέλεση τώρα", use_container_width=True):
+                    refresher.refresh_now("saved_searches")
+                    st.toast("Η εκτέλεση ξεκίνησε στο παρασκήνιο")
+            with col_delete:
+                if st.button("🗑️ Διαγραφή", use_container_width=True):
+                    saved.remove(selected_search)
+                    st.rerun()
+            
+            show_all = st.toggle("Όλα τα αποτελέσματα (όχι μόνο τα νέα)")
+            matches = saved.matches(selected_search, new_only=not show_all)
+            if matches:
+                matches_df = pd.DataFrame(matches)
+                matches_df['link'] = matches_df['reference_number'].map(get_khmdhs_pdf_link)
+                st.dataframe(
+                    matches_df.rename(columns={
+                        'reference_number': 'ΑΔΑΜ',
+                        'title': 'Τίτλος',
+                        'final_submission_date': 'Καταληκτική',
+                        'first_seen': 'Πρώτη εμφάνιση',
+                        'link': 'PDF'
+                    }),
+                    column_config={'PDF': st.column_config.LinkColumn('PDF', display_text="📄")},
+                    use_container_width=True,
+                    hide_index=True
+                )
+            elif show_all:
+                st.info("ℹ️ Η αναζήτηση δεν έχει αποτελέσματα")
+            else:
+                st.info("ℹ️ Κανένα νέο αποτέλεσμα στην τελευταία εκτέλεση")
 
 # ============================================================================
 # TAB 2: ΔΙΑΥΓΕΙΑ - ΠΡΟΚΗΡΥΞΕΙΣ ΘΕΣΕΩΝ
@@ -374,22 +1070,36 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
     st.header("📋 Προκηρύξεις Πλήρωσης Θέσεων")
     
     # Load data
-    df = generate_mock_diavgeia_data(days=30, count=100)
+    try:
+        index = get_announcement_index()
+    except Exception as e:
+        st.warning(f"⚠️ Το Διαύγεια δεν είναι διαθέσιμο ({e}) - εμφανίζονται δοκιμαστικά δεδομένα")
+        index = FilterIndex(generate_mock_diavgeia_data(days=30, count=100))
+    if index is None:
+        st.info("⏳ Οι προκηρύξεις των τελευταίων 30 ημερών φορτώνονται στο παρασκήνιο - δοκιμάστε ξανά σε λίγο")
+        st.button("🔄 Ανανέωση", key="diavgeia_loading_refresh")
+        st.stop()
+    if index.df.attrs.get("failed_pages"):
+        st.warning(f"⚠️ Αποτυχία ανάκτησης {index.df.attrs['failed_pages']} σελίδων από το Διαύγεια")
+    
+    if index.size == 0:
+        st.info("ℹ️ Δεν βρέθηκαν προκηρύξεις τις τελευταίες 30 ημέρες")
+        st.stop()
     
     # Sidebar Filters for Διαύγεια
     with st.sidebar:
         st.subheader("🔍 Φίλτρα Διαύγεια")
         
         # Type filter
-        types = ["Όλες"] + sorted(df['type'].unique().tolist())
+        types = ["Όλες"] + index.options['type']
         selected_type = st.selectbox("Τύπος Προκήρυξης", types)
         
         # Specialty filter
-        specialties = ["Όλες"] + sorted(df['specialty'].unique().tolist())
+        specialties = ["Όλες"] + index.options['specialty']
         selected_specialty = st.selectbox("Ειδικότητα", specialties)
         
         # Organization filter
-        orgs = ["Όλοι"] + sorted(df['organization'].unique().tolist())
+        orgs = ["Όλοι"] + index.options['organization']
         selected_org = st.selectbox("Φορέας", orgs)
         
         # Status filter
@@ -405,34 +1115,41 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
         )
         
         # Positions slider
-        pos_range = st.slider(
-            "Αριθμός Θέσεων",
-            min_value=int(df['positions'].min()),
-            max_value=int(df['positions'].max()),
-            value=(int(df['positions'].min()), int(df['positions'].max()))
-        )
+        pos_min, pos_max = (int(v) for v in index.bounds('positions'))
+        if pos_min < pos_max:
+            pos_range = st.slider(
+                "Αριθμός Θέσεων",
+                min_value=pos_min,
+                max_value=pos_max,
+                value=(pos_min, pos_max)
+            )
+        else:
+            pos_range = (pos_min, pos_max)
     
     # Apply filters
-    filtered_df = df.copy()
-    
-    if selected_type != "Όλες":
-        filtered_df = filtered_df[filtered_df['type'] == selected_type]
-    
-    if selected_specialty != "Όλες":
-        filtered_df = filtered_df[filtered_df['specialty'] == selected_specialty]
-    
-    if selected_org != "Όλοι":
-        filtered_df = filtered_df[filtered_df['organization'] == selected_org]
-    
-    if status_filter == "Ενεργές":
-        filtered_df = filtered_df[filtered_df['status'] == 'Ενεργή']
-    elif status_filter == "Έληξαν":
-        filtered_df = filtered_df[filtered_df['status'] == 'Έληξε']
-    
-    filtered_df = filtered_df[
-        (filtered_df['positions'] >= pos_range[0]) &
-        (filtered_df['positions'] <= pos_range[1])
-    ]
+    today = pd.Timestamp.now().normalize()
+    status_values = {"Όλες": None, "Ενεργές": "Ενεργή", "Έληξαν": "Έληξε"}
+    with stage("diavgeia.filter"):
+        positions = index.select(
+            equals={
+                'type': None if selected_type == "Όλες" else selected_type,
+                'specialty': None if selected_specialty == "Όλες" else selected_specialty,
+                'organization': None if selected_org == "Όλοι" else selected_org,
+                'status': status_values[status_filter],
+            },
+            ranges={
+                'positions': pos_range,
+                'published_date': (
+                    today + pd.Timedelta(days=date_range[0]),
+                    today + pd.Timedelta(days=date_range[1] + 1) - pd.Timedelta(microseconds=1)
+                ),
+            }
+        )
+    filtered_df = index.take(positions)
+    filter_key = (
+        index.token, selected_type, selected_specialty, selected_org,
+        status_filter, tuple(pos_range), tuple(date_range)
+    )
     
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -457,15 +1174,16 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
     
     st.markdown("---")
     
-    # Διαύγεια Tabs
-    diav_tab1, diav_tab2, diav_tab3, diav_tab4 = st.tabs([
-        "📋 Προκηρύξεις",
-        "📊 Analytics",
-        "🔔 Alerts",
-        "ℹ️ Info"
-    ])
+    # Διαύγεια views: only the selected one runs on a rerun
+    diavgeia_view = st.radio(
+        "Προβολή Διαύγειας",
+        ["📋 Προκηρύξεις", "📊 Analytics", "🔔 Alerts", "ℹ️ Info"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="diavgeia_view"
+    )
     
-    with diav_tab1:
+    if diavgeia_view == "📋 Προκηρύξεις":
         st.markdown(f"### Βρέθηκαν {len(filtered_df)} προκηρύξεις")
         
         # Sort options
@@ -483,70 +1201,52 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
         }
         filtered_df = filtered_df.sort_values(sort_map[sort_by], ascending=ascending)
         
-        # Display cards
-        for _, row in filtered_df.iterrows():
-            # Color coding
-            if row['status'] == 'Έληξε':
-                border_color = "#ff4444"
-                emoji = "❌"
-            elif row['days_remaining'] <= 7:
-                border_color = "#ff6600"
-                emoji = "🔥"
-            elif row['days_remaining'] <= 14:
-                border_color = "#ffaa00"
-                emoji = "⚠️"
-            else:
-                border_color = "#00aa00"
-                emoji = "✅"
-            
-            with st.container():
-                st.markdown(
-                    f"""
-                    <div style="border-left: 5px solid {border_color}; padding: 15px; 
-                                margin: 10px 0; background: #f8f9fa; border-radius: 5px;">
-                        <h4>{emoji} {row['title']}</h4>
-                        <p><strong>📅 Δημοσίευση:</strong> {row['published_date'].strftime('%d/%m/%Y')} | 
-                           <strong>⏰ Καταληκτική:</strong> {row['deadline'].strftime('%d/%m/%Y')} | 
-                           <strong>⏳ Υπόλοιπες:</strong> {row['days_remaining']} ημέρες</p>
-                        <p><strong>🏛️ Φορέας:</strong> {row['organization']} | 
-                           <strong>👥 Θέσεις:</strong> {row['positions']} | 
-                           <strong>📌 Κατάσταση:</strong> {row['status']}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-                
-                col_btn1, col_btn2, col_btn3 = st.columns([2, 2, 6])
-                with col_btn1:
-                    st.link_button("🔗 Διαύγεια", row['link'])
-                with col_btn2:
-                    st.button(f"📋 ADA: {row['ada']}", key=f"ada_{row['ada']}")
+        # Display cards (one page at a time)
+        page_col, size_col = st.columns([3, 1])
+        with size_col:
+            page_size = st.selectbox("Ανά σελίδα", CARD_PAGE_SIZES, index=0)
+        total_pages = max(1, -(-len(filtered_df) // page_size))
+        with page_col:
+            page = st.number_input("Σελίδα", min_value=1, max_value=total_pages, value=1, step=1)
+        
+        start = (page - 1) * page_size
+        page_df = filtered_df.iloc[start:start + page_size]
+        st.caption(f"Σελίδα {page}/{total_pages} • {start + 1 if len(page_df) else 0}-{start + len(page_df)} από {len(filtered_df)}")
+        with stage("diavgeia.cards"):
+            st.markdown("\n".join(build_announcement_cards(page_df)), unsafe_allow_html=True)
     
-    with diav_tab2:
+    elif diavgeia_view == "📊 Analytics":
         st.markdown("### 📊 Analytics")
         
+        aggregates = get_aggregate_memo().get_or_compute(
+            ("diavgeia",) + filter_key,
+            lambda: aggregate_diavgeia(filtered_df)
+        )
+        
+        figure_key = ("diavgeia",) + filter_key
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("#### Προκηρύξεις ανά Τύπο")
-            type_counts = filtered_df['type'].value_counts()
-            fig1 = px.bar(
+            type_counts = aggregates['type']['count']
+            fig1 = memo_figure("diavgeia.chart.type", figure_key, lambda: px.bar(
                 x=type_counts.values,
                 y=type_counts.index,
                 orientation='h',
                 labels={'x': 'Αριθμός', 'y': 'Τύπος'}
-            )
+            ))
             st.plotly_chart(fig1, use_container_width=True)
         
         with col2:
             st.markdown("#### Θέσεις ανά Ειδικότητα")
-            spec_positions = filtered_df.groupby('specialty')['positions'].sum().sort_values(ascending=False)
-            fig2 = px.bar(
+            spec_positions = aggregates['specialty']['sum'].sort_values(ascending=False)
+            fig2 = memo_figure("diavgeia.chart.specialty", figure_key, lambda: px.bar(
                 x=spec_positions.values,
                 y=spec_positions.index,
                 orientation='h',
                 labels={'x': 'Θέσεις', 'y': 'Ειδικότητα'}
-            )
+            ))
             st.plotly_chart(fig2, use_container_width=True)
         
         col3, col4 = st.columns(2)
@@ -555,7 +1255,7 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
             st.markdown("#### Timeline Καταληκτικών (Ενεργές)")
             active_df = filtered_df[filtered_df['status'] == 'Ενεργή']
             if not active_df.empty:
-                fig3 = px.scatter(
+                fig3 = memo_figure("diavgeia.chart.deadlines", figure_key, lambda: px.scatter(
                     active_df,
                     x='deadline',
                     y='positions',
@@ -563,20 +1263,36 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
                     size='positions',
                     hover_data=['organization', 'type'],
                     labels={'deadline': 'Καταληκτική', 'positions': 'Θέσεις'}
-                )
+                ))
                 st.plotly_chart(fig3, use_container_width=True)
         
         with col4:
             st.markdown("#### Top 10 Φορείς")
-            org_counts = filtered_df['organization'].value_counts().head(10)
-            fig4 = px.pie(
+            org_counts = aggregates['organization']['count'].head(10)
+            fig4 = memo_figure("diavgeia.chart.organizations", figure_key, lambda: px.pie(
                 values=org_counts.values,
                 names=org_counts.index,
                 hole=0.4
-            )
+            ))
             st.plotly_chart(fig4, use_container_width=True)
+        
+        by_aaht = aggregates['aaht']
+        by_aaht = by_aaht[by_aaht.index.notna()]
+        if not by_aaht.empty:
+            st.markdown("#### Θέσεις ανά Φορέα ΑΑΗΤ")
+            aaht_positions = by_aaht['sum'].sort_values(ascending=False).head(15)
+            fig5 = memo_figure("diavgeia.chart.aaht", figure_key, lambda: px.bar(
+                x=aaht_positions.values,
+                y=aaht_positions.index,
+                orientation='h',
+                labels={'x': 'Θέσεις', 'y': 'Φορέας ΑΑΗΤ'}
+            ))
+            st.plotly_chart(fig5, use_container_width=True)
+        
+        st.markdown("---")
+        render_trends("diavgeia", "Θέσεις")
     
-    with diav_tab3:
+    elif diavgeia_view == "🔔 Alerts":
         st.markdown("### 🔔 Επείγουσες Προκηρύξεις")
         
         urgent_df = filtered_df[
@@ -595,7 +1311,7 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
         else:
             st.success("✅ Δεν υπάρχουν επείγουσες προκηρύξεις")
     
-    with diav_tab4:
+    elif diavgeia_view == "ℹ️ Info":
         st.markdown("### ℹ️ Πληροφορίες")
         
         st.info("""
@@ -622,9 +1338,119 @@ elif main_tab == "👥 Διαύγεια - Προκηρύξεις Θέσεων":
         """)
         
         # AAHT Info
-        aaht_df = load_aaht_list()
-        if not aaht_df.empty:
-            st.success(f"✅ Φορτώθηκαν {len(aaht_df):,} φορείς από AAHT")
+        registry = get_aaht_registry()
+        if registry is not None:
+            st.success(f"✅ Φορτώθηκαν {len(registry):,} φορείς από AAHT")
+
+# ============================================================================
+# TAB 3: ΤΟΠΙΚΗ ΑΝΑΖΗΤΗΣΗ ΚΕΙΜΕΝΟΥ
+# ============================================================================
+
+elif main_tab == "🔎 Αναζήτηση Κειμένου":
+    st.header("🔎 Αναζήτηση σε Διαγωνισμούς & Προκηρύξεις")
+    
+    search_index = get_search_index()
+    st.caption(
+        f"📚 Τοπικό ευρετήριο: {search_index.count('khmdhs'):,} διαγωνισμοί ΚΗΜΔΗΣ • "
+        f"{search_index.count('diavgeia'):,} προκηρύξεις Διαύγειας"
+    )
+    
+    col_query, col_source = st.columns([3, 1])
+    with col_query:
+        query = st.text_input("Λέξεις-κλειδιά", placeholder="π.χ. προμήθεια καυσίμων")
+    with col_source:
+        source_labels = {"Όλες": None, "ΚΗΜΔΗΣ": "khmdhs", "Διαύγεια": "diavgeia"}
+        source_label = st.selectbox("Πηγή", list(source_labels))
+    
+    if query:
+        started = datetime.now()
+        with stage("search_index.search"):
+            results = search_index.search(query, source=source_labels[source_label], limit=200)
+        elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+        
+        if results:
+            st.success(f"✅ {len(results)} αποτελέσματα σε {elapsed_ms:.0f} ms")
+            results_df = pd.DataFrame(results)
+            st.dataframe(
+                pd.DataFrame({
+                    'Πηγή': results_df['source'].map({'khmdhs': 'ΚΗΜΔΗΣ', 'diavgeia': 'Διαύγεια'}),
+                    'Τίτλος': results_df['title'],
+                    'Ημ/νία': results_df['published'],
+                    'Συνάφεια': results_df['score'].round(2),
+                    'Link': results_df['link'],
+                }),
+                use_container_width=True,
+                hide_index=True,
+                column_config={'Link': st.column_config.LinkColumn('Link', display_text="📄")}
+            )
+        else:
+            st.info("ℹ️ Δεν βρέθηκαν αποτελέσματα")
+
+# ============================================================================
+# TAB 4: ΔΙΑΓΝΩΣΤΙΚΑ (κρυφό, ?diagnostics=1)
+# ============================================================================
+
+elif main_tab == "🩺 Διαγνωστικά":
+    st.header("🩺 Διαγνωστικά Απόδοσης")
+    
+    if not metrics.enabled:
+        st.info("ℹ️ Οι χρονομετρήσεις είναι απενεργοποιημένες - εκκινήστε με DASHBOARD_METRICS=1")
+    else:
+        if METRICS_PORT:
+            st.caption(f"📡 Prometheus: http://<host>:{METRICS_PORT}/metrics")
+        
+        stages = metrics.summaries("stage")
+        counters = metrics.counters()
+        if stages:
+            st.markdown("#### Χρόνοι ανά στάδιο")
+            stage_df = pd.DataFrame.from_dict(stages, orient='index')
+            latency_columns = [c for c in ['mean', 'p50', 'p95', 'p99', 'max'] if c in stage_df]
+            stage_df[latency_columns] = (stage_df[latency_columns] * 1000).round(1)
+            stage_df['sum'] = stage_df['sum'].round(2)
+            stage_df['errors'] = [counters.get(f"{name}.errors", 0) for name in stage_df.index]
+            st.dataframe(
+                stage_df.rename(columns={'count': 'Κλήσεις', 'sum': 'Σύνολο (s)', 'errors': 'Σφάλματα'})
+                .rename(columns={c: f"{c} (ms)" for c in latency_columns}),
+                use_container_width=True
+            )
+        else:
+            st.info("ℹ️ Δεν έχουν καταγραφεί ακόμη στάδια")
+        
+        payloads = metrics.summaries("payload")
+        if payloads:
+            st.markdown("#### Μεγέθη απαντήσεων API")
+            payload_df = pd.DataFrame.from_dict(payloads, orient='index')
+            size_columns = [c for c in ['mean', 'p50', 'p95', 'max'] if c in payload_df]
+            payload_df[size_columns] = (payload_df[size_columns] / 1024).round(1)
+            payload_df['sum'] = (payload_df['sum'] / 1024 / 1024).round(2)
+            st.dataframe(
+                payload_df.drop(columns=[c for c in ['p99'] if c in payload_df])
+                .rename(columns={'count': 'Απαντήσεις', 'sum': 'Σύνολο (MB)'})
+                .rename(columns={c: f"{c} (KB)" for c in size_columns}),
+                use_container_width=True
+            )
+        
+        if st.button("🔄 Μηδενισμός μετρήσεων"):
+            metrics.reset()
+            st.rerun()
+    
+    gauges = metrics.gauges()
+    if gauges:
+        st.markdown("#### Caches & Clients")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, stat, round(value, 3)) for (name, stat), value in gauges.items()],
+                columns=['Πηγή', 'Μέτρηση', 'Τιμή']
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    with st.expander("📄 Prometheus text"):
+        st.code(metrics.prometheus_text(), language="text")
+
+section_key = ["khmdhs", "diavgeia", "search", "diagnostics"][sections.index(main_tab)]
+metrics.observe("stage", f"rerun.{section_key}", time.perf_counter() - rerun_started)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,30 @@
+"""Test helpers: the modules live at the repository root, the stub servers in bench"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_server import FakeServer  # noqa: E402
+from http_client import ApiClient  # noqa: E402
+from khmdhs_api import KHMDHS_MAX_WORKERS  # noqa: E402
+
+
+class FlakyServer(FakeServer):
+    """FakeServer whose Διαύγεια search fails for the listed pages, every time"""
+
+    def __init__(self, failing_pages=(), **options):
+        super().__init__(**options)
+        self.failing_pages = set(failing_pages)
+        # The failures are intended; keep the server's tracebacks out of the test output
+        self.httpd.handle_error = lambda request, client_address: None
+
+    def decisions_body(self, query):
+        if int(query.get("page", ["0"])[0]) in self.failing_pages:
+            raise ConnectionAbortedError("page configured to fail")
+        return super().decisions_body(query)
+
+
+
+def khmdhs_client(url):
+    """ΚΗΜΔΗΣ client of a stub server, without rate limit or retry delays"""
+    return ApiClient(url, pool_size=KHMDHS_MAX_WORKERS, backoff=0.01, max_backoff=0.05)
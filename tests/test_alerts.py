@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from alerts import ALERT_RETRY_SECONDS, AlertScheduler, track_announcements
+
+NOW = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+
+
+class ListSink:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def send(self, alerts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink down")
+        self.batches.append([alert["key"] for alert in alerts])
+
+
+def scheduler_with(tmp_path, *sinks):
+    scheduler = AlertScheduler(thresholds=(3,), sinks=sinks, state_path=str(tmp_path / "alerts.db"))
+    scheduler.track("khmdhs:1", NOW + timedelta(days=2), source="ΚΗΜΔΗΣ", title="Α")
+    return scheduler
+
+
+def test_failing_sink_is_retried_without_repeating_the_others(tmp_path):
+    good, flaky = ListSink(), ListSink(failures=1)
+    scheduler = scheduler_with(tmp_path, good, flaky)
+
+    assert scheduler.poll(NOW) == []
+    assert "sink down" in scheduler.last_error
+    assert good.batches == [["khmdhs:1"]] and flaky.batches == []
+    assert scheduler.next_fire_time() == NOW + timedelta(seconds=ALERT_RETRY_SECONDS)
+
+    # Not due again before the retry delay
+    assert scheduler.poll(NOW + timedelta(seconds=1)) == []
+    later = NOW + timedelta(seconds=ALERT_RETRY_SECONDS)
+    assert [alert["key"] for alert in scheduler.poll(later)] == ["khmdhs:1"]
+    assert scheduler.last_error is None
+    assert good.batches == [["khmdhs:1"]] and flaky.batches == [["khmdhs:1"]]
+
+    # Recorded as fired once delivered everywhere: a restart does not repeat it
+    restarted = scheduler_with(tmp_path, good, flaky)
+    assert restarted.poll(later) == []
+
+
+def test_undelivered_alerts_are_not_recorded(tmp_path):
+    down = ListSink(failures=1)
+    scheduler_with(tmp_path, down).poll(NOW)
+
+    restarted = scheduler_with(tmp_path, down)
+    assert [alert["key"] for alert in restarted.poll(NOW)] == ["khmdhs:1"]
+
+
+def test_only_published_diavgeia_deadlines_are_tracked(tmp_path):
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    announcements = pd.DataFrame({
+        "ada": ["Α1", "Α2", "Α3"],
+        "title": ["δημοσιευμένη", "εκτιμώμενη", "ληγμένη"],
+        "deadline": [now + pd.Timedelta(days=5), now + pd.Timedelta(days=5), now - pd.Timedelta(days=1)],
+        "deadline_estimated": [False, True, False],
+        "link": ["l1", "l2", "l3"],
+    })
+    scheduler = AlertScheduler(sinks=(), state_path=str(tmp_path / "alerts.db"))
+
+    assert track_announcements(scheduler, announcements) == 1
+    assert list(scheduler._tracked) == ["diavgeia:Α1"]
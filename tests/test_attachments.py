@@ -0,0 +1,191 @@
+import json
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from attachments import AttachmentCache, file_sha256
+from http_client import ApiClient
+
+# Several download chunks long, so a cut transfer leaves a prefix on disk
+DOCUMENT = b"%PDF-1.4\n" + bytes(range(256)) * 1200 + b"\n%%EOF\n"
+AMENDED = b"%PDF-1.4\n" + bytes(reversed(range(256))) * 1200 + b"\n%%EOF\n"
+DROP_AFTER = 200_000
+
+
+class DocumentServer:
+    """One document with an ETag, served with Range/If-Range and If-None-Match
+
+    drop_after cuts the next full or partial transfer after that many body
+    bytes; on_drop runs when it does, e.g. to publish a new version.
+    """
+
+    def __init__(self, body=DOCUMENT, etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.drop_after = None
+        self.on_drop = None
+        self.requests = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.httpd.handle_error = lambda request, client_address: None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def publish(self, body, etag):
+        self.body, self.etag = body, etag
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                body, etag = server.body, server.etag
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", etag)
+                    return
+                start = 0
+                requested = self.headers.get("Range", "")
+                if requested.startswith("bytes=") and self.headers.get("If-Range") == etag:
+                    start = int(requested[len("bytes="):].rstrip("-"))
+                    if start >= len(body):
+                        self._send(416, b"", etag, {"Content-Range": f"bytes */{len(body)}"})
+                        return
+                part = body[start:]
+                headers = {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"} if start else {}
+                self._send(206 if start else 200, part, etag, headers)
+
+            def _send(self, status, body, etag, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if server.drop_after is not None and body:
+                    self.wfile.write(body[:server.drop_after])
+                    self.wfile.flush()
+                    server.drop_after = None
+                    if server.on_drop:
+                        server.on_drop()
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def server():
+    with DocumentServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client():
+    return ApiClient("http://unused", backoff=0.01, max_backoff=0.05)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_an_interrupted_transfer_is_resumed_from_its_prefix(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path))
+    server.drop_after = DROP_AFTER
+    path = cache.fetch(client, f"{server.url}/doc.pdf")
+
+    assert read(path) == DOCUMENT
+    assert os.path.basename(path) == file_sha256(path)
+    offset = int(server.requests[1]["Range"][len("bytes="):].rstrip("-"))
+    assert 0 < offset <= DROP_AFTER and server.requests[1]["If-Range"] == '"v1"'
+    assert os.listdir(tmp_path / "partial") == []
+
+
+def test_a_changed_document_is_never_spliced_onto_the_old_prefix(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path))
+    server.drop_after = DROP_AFTER
+    server.on_drop = lambda: server.publish(AMENDED, '"v2"')
+    path = cache.fetch(client, f"{server.url}/doc.pdf")
+
+    # The resume asked for the rest of v1; the server answered with all of v2
+    assert "Range" in server.requests[1] and server.requests[1]["If-Range"] == '"v1"'
+    assert read(path) == AMENDED
+
+
+def test_a_stale_file_is_revalidated_and_kept_on_304(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path), revalidate_after=0)
+    url = f"{server.url}/doc.pdf"
+    first = cache.fetch(client, url)
+    assert cache.fetch(client, url) == first
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert cache.stats()["revalidated"] == 1
+
+    server.publish(AMENDED, '"v2"')
+    assert read(cache.fetch(client, url)) == AMENDED
+
+
+def test_a_prefix_longer_than_the_document_starts_over_after_416(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path))
+    url = f"{server.url}/doc.pdf"
+    part = cache._partial_path(url)
+    with open(part, "wb") as f:
+        f.write(DOCUMENT + b"trailing garbage")
+    with open(f"{part}.json", "w", encoding="utf-8") as f:
+        json.dump({"etag": '"v1"', "last_modified": None}, f)
+
+    assert read(cache.fetch(client, url)) == DOCUMENT
+    assert "Range" in server.requests[0] and "Range" not in server.requests[1]
+
+
+def test_eviction_removes_least_recently_used_files_but_the_kept_one(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path), max_bytes=10 * len(DOCUMENT))
+    paths = []
+    for version in range(3):
+        server.publish(DOCUMENT + bytes([version]), f'"v{version}"')
+        paths.append(cache.fetch(client, f"{server.url}/doc{version}.pdf"))
+    for age, path in enumerate(paths):
+        # doc0 is the least recently used one
+        cache._touch(os.path.basename(path), now=1000 + age)
+
+    assert cache.evict(max_bytes=1, keep=os.path.basename(paths[0])) == 2
+    assert [os.path.exists(path) for path in paths] == [True, False, False]
+    assert cache.cached([f"{server.url}/doc{version}.pdf" for version in range(3)]) == {f"{server.url}/doc0.pdf"}
+
+
+def test_eviction_skips_files_used_during_the_pass(tmp_path, server, client):
+    cache = AttachmentCache(str(tmp_path))
+    url = f"{server.url}/doc.pdf"
+    path = cache.fetch(client, url)
+    # A fetch that touched the file after the pass started
+    cache._touch(os.path.basename(path), now=2 ** 40)
+    assert cache.evict(max_bytes=0) == 0 and os.path.exists(path)
+
+    cache._touch(os.path.basename(path), now=1000)
+    assert cache.evict(max_bytes=0) == 1
+    # A file evicted under a lookup is downloaded again rather than returned missing
+    assert cache.entry(url) is None
+    assert read(cache.fetch(client, url)) == DOCUMENT
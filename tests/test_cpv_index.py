@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from cpv_index import CpvTree, cpv_rollup
+from notice_store import NoticeStore
+
+PAIRS = pd.DataFrame({
+    "notice": [0, 1, 2, 2, 3],
+    "code": [30000000, 30100000, 30190000, 30192000, 45000000],
+    "budget": [1.0, 2.0, 3.0, 3.0, 4.0],
+})
+CODES = ["30000000-9", "30100000-0", "30010000-1", "30020000-4", "30192000-1", "30213000-5"]
+
+
+def test_rollup_counts_a_notice_once_per_node():
+    rollup = cpv_rollup(PAIRS, 2)
+    assert rollup.loc["30", "notices"] == 3
+    assert rollup.loc["30", "budget"] == 6.0
+
+
+def test_parent_keeps_its_trailing_zeros():
+    # "300" is a group of division 30, not the whole division
+    assert cpv_rollup(PAIRS, 4, parent="300").index.tolist() == ["3000"]
+    assert sorted(cpv_rollup(PAIRS, 4, parent="301").index) == ["3010", "3019"]
+
+
+@pytest.mark.parametrize("parent", ["3019", "30190000-7", "3"])
+def test_parent_at_or_below_the_level_is_rejected(parent):
+    with pytest.raises(ValueError):
+        cpv_rollup(PAIRS, 4, parent=parent)
+
+
+def test_a_selected_group_expands_to_its_own_codes_only():
+    tree = CpvTree([(code, "") for code in CODES])
+    assert tree.options() == ["30", "300", "301", "302"]
+    assert tree.descendants("300") == ["300", "3001", "3002"]
+    assert tree.expand(["300"]) == ["30010000-1", "30020000-4"]
+    assert tree.expand(["30100000-0"]) == ["30100000-0", "30192000-1"]
+    assert len(tree.expand(["30"])) == len(CODES)
+
+
+def test_store_filters_a_group_without_its_division(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    store.upsert([
+        {"referenceNumber": f"N{i}", "title": "t", "cpvs": [{"key": code, "value": ""}]}
+        for i, code in enumerate(CODES)
+    ])
+    references = sorted(row[0] for row in store.query_references({"cpvItems": ["300"]}))
+    assert references == ["N2", "N3"]
+    assert len(store.query_references({"cpvItems": ["30"]})) == len(CODES)
@@ -0,0 +1,69 @@
+import pytest
+
+from diavgeia_api import (
+    ANNOUNCEMENT_SCHEMA,
+    DIAVGEIA_PAGE_SIZE,
+    create_diavgeia_client,
+    ingest_announcements,
+    normalize_decisions,
+)
+from tests.conftest import FlakyServer
+
+# Two pages per day: page 0 full, page 1 with the remainder
+PER_DAY = DIAVGEIA_PAGE_SIZE + 20
+
+
+def quick_client(url):
+    client = create_diavgeia_client(base_url=f"{url}/opendata")
+    client.limiter = None
+    client.max_retries = 0
+    return client
+
+
+def test_failed_pages_are_collected_and_the_rest_returned():
+    with FlakyServer(failing_pages={1}, decisions_per_day=PER_DAY) as server:
+        failed = []
+        df = ingest_announcements(days=2, client=quick_client(server.url), max_workers=4, failed=failed)
+
+    # days=2 spans three one-day windows, each losing its second page
+    assert sorted(page for _, _, page in failed) == [1, 1, 1]
+    assert len(df) == 3 * DIAVGEIA_PAGE_SIZE
+    assert df["ada"].is_unique
+
+
+def test_failed_first_page_stands_for_its_slice():
+    with FlakyServer(failing_pages={0}, decisions_per_day=PER_DAY) as server:
+        failed = []
+        df = ingest_announcements(days=1, client=quick_client(server.url), failed=failed)
+
+    assert [page for _, _, page in failed] == [0, 0]
+    assert df.empty
+    assert list(df.columns) == ANNOUNCEMENT_SCHEMA
+
+
+def test_failed_pages_raise_without_a_failed_list():
+    with FlakyServer(failing_pages={1}, decisions_per_day=PER_DAY) as server:
+        with pytest.raises(Exception):
+            ingest_announcements(days=1, client=quick_client(server.url))
+
+
+def test_complete_ingest_reports_no_failures():
+    with FlakyServer(decisions_per_day=PER_DAY) as server:
+        failed = []
+        df = ingest_announcements(days=1, client=quick_client(server.url), failed=failed)
+
+    assert failed == []
+    assert len(df) == 2 * PER_DAY
+
+
+def test_decisions_without_ada_are_dropped():
+    decisions = [
+        {"ada": "ΨΘ1Α46ΜΤΛ6-ΑΒΓ", "subject": "Πρόσληψη 3 ιατρών", "organizationId": "1", "issueDate": 1700000000000},
+        {"ada": None, "subject": "Χωρίς ΑΔΑ", "organizationId": "1", "issueDate": 1700000000000},
+        {"subject": "Επίσης χωρίς ΑΔΑ", "organizationId": "1", "issueDate": 1700000000000},
+    ]
+    df = normalize_decisions(decisions, {"1": "Δήμος"})
+
+    assert df["ada"].tolist() == ["ΨΘ1Α46ΜΤΛ6-ΑΒΓ"]
+    assert df["link"].tolist() == ["https://diavgeia.gov.gr/doc/ΨΘ1Α46ΜΤΛ6-ΑΒΓ"]
+    assert normalize_decisions(decisions[1:], {}).empty
@@ -0,0 +1,28 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from bench.fake_server import FakeServer
+from diavgeia_api import ANNOUNCEMENT_SCHEMA, create_diavgeia_client
+from exports import export_announcements
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "jsonl"])
+def test_announcements_are_streamed_to_every_format(tmp_path, fmt):
+    path = str(tmp_path / f"announcements.{fmt}")
+    chunks = []
+    with FakeServer(decisions_per_day=30) as server:
+        client = create_diavgeia_client(base_url=f"{server.url}/opendata")
+        rows = export_announcements(date(2025, 3, 1), date(2025, 3, 4), path, client=client, on_chunk=chunks.append)
+
+    assert rows == 4 * 30
+    assert chunks[-1] == rows
+    if fmt == "csv":
+        df = pd.read_csv(path, encoding="utf-8-sig")
+    elif fmt == "parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_json(path, lines=True)
+    assert list(df.columns) == ANNOUNCEMENT_SCHEMA
+    assert len(df) == rows and df["ada"].is_unique
@@ -0,0 +1,20 @@
+from bench.synthetic import announcements_frame
+from filter_index import FilterIndex
+
+
+def test_parquet_round_trip_rebuilds_the_same_index():
+    df = announcements_frame(seed=3, rows=500, per_day=100)
+    df.attrs["failed_pages"] = 2
+    index = FilterIndex(df)
+
+    rebuilt = FilterIndex.from_parquet(index.to_parquet())
+
+    assert rebuilt.size == index.size
+    assert rebuilt.options == index.options
+    assert rebuilt.df.attrs == {"failed_pages": 2}
+    equals = {"specialty": index.options["specialty"][0]}
+    low, high = index.bounds("published_date")
+    ranges = {"published_date": (low + (high - low) / 4, high - (high - low) / 4), "positions": (2, 10)}
+    expected = index.select(equals=equals, ranges=ranges).tolist()
+    assert expected
+    assert rebuilt.select(equals=equals, ranges=ranges).tolist() == expected
@@ -0,0 +1,109 @@
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from bench.fake_server import FakeServer
+from http_client import ApiClient, TokenBucket, retry_after_seconds
+
+ORGANIZATIONS = "/opendata/organizations"
+
+
+class ScriptedServer(FakeServer):
+    """FakeServer answering its first requests with the listed error statuses"""
+
+    def __init__(self, statuses=(), **options):
+        super().__init__(**options)
+        self.statuses = list(statuses)
+        # Connections dropped by the client are expected; keep the server's tracebacks out of the output
+        self.httpd.handle_error = lambda request, client_address: None
+
+    def _draw(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            return 0.0, self.statuses.pop(0) if self.statuses else None
+
+
+def response_with(retry_after):
+    response = requests.Response()
+    response.headers["Retry-After"] = retry_after
+    return response
+
+
+def test_retry_after_is_read_as_seconds_or_http_date():
+    assert retry_after_seconds(response_with("120")) == 120
+    assert 55 < retry_after_seconds(response_with(formatdate(time.time() + 60, usegmt=True))) <= 60
+    assert retry_after_seconds(response_with(formatdate(time.time() - 60, usegmt=True))) == 0
+    assert retry_after_seconds(response_with("soon")) is None
+    assert retry_after_seconds(requests.Response()) is None
+
+
+def test_transient_errors_are_retried_with_backoff():
+    with ScriptedServer(statuses=[503, 502]) as server:
+        client = ApiClient(server.url, backoff=0.01, max_backoff=0.05)
+        assert client.get(ORGANIZATIONS).json()["organizations"]
+        assert server.stats()["requests"] == 3
+    assert client.metrics.summary()["retries"] == 2
+
+
+def test_retries_give_up_with_the_last_error():
+    with ScriptedServer(statuses=[500] * 3) as server:
+        client = ApiClient(server.url, max_retries=2, backoff=0.01, max_backoff=0.05)
+        with pytest.raises(requests.HTTPError):
+            client.get(ORGANIZATIONS)
+        assert server.stats()["requests"] == 3
+
+
+def test_retry_after_is_waited_in_full_beyond_max_backoff():
+    with ScriptedServer(statuses=[429], retry_after=1) as server:
+        client = ApiClient(server.url, backoff=0.01, max_backoff=0.05)
+        start = time.monotonic()
+        client.get(ORGANIZATIONS)
+        assert time.monotonic() - start >= 1
+        assert server.stats()["requests"] == 2
+
+
+def test_retry_after_longer_than_the_maximum_fails_at_once():
+    with ScriptedServer(statuses=[429], retry_after=120) as server:
+        client = ApiClient(server.url, backoff=0.01, max_backoff=0.05, max_retry_after=1)
+        start = time.monotonic()
+        with pytest.raises(requests.HTTPError) as error:
+            client.get(ORGANIZATIONS)
+        assert error.value.response.status_code == 429
+        assert time.monotonic() - start < 1
+        assert server.stats()["requests"] == 1
+
+
+def test_retried_streamed_responses_release_their_connection():
+    # One pooled connection that blocks when taken: an unclosed retry would hang the next attempt
+    with ScriptedServer(statuses=[503] * 3) as server:
+        client = ApiClient(server.url, pool_size=1, backoff=0.01, max_backoff=0.05)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1, pool_block=True)
+        client.session.mount("http://", adapter)
+        result = []
+        worker = threading.Thread(
+            target=lambda: result.append(client.get(ORGANIZATIONS, stream=True, timeout=2)), daemon=True
+        )
+        worker.start()
+        worker.join(5)
+        assert result and result[0].status_code == 200
+
+
+def test_a_shared_token_bucket_limits_all_its_clients():
+    limiter = TokenBucket(rate=20, capacity=1)
+    with FakeServer() as server:
+        clients = [ApiClient(server.url, limiter=limiter) for _ in range(2)]
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda c=client: [c.get(ORGANIZATIONS) for _ in range(5)])
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 10 requests at 20/s with a burst of 1: at least 9 waits of 50 ms
+        assert time.monotonic() - start >= 0.4
+    assert sum(client.metrics.summary()["throttled_seconds"] for client in clients) >= 0.4
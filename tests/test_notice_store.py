@@ -0,0 +1,90 @@
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+from bench.fake_server import FakeServer
+from notice_store import NoticeStore
+from tests.conftest import khmdhs_client
+
+
+def sync_from(store, **server_options):
+    with FakeServer(page_size=100, **server_options) as server:
+        return store.sync(days=30, client=khmdhs_client(server.url))
+
+
+def test_sync_feeds_new_then_changed_notices(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+
+    first = sync_from(store, seed=1, notices=250)
+    assert (first["new"], first["changed"], first["failed_pages"]) == (250, 0, [])
+    # The same data again is recognized by fingerprint and not fed again
+    again = sync_from(store, seed=1, notices=250)
+    assert (again["new"], again["changed"], again["unchanged"]) == (0, 0, 250)
+
+    # Another seed: same reference numbers with other fields, plus 50 more notices
+    amended = sync_from(store, seed=2, notices=300)
+    assert amended["new"] == 50
+    assert amended["new"] + amended["changed"] + amended["unchanged"] == 300
+
+    feed = store.changes_since("2000-01-01", limit=10000)
+    kinds = [change["change"] for change in feed]
+    assert kinds.count("new") == 300
+    assert kinds.count("changed") == amended["changed"]
+    changed = store.changes_since("2000-01-01", kinds=("changed",), limit=1)
+    assert len(changed) == 1 and changed[0]["version"] == 2 and changed[0]["title"]
+
+
+def test_reserialized_notices_are_unchanged(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    notice = {"referenceNumber": "25PROC1", "title": "Προμήθεια  καυσίμων", "finalSubmissionDate": "2025-02-01T10:00:00Z"}
+    store.upsert([notice])
+
+    respaced = {"finalSubmissionDate": notice["finalSubmissionDate"], "title": "Προμήθεια καυσίμων",
+                "referenceNumber": "25PROC1"}
+    assert store.upsert([respaced]) == {"new": 0, "changed": 0, "unchanged": 1}
+    assert store.upsert([{**notice, "title": "Προμήθεια ελαίων"}])["changed"] == 1
+
+
+def test_closed_notices_are_fed_once_their_deadline_passes(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    store.upsert([
+        {"referenceNumber": "A", "title": "α", "finalSubmissionDate": "2025-02-01T10:00:00+00:00"},
+        {"referenceNumber": "B", "title": "β", "finalSubmissionDate": "2025-03-01T10:00:00+00:00"},
+    ])
+
+    # The first check only starts the feed
+    assert store.record_closed(now=datetime(2025, 1, 15, tzinfo=timezone.utc)) == 0
+    assert store.record_closed(now=datetime(2025, 2, 15, tzinfo=timezone.utc)) == 1
+    assert store.record_closed(now=datetime(2025, 2, 20, tzinfo=timezone.utc)) == 0
+
+    closed = store.changes_since("2000-01-01", kinds=("closed",))
+    assert [change["reference_number"] for change in closed] == ["A"]
+
+
+def test_deadlines_are_compared_in_utc_whatever_their_spelling(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    store.upsert([
+        {"referenceNumber": "Z", "title": "ζ", "finalSubmissionDate": "2025-02-01T10:00:00Z"},
+        {"referenceNumber": "GR", "title": "γ", "finalSubmissionDate": "2025-02-01T12:30:00+02:00"},
+    ])
+    deadlines = dict((row[0], row[2]) for row in store.query_references({}))
+    assert deadlines == {"Z": "2025-02-01T10:00:00+00:00", "GR": "2025-02-01T10:30:00+00:00"}
+
+    store.record_closed(now=datetime(2025, 2, 1, 9, 0, tzinfo=timezone.utc))
+    # 10:15 UTC: Z has closed, GR (12:30 Athens time) has not
+    assert store.record_closed(now=datetime(2025, 2, 1, 10, 15, tzinfo=timezone.utc)) == 1
+    closed = store.changes_since("2000-01-01", kinds=("closed",))
+    assert [change["reference_number"] for change in closed] == ["Z"]
+    # Stamped in local time, like the new/changed entries of the feed
+    local = datetime(2025, 2, 1, 10, 15, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert closed[0]["changed_at"] == local.isoformat(timespec="seconds")
+
+
+def test_existing_deadlines_are_normalized_on_open(tmp_path):
+    path = str(tmp_path / "notices.db")
+    NoticeStore(path).upsert([{"referenceNumber": "Z", "title": "ζ", "finalSubmissionDate": "2025-02-01T10:00:00Z"}])
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("UPDATE notices SET final_submission_date = '2025-02-01T10:00:00Z'")
+        conn.execute("DELETE FROM sync_state WHERE key = 'deadlines_utc'")
+
+    assert NoticeStore(path).query_references({})[0][2] == "2025-02-01T10:00:00+00:00"
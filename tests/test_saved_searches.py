@@ -0,0 +1,83 @@
+import json
+import time
+from datetime import date
+
+import pytest
+
+import saved_searches
+from bench.fake_server import FakeServer
+from notice_store import NoticeStore
+from saved_searches import SavedSearches, check_sink
+from tests.conftest import khmdhs_client
+
+WINDOW = {"dateFrom": "2025-01-01", "dateTo": "2025-12-31"}
+TODAY = date(2026, 1, 10)
+
+
+@pytest.fixture
+def sink_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(saved_searches, "SAVED_SEARCH_FILE_DIR", str(tmp_path / "data"))
+    return tmp_path / "data"
+
+
+def test_first_run_is_a_baseline_then_only_new_matches_are_reported(tmp_path, sink_dir):
+    saved = SavedSearches(str(tmp_path / "saved.db"))
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    sink = sink_dir / "new.jsonl"
+    saved.save("Όλες", WINDOW, sink=f"file:{sink}")
+
+    with FakeServer(page_size=100, notices=250) as server:
+        client = khmdhs_client(server.url)
+        first = saved.run(store, client=client, today=TODAY)
+        assert (first["api_sweeps"], first["new"], first["errors"]) == (1, 0, 0)
+        assert saved.list()[0]["last_total"] == 250
+        assert not sink.exists()
+
+        # The window was swept once; the next run filters the store only
+        assert saved.run(store, client=client, today=TODAY)["api_sweeps"] == 0
+
+    store.upsert([
+        {"referenceNumber": f"26NEW{i}", "title": f"Νέα {i}", "submissionDate": "2025-06-01T10:00:00Z",
+         "finalSubmissionDate": "2026-02-01T10:00:00Z"}
+        for i in range(3)
+    ])
+    time.sleep(1)  # runs are stamped to the second; the new matches are those of the latest run
+    third = saved.run(store, today=TODAY)
+    assert (third["api_sweeps"], third["new"]) == (0, 3)
+    assert sorted(m["reference_number"] for m in saved.matches("Όλες", new_only=True)) == ["26NEW0", "26NEW1", "26NEW2"]
+    alerts = [json.loads(line) for line in sink.read_text(encoding="utf-8").splitlines()]
+    assert sorted(alert["title"] for alert in alerts) == ["Νέα 0", "Νέα 1", "Νέα 2"]
+
+
+def test_a_window_is_fetched_once_then_only_incrementally(tmp_path, monkeypatch):
+    saved = SavedSearches(str(tmp_path / "saved.db"))
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    saved.save("Τρέχουσα", {"dateFrom": "2025-12-01", "dateTo": "2026-01-10"})
+
+    fetched = []
+    fetch = saved_searches.fetch_khmdhs_pages
+
+    def recording_fetch(client, payload, **kwargs):
+        fetched.append((payload["dateFrom"], payload["dateTo"]))
+        return fetch(client, payload, **kwargs)
+
+    monkeypatch.setattr(saved_searches, "fetch_khmdhs_pages", recording_fetch)
+    with FakeServer(page_size=100, notices=50) as server:
+        client = khmdhs_client(server.url)
+        saved.run(store, client=client, today=TODAY)
+        saved.run(store, client=client, today=TODAY)
+    # The days that can still be amended are fetched again, the rest of the window is not
+    assert fetched == [("2025-12-01", "2026-01-10"), ("2026-01-08", "2026-01-10")]
+
+
+def test_sinks_outside_the_allowlist_are_rejected(tmp_path, sink_dir, monkeypatch):
+    monkeypatch.setattr(saved_searches, "SAVED_SEARCH_SINKS", ["webhook:http://hooks.internal/tenders"])
+    saved = SavedSearches(str(tmp_path / "saved.db"))
+
+    assert check_sink("webhook:http://hooks.internal/tenders")
+    assert check_sink(f"file:{sink_dir / 'matches.jsonl'}")
+    for spec in ("webhook:http://169.254.169.254/latest", "smtp:mail.example.com:25:x@example.com",
+                 f"file:{tmp_path / 'elsewhere.jsonl'}", f"file:{sink_dir}/../escape.jsonl", "file:/etc/passwd"):
+        with pytest.raises(ValueError):
+            saved.save("Κακή", WINDOW, sink=spec)
+    assert saved.list() == []
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from scheduler import BackgroundRefresher
+
+
+def test_a_slow_job_does_not_hold_up_the_others():
+    release = threading.Event()
+    refresher = BackgroundRefresher()
+    refresher.register("slow", lambda: release.wait(5) and "slow", 3600)
+    refresher.register("fast", lambda: "fast", 3600)
+    refresher.start()
+    try:
+        assert refresher.get("fast", wait=2) == "fast"
+        assert not refresher.ready("slow")
+        assert refresher.get("slow") is None
+    finally:
+        release.set()
+        refresher.stop(timeout=5)
+
+
+def test_after_waits_for_the_first_attempt_of_the_other_job():
+    order = []
+    refresher = BackgroundRefresher()
+
+    def sync():
+        time.sleep(0.2)
+        order.append("sync")
+        return "synced"
+
+    refresher.register("sync", sync, 3600)
+    refresher.register("tree", lambda: order.append("tree") or "tree", 3600, after="sync")
+    refresher.start()
+    try:
+        assert refresher.get("tree", wait=2) == "tree"
+        assert order == ["sync", "tree"]
+    finally:
+        refresher.stop(timeout=5)
+
+
+def test_refresh_now_reruns_a_job_before_its_interval():
+    runs = []
+    refresher = BackgroundRefresher()
+    refresher.register("job", lambda: runs.append(1) or len(runs), 3600)
+    refresher.start()
+    try:
+        assert refresher.get("job", wait=2) == 1
+        refresher.refresh_now("job")
+        deadline = time.monotonic() + 2
+        while len(runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(runs) == 2
+    finally:
+        refresher.stop(timeout=5)
+
+
+def test_shared_jobs_are_published_in_their_codec_and_adopted(tmp_path):
+    from shared_state import SqliteState
+    from scheduler import JSON_CODEC
+
+    state = SqliteState(str(tmp_path / "shared.db"))
+    loads = []
+    first, second = BackgroundRefresher(shared=state), BackgroundRefresher(shared=state)
+    for refresher in (first, second):
+        refresher.register("summary", lambda: loads.append(1) or {"new": 3}, 3600, codec=JSON_CODEC)
+    first.start()
+    try:
+        assert first.get("summary", wait=2) == {"new": 3}
+        # Published right after the load
+        deadline = time.monotonic() + 2
+        while state.get("dataset:summary:loaded_at") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert state.get("dataset:summary") == b'{"new": 3}'
+        second.start()
+        assert second.get("summary", wait=2) == {"new": 3}
+        assert second.status()[0]["source"] == "shared"
+        assert len(loads) == 1
+    finally:
+        first.stop(timeout=5)
+        second.stop(timeout=5)
+
+
+def test_jobs_without_a_codec_are_not_shared(tmp_path):
+    from shared_state import SqliteState
+
+    state = SqliteState(str(tmp_path / "shared.db"))
+    refresher = BackgroundRefresher(shared=state).start()
+    refresher.register("local", lambda: object(), 3600)
+    try:
+        assert refresher.get("local", wait=2) is not None
+        assert state.keys() == []
+    finally:
+        refresher.stop(timeout=5)
@@ -0,0 +1,94 @@
+import sqlite3
+from contextlib import closing
+
+from notice_store import NoticeStore
+from search_index import SearchIndex, match_expression
+
+
+def doc(doc_id, title, **fields):
+    return {"doc_id": doc_id, "source": "khmdhs", "title": title, **fields}
+
+
+def found(index, query, **options):
+    return [result["doc_id"] for result in index.search(query, **options)]
+
+
+def test_queries_are_stemmed_prefix_terms():
+    assert match_expression("προμήθεια καυσίμων") == '"ΠΡΟΜΗΘ"* AND "ΚΑΥΣΙΜ"*'
+    assert match_expression(" ,. ") == ""
+
+
+def test_inflected_queries_find_other_forms(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.db"))
+    index.upsert([
+        doc("khmdhs:1", "Προμήθεια καυσίμων"),
+        doc("khmdhs:2", "ΠΡΟΜΗΘΕΙΑΣ ΕΙΔΩΝ ΚΑΘΑΡΙΟΤΗΤΑΣ"),
+        {"doc_id": "diavgeia:1", "source": "diavgeia", "title": "Παροχή υπηρεσιών καθαριότητας"},
+    ])
+    assert sorted(found(index, "προμηθειών")) == ["khmdhs:1", "khmdhs:2"]
+    assert found(index, "καύσιμα") == ["khmdhs:1"]
+    assert found(index, "καθαριότητα", source="diavgeia") == ["diavgeia:1"]
+    assert found(index, "") == []
+
+
+def test_title_matches_rank_above_body_matches(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.db"))
+    index.upsert([
+        doc("khmdhs:body", "Προμήθεια εξοπλισμού", body="καύσιμα για τα οχήματα"),
+        doc("khmdhs:title", "Προμήθεια καυσίμων"),
+    ])
+    assert found(index, "καυσίμων") == ["khmdhs:title", "khmdhs:body"]
+
+
+def test_unchanged_documents_are_skipped_by_fingerprint(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.db"))
+    assert index.upsert([doc("khmdhs:1", "Προμήθεια καυσίμων")]) == 1
+    # Same terms once tokenized: case, accents and spacing do not count
+    assert index.upsert([doc("khmdhs:1", "ΠΡΟΜΗΘΕΙΑ  ΚΑΥΣΙΜΩΝ")]) == 0
+    assert index.upsert([doc("khmdhs:1", "Προμήθεια ελαίων")]) == 1
+    assert found(index, "ελαίων") == ["khmdhs:1"] and found(index, "καυσίμων") == []
+    assert index.count() == 1
+
+
+def test_a_document_without_body_keeps_the_extracted_one(tmp_path):
+    index = SearchIndex(str(tmp_path / "index.db"))
+    index.upsert([doc("khmdhs:1", "Προμήθεια", body="τεχνικές προδιαγραφές οχημάτων")])
+
+    # A title-only refresh (the store sync) neither rewrites nor drops the PDF text
+    assert index.upsert([doc("khmdhs:1", "Προμήθεια")]) == 0
+    assert index.upsert([doc("khmdhs:1", "Προμήθεια οχημάτων")]) == 1
+    assert found(index, "προδιαγραφές") == ["khmdhs:1"]
+    with closing(sqlite3.connect(index.path)) as conn:
+        assert conn.execute("SELECT has_body FROM docs").fetchone() == (1,)
+
+
+def test_index_store_reads_from_its_watermark(tmp_path):
+    store = NoticeStore(str(tmp_path / "notices.db"))
+    index = SearchIndex(str(tmp_path / "index.db"))
+    store.upsert([
+        {"referenceNumber": "A", "title": "Προμήθεια καυσίμων", "submissionDate": "2025-01-02T10:00:00Z"},
+        {"referenceNumber": "B", "title": "Παροχή υπηρεσιών", "submissionDate": "2025-01-03T10:00:00Z"},
+    ])
+    with closing(sqlite3.connect(store.path)) as conn, conn:
+        conn.execute("UPDATE notices SET synced_at = '2025-01-04T08:00:00' WHERE reference_number = 'A'")
+        conn.execute("UPDATE notices SET synced_at = '2025-01-05T08:00:00' WHERE reference_number = 'B'")
+
+    assert index.index_store(store) == 2
+    assert index.get_state("khmdhs_synced_at") == "2025-01-05T08:00:00"
+    assert found(index, "καυσίμων") == ["khmdhs:A"]
+
+    store.upsert([{"referenceNumber": "C", "title": "Εργασίες οδοποιίας", "submissionDate": "2025-02-01T10:00:00Z"}])
+    read = []
+    iter_synced = store.iter_synced
+
+    def recording(since, **options):
+        for rows in iter_synced(since, **options):
+            read.extend(row[0] for row in rows)
+            yield rows
+
+    store.iter_synced = recording
+    assert index.index_store(store) == 1
+    # Rows at the watermark itself are read again (and skipped); older ones are not
+    assert read == ["B", "C"] and index.get_state("khmdhs_synced_at") > "2025-01-05T08:00:00"
+    assert found(index, "οδοποιία") == ["khmdhs:C"]
+    assert index.count("khmdhs") == 3
@@ -0,0 +1,36 @@
+import time
+
+import shared_state
+from shared_state import SqliteState
+
+
+def test_lock_is_exclusive_and_released(tmp_path):
+    state = SqliteState(str(tmp_path / "shared.db"))
+    with state.lock("job") as acquired:
+        assert acquired
+        with state.lock("job") as other:
+            assert not other
+    with state.lock("job") as again:
+        assert again
+
+
+def test_keepalive_holds_the_lock_past_its_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "LOCK_RENEWALS", 4)
+    state = SqliteState(str(tmp_path / "shared.db"))
+    with state.lock("job", ttl=0.4, keepalive=True) as acquired:
+        assert acquired
+        time.sleep(1.0)
+        assert not state.add("lock:job", b"other", ttl=1)
+    # Released on exit, renewals stopped
+    assert state.get("lock:job") is None
+
+
+def test_a_lock_without_keepalive_expires(tmp_path):
+    state = SqliteState(str(tmp_path / "shared.db"))
+    lock = state.lock("job", ttl=0.2)
+    assert lock.acquire()
+    time.sleep(0.3)
+    assert state.add("lock:job", b"other", ttl=1)
+    # The old holder does not release the new holder's lock
+    lock.release()
+    assert state.get("lock:job") == b"other"